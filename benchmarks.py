@@ -0,0 +1,466 @@
+"""
+Benchmarks for Steamulation's slow paths.
+
+Usage:
+    python benchmarks.py scan [--dirs 400] [--files 50] [--depth 4] [--latency-ms 2]
+    python benchmarks.py switch [--titles 5000] [--payload-kb 256]
+    python benchmarks.py merge [--existing 10000] [--games 5000]
+    python benchmarks.py collections [--collections 20] [--members 20000] [--new 2000]
+    python benchmarks.py vdf [--shortcuts 5000] [--tags 40] [--changed 50]
+    python benchmarks.py e2e [--games 200] [--latency-ms 30] [--error-rate 0.02] [--rate-limit-rate 0.02]
+
+Each benchmark builds its own synthetic data in a temporary folder and
+compares the current implementation in main.py with the previous one.
+e2e runs add_steam_shortcuts with artwork against mock_steamgriddb.py.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import vdf
+
+import main
+
+
+def timed(label, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+# --- ROM scanning ---
+
+def legacy_scrape_roms(roms_folder):
+    # Original sequential os.walk implementation, kept for comparison
+    games = []
+    for root, dirs, files in os.walk(roms_folder):
+        for file in files:
+            if file.lower().endswith('.nsp'):
+                if '[v0]' not in file.lower():
+                    continue
+                base = os.path.splitext(file)[0]
+                split_idx = base.find(' [')
+                display_name = base[:split_idx].strip() if split_idx > 0 else base
+                games.append({'display_name': display_name, 'path': os.path.join(root, file)})
+    return games
+
+
+def build_rom_tree(root, dirs, files, depth):
+    """Create dirs leaf folders spread over a tree of the given depth, each holding files ROMs."""
+    for d in range(dirs):
+        parts = [f"level{level}_{(d >> level) % 4}" for level in range(depth - 1)]
+        folder = os.path.join(root, *parts, f"game_folder_{d}")
+        os.makedirs(folder, exist_ok=True)
+        for f in range(files):
+            version = 'v0' if f % 3 == 0 else f'v{f}'
+            name = f"Synthetic Game {d}-{f} [0100{d:08X}{f:04X}][{version}].nsp"
+            open(os.path.join(folder, name), 'wb').close()
+
+
+def with_scandir_latency(latency_s):
+    """Patch os.scandir (also used by os.walk) to simulate a network share round-trip."""
+    real_scandir = os.scandir
+
+    def slow_scandir(path='.'):
+        time.sleep(latency_s)
+        return real_scandir(path)
+
+    os.scandir = slow_scandir
+    return lambda: setattr(os, 'scandir', real_scandir)
+
+
+def bench_scan(args):
+    root = tempfile.mkdtemp(prefix='steamulation-roms-')
+    cache_dir = tempfile.mkdtemp(prefix='steamulation-cache-')
+    main.get_icons_cache_dir = lambda: cache_dir
+    try:
+        build_rom_tree(root, args.dirs, args.files, args.depth)
+        print(f"ROM scan: {args.dirs} folders x {args.files} files, depth {args.depth}, "
+              f"{args.latency_ms} ms simulated listing latency")
+        restore = with_scandir_latency(args.latency_ms / 1000.0)
+        try:
+            legacy, t_legacy = timed('legacy os.walk', legacy_scrape_roms, root)
+            cold, t_cold = timed('parallel scandir (cold index)', main.scrape_roms, root, 'Switch')
+            warm, t_warm = timed('parallel scandir (warm index)', main.scrape_roms, root, 'Switch')
+            flat, t_flat = timed('parallel scandir (no index)', main.scrape_roms, root, 'Switch', use_index=False)
+        finally:
+            restore()
+        assert len(legacy) == len(cold) == len(warm) == len(flat)
+        print(f"  {len(cold)} games; cold speedup x{t_legacy / t_cold:.1f}, warm speedup x{t_legacy / t_warm:.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# --- Switch containers ---
+
+def pack_partition(magic, files, entry_size):
+    """A PFS0/HFS0 partition holding files [(name, data), ...]."""
+    strings = b''.join(name.encode('utf-8') + b'\0' for name, _ in files)
+    strings += b'\0' * (-len(strings) % 0x20)
+    table = b''
+    offset = name_offset = 0
+    for name, data in files:
+        entry = struct.pack('<QQI', offset, len(data), name_offset)
+        table += entry + b'\0' * (entry_size - len(entry))
+        offset += len(data)
+        name_offset += len(name.encode('utf-8')) + 1
+    return magic + struct.pack('<III', len(files), len(strings), 0) + table + strings + b''.join(d for _, d in files)
+
+
+def cnmt_xml(title_id, kind, version):
+    return (f'<?xml version="1.0" encoding="utf-8"?><ContentMeta><Type>{kind}</Type>'
+            f'<Id>0x{title_id:016x}</Id><Version>{version}</Version></ContentMeta>').encode('utf-8')
+
+
+def make_nsp(path, title_id, payload, kind=None, version=0):
+    """NSP with a ticket for title_id, plus a .cnmt.xml when kind is given, and an opaque payload NCA."""
+    files = [(f"{title_id:016x}{'0' * 15}1.tik", b'\0' * 0x2c0)]
+    if kind:
+        files.append((f"{title_id:032x}.cnmt.xml", cnmt_xml(title_id, kind, version)))
+    files.append((f"{title_id:032x}.nca", payload))
+    with open(path, 'wb') as f:
+        f.write(pack_partition(b'PFS0', files, 0x18))
+
+
+def make_xci(path, title_id, payload):
+    """XCI whose secure partition holds a ticket for title_id and an opaque payload NCA."""
+    secure = pack_partition(b'HFS0', [(f"{title_id:016x}{'0' * 16}.tik", b'\0' * 0x2c0),
+                                      (f"{title_id:032x}.nca", payload)], 0x40)
+    header = bytearray(0x200)
+    header[0x100:0x104] = b'HEAD'
+    root = pack_partition(b'HFS0', [('update', b''), ('secure', b'')], 0x40)
+    root_offset = 0xF000
+    struct.pack_into('<QQ', header, 0x130, root_offset, len(root))
+    # Point the secure entry at the partition appended after the root table
+    root = bytearray(root)
+    struct.pack_into('<QQ', root, 16 + 0x40, 0, len(secure))
+    with open(path, 'wb') as f:
+        f.write(header + b'\0' * (root_offset - len(header)) + bytes(root) + secure)
+
+
+def build_switch_library(root, titles, payload_kb):
+    """Base game, update and DLC for every title; every 4th base game is an XCI, every 3rd NSP has a .cnmt.xml."""
+    payload = os.urandom(int(payload_kb * 1024))
+    expected = {}
+    for t in range(titles):
+        base = 0x0100000000000000 | (t << 13)
+        folder = os.path.join(root, f"group{t % 20}")
+        os.makedirs(os.path.join(folder, 'updates'), exist_ok=True)
+        if t % 4 == 0:
+            name = f"Title {t}.xci"
+            make_xci(os.path.join(folder, name), base, payload)
+        else:
+            name = f"Title {t}.nsp"  # No [v0] tag: the old filename rule skipped these
+            make_nsp(os.path.join(folder, name), base, payload, 'Application' if t % 3 == 0 else None)
+        expected[os.path.join(folder, name)] = f"{base:016x}"
+        make_nsp(os.path.join(folder, 'updates', f"Title {t} [v0].nsp"), base | 0x800, payload,
+                 'Patch' if t % 2 else None, 65536)
+        make_nsp(os.path.join(folder, f"Title {t} Bonus.nsp"), (base | 0x1000) + 1, payload)
+    # A second copy of one game must not give it a second shortcut
+    os.makedirs(os.path.join(root, 'zz copies'))
+    make_nsp(os.path.join(root, 'zz copies', 'Title 1.nsp'), 0x0100000000000000 | (1 << 13), payload)
+    return expected
+
+
+def bench_switch(args):
+    root = tempfile.mkdtemp(prefix='steamulation-switch-')
+    cache_dir = tempfile.mkdtemp(prefix='steamulation-cache-')
+    main.get_icons_cache_dir = lambda: cache_dir
+    try:
+        expected = build_switch_library(root, args.titles, args.payload_kb)
+        print(f"Switch scan: {args.titles} titles, {args.titles * 3 + 1} files of ~{args.payload_kb:g} KB")
+        games, t_cold = timed('header scan (cold index)', main.scrape_roms, root, 'Switch')
+        warm, t_warm = timed('header scan (warm index)', main.scrape_roms, root, 'Switch')
+        found = {g['path']: g['title_id'] for g in games}
+        assert found == expected, f"{len(found)} games found, {len(expected)} expected"
+        assert [g['path'] for g in warm] == [g['path'] for g in games]
+        assert all(g['title_type'] == 'base' for g in games)
+        print(f"  {len(games)} games, {args.titles * 3 / t_cold:.0f} files/s cold; updates, DLC and duplicates dropped")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# --- Shortcut merge ---
+
+def legacy_merge_shortcuts(shortcut_list, emulator, games, launch_options_template='#rom'):
+    # Original O(games x shortcuts) merge loop from add_steam_shortcuts (without artwork)
+    for game in games:
+        found = False
+        for s in shortcut_list:
+            if s.get('AppName') == game['display_name'] or s.get('appname') == game['display_name']:
+                s['AppName'] = game['display_name']
+                s['Exe'] = f'"{emulator}"'.replace('/', '\\')
+                s['StartDir'] = f'"{os.path.dirname(emulator)}"'.replace('/', '\\')
+                s['LaunchOptions'] = launch_options_template.replace('#rom', f'"{game["path"]}"')
+                s['LastPlayTime'] = int(time.time())
+                s['tags'] = {}
+                s['appid'] = main.calc_shortcut_appid(emulator.replace('/', '\\'), game['display_name'])
+                found = True
+                break
+        if not found:
+            shortcut_list.append({
+                'AppName': game['display_name'],
+                'Exe': f'"{emulator}"'.replace('/', '\\'),
+                'StartDir': f'"{os.path.dirname(emulator)}"'.replace('/', '\\'),
+                'LaunchOptions': launch_options_template.replace('#rom', f'"{game["path"]}"'),
+                'LastPlayTime': int(time.time()),
+                'tags': {},
+                'appid': main.calc_shortcut_appid(emulator.replace('/', '\\'), game['display_name']),
+            })
+
+
+def synthetic_shortcuts(count, emulator, tags=3):
+    exe_key = emulator.replace('/', '\\')
+    shortcuts = []
+    for i in range(count):
+        name = f"Existing Game {i}"
+        shortcuts.append({
+            'AppName': name,
+            'Exe': f'"{exe_key}"',
+            'StartDir': '"C:\\Emulators"',
+            'icon': '',
+            'LaunchOptions': f'"E:\\roms\\{name}.nsp"',
+            'LastPlayTime': 0,
+            'tags': {str(t): f'tag{t}' for t in range(tags)},
+            'appid': main.calc_shortcut_appid(exe_key, name),
+        })
+    return shortcuts
+
+
+def synthetic_games(count, overlap):
+    """count games, the first overlap of which already exist as 'Existing Game N' shortcuts."""
+    games = []
+    for i in range(count):
+        name = f"Existing Game {i}" if i < overlap else f"New Game {i}"
+        games.append({'display_name': name, 'path': f"E:/roms/{name} [v0].nsp"})
+    return games
+
+
+def bench_merge(args):
+    emulator = 'C:/Emulators/eden/eden.exe'
+    existing = synthetic_shortcuts(args.existing, emulator)
+    games = synthetic_games(args.games, args.games // 2)
+    print(f"Shortcut merge: {args.existing} existing shortcuts x {args.games} incoming games (half already present)")
+    legacy_list = copy.deepcopy(existing)
+    _, t_legacy = timed('legacy linear scan', legacy_merge_shortcuts, legacy_list, emulator, games)
+    indexed_list = copy.deepcopy(existing)
+    _, t_indexed = timed('indexed merge_shortcuts', main.merge_shortcuts, indexed_list, emulator, games)
+    assert len(legacy_list) == len(indexed_list)
+    print(f"  {len(indexed_list)} shortcuts after merge; speedup x{t_legacy / t_indexed:.1f}")
+
+
+# --- Collections ---
+
+def legacy_update_collection(data, appids, collection_name):
+    # Original add_shortcuts_to_steam_collection update loop (list rebuilt for every appid)
+    for entry in data:
+        key, value = entry
+        if key.startswith('user-collections.'):
+            try:
+                vobj = json.loads(value.get('value'))
+            except Exception:
+                continue
+            if vobj.get('name') == collection_name:
+                added = vobj.setdefault('added', [])
+                changed = False
+                for appid in appids:
+                    appid_int = int(appid)
+                    if appid_int not in [int(a) for a in added]:
+                        added.append(appid_int)
+                        changed = True
+                if changed:
+                    vobj['added'] = sorted(set(int(a) for a in added))
+                    value['value'] = json.dumps(vobj, separators=(',', ':'))
+                    value['timestamp'] = int(time.time())
+                    value['version'] = str(int(value.get('version', '0')) + 1)
+                return
+
+
+def synthetic_collections(collections, members):
+    data = []
+    for c in range(collections):
+        key = f"user-collections.uc-{c:04x}"
+        vobj = {'id': f"uc-{c:04x}", 'name': f"Platform {c}",
+                'added': [0x80000000 + c * members + m for m in range(members)], 'removed': []}
+        data.append([key, {'key': key, 'timestamp': 0, 'value': json.dumps(vobj, separators=(',', ':')),
+                           'version': str(c + 1), 'strMethodId': 'static'}])
+    return data
+
+
+def bench_collections(args):
+    data = synthetic_collections(args.collections, args.members)
+    # Half of the incoming appids are already members of the first collection
+    base = 0x80000000 + args.members - args.new // 2
+    updates = {'Platform 0': [base + i for i in range(args.new)],
+               'Platform 1': [base + args.members + i for i in range(args.new)]}
+    print(f"Collections: {args.collections} collections x {args.members} members, "
+          f"{args.new} appids added to 2 of them")
+
+    def legacy():
+        legacy_data = copy.deepcopy(data)
+        for name, appids in updates.items():
+            legacy_update_collection(legacy_data, appids, name)
+        return legacy_data
+
+    def indexed():
+        collections = main.SteamCollections(copy.deepcopy(data))
+        collections.apply(updates)
+        collections.commit()
+        return collections.data
+
+    legacy_data, t_legacy = timed('legacy list membership', legacy)
+    indexed_data, t_indexed = timed('SteamCollections', indexed)
+    assert [e[1]['value'] for e in legacy_data] == [e[1]['value'] for e in indexed_data]
+    print(f"  speedup x{t_legacy / t_indexed:.1f}")
+
+
+# --- shortcuts.vdf codec ---
+
+def bench_vdf(args):
+    emulator = 'C:/Emulators/eden/eden.exe'
+    shortcuts = synthetic_shortcuts(args.shortcuts, emulator, tags=args.tags)
+    data = vdf.binary_dumps({'shortcuts': {str(i): s for i, s in enumerate(shortcuts)}})
+    print(f"shortcuts.vdf: {args.shortcuts} shortcuts with {args.tags} tags each ({len(data) / (1024 * 1024):.1f} MB), "
+          f"{args.changed} updated")
+    changed = [f"Existing Game {i}" for i in range(0, args.shortcuts, max(1, args.shortcuts // max(1, args.changed)))][:args.changed]
+
+    def update(entries):
+        index = main.ShortcutIndex(entries)
+        for name in changed:
+            index.find(name, None)['LaunchOptions'] = '"E:\\roms\\moved.nsp"'
+        return entries
+
+    def with_vdf():
+        entries = list(vdf.binary_loads(data)['shortcuts'].values())
+        update(entries)
+        return vdf.binary_dumps({'shortcuts': {str(i): s for i, s in enumerate(entries)}})
+
+    def with_codec():
+        return main.encode_shortcuts(update(main.parse_shortcuts(data)))
+
+    old, t_old = timed('vdf load + dump', with_vdf)
+    new, t_new = timed('lazy codec', with_codec)
+    assert old == new
+    print(f"  speedup x{t_old / t_new:.1f}")
+
+
+# --- End to end (shortcuts + artwork) ---
+
+def build_userdata(root, steamid):
+    """Minimal Steam userdata folder for one user: config folder and an empty collections store."""
+    cloud = os.path.join(root, steamid, 'config', 'cloudstorage')
+    os.makedirs(cloud)
+    with open(os.path.join(cloud, 'cloud-storage-namespace-1.json'), 'w', encoding='utf-8') as f:
+        json.dump([], f)
+
+
+SGDB_ENV_VARS = ('STEAMGRIDDB_API_BASE', 'STEAMGRIDDB_API_KEY')
+
+
+def bench_e2e(args):
+    from mock_steamgriddb import MockSteamGridDB
+    work = tempfile.mkdtemp(prefix='steamulation-e2e-')
+    userdata = os.path.join(work, 'userdata')
+    cache_dir = os.path.join(work, 'cache')
+    os.makedirs(cache_dir)
+    steamid = '12345678'
+    build_userdata(userdata, steamid)
+    main.get_steam_userdata_path = lambda: userdata
+    main.get_icons_cache_dir = lambda: cache_dir
+    # A private config store (no atexit flush) and no API overrides from the environment,
+    # so the run always talks to the mock and never touches the real config
+    saved_store, saved_env = main._config_store, {k: os.environ.pop(k, None) for k in SGDB_ENV_VARS}
+    store = main._config_store = main.ConfigStore(os.path.join(work, 'config.json'))
+    mock = MockSteamGridDB(latency=args.latency_ms / 1000.0, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, image_kb=args.image_kb).start()
+    store.update({'steamgriddb_api_base': mock.api_base, 'steamgriddb_api_key': 'benchmark',
+                              'steamgriddb_requests_per_second': args.rps, 'artwork_max_workers': args.workers})
+    games = [{'display_name': f"Synthetic Game {i}", 'path': f"E:/roms/Synthetic Game {i} [v0].nsp"}
+             for i in range(args.games)]
+    print(f"End to end: {args.games} games, {args.workers} workers, {args.rps} req/s limit, "
+          f"{args.latency_ms} ms latency, {args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} 429s")
+
+    def run(label):
+        before = dict(mock.stats)
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.add_steam_shortcuts('C:/Emulators/eden/eden.exe', 'Switch', games, steamid, fetch_icons=True)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        requests = mock.stats['requests'] - before['requests']
+        retried = (mock.stats['errors'] + mock.stats['rate_limited']) - (before['errors'] + before['rate_limited'])
+        print(f"  {label:<10} {elapsed:7.2f} s  {len(games) / elapsed:8.1f} games/s  "
+              f"{requests / len(games):5.2f} requests/game ({retried} errors/429s)  peak {peak / (1024 * 1024):6.1f} MB")
+
+    try:
+        run('cold')
+        run('warm')
+        grid = os.path.join(userdata, steamid, 'config', 'grid')
+        print(f"  {len(os.listdir(grid))} grid files for {len(games)} games")
+    finally:
+        mock.stop()
+        store.flush()  # settle the pending save before its folder is removed
+        main._config_store = saved_store
+        for key, value in saved_env.items():
+            if value is not None:
+                os.environ[key] = value
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Steamulation benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+    scan = sub.add_parser('scan', help='ROM folder scanning')
+    scan.add_argument('--dirs', type=int, default=400)
+    scan.add_argument('--files', type=int, default=50)
+    scan.add_argument('--depth', type=int, default=4)
+    scan.add_argument('--latency-ms', type=float, default=2.0)
+    scan.set_defaults(func=bench_scan)
+    switch = sub.add_parser('switch', help='reading NSP/XCI headers to find base games')
+    switch.add_argument('--titles', type=int, default=5000)
+    switch.add_argument('--payload-kb', type=float, default=256)
+    switch.set_defaults(func=bench_switch)
+    merge = sub.add_parser('merge', help='merging games into existing shortcuts')
+    merge.add_argument('--existing', type=int, default=10000)
+    merge.add_argument('--games', type=int, default=5000)
+    merge.set_defaults(func=bench_merge)
+    collections = sub.add_parser('collections', help='adding appids to Steam collections')
+    collections.add_argument('--collections', type=int, default=20)
+    collections.add_argument('--members', type=int, default=20000)
+    collections.add_argument('--new', type=int, default=2000)
+    collections.set_defaults(func=bench_collections)
+    vdf_cmd = sub.add_parser('vdf', help='reading and writing shortcuts.vdf')
+    vdf_cmd.add_argument('--shortcuts', type=int, default=5000)
+    vdf_cmd.add_argument('--tags', type=int, default=40)
+    vdf_cmd.add_argument('--changed', type=int, default=50)
+    vdf_cmd.set_defaults(func=bench_vdf)
+    e2e = sub.add_parser('e2e', help='add_steam_shortcuts with artwork against a local mock SteamGridDB')
+    e2e.add_argument('--games', type=int, default=200)
+    e2e.add_argument('--workers', type=int, default=8)
+    e2e.add_argument('--rps', type=float, default=50, help='API requests per second allowed by the client')
+    e2e.add_argument('--latency-ms', type=float, default=30.0)
+    e2e.add_argument('--error-rate', type=float, default=0.0)
+    e2e.add_argument('--rate-limit-rate', type=float, default=0.0)
+    e2e.add_argument('--image-kb', type=float, default=200)
+    e2e.set_defaults(func=bench_e2e)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
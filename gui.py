@@ -0,0 +1,428 @@
+"""PyQt5 wizard pages. main.py imports this module only when the wizard is opened."""
+import os
+import threading
+from PyQt5.QtCore import Qt, QThread, QModelIndex, QAbstractListModel, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QWizard, QWizardPage, QFileDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QCheckBox, QGroupBox, QHBoxLayout, QListView
+
+from main import (get_config, guess_platform_from_exe, get_steam_users, get_rom_scan_settings, iter_rom_batches,
+                  identify_roms, group_switch_titles, get_rom_hash_cache, save_rom_hash_cache, apply_shortcut_plan)
+
+
+class EmulatorPage(QWizardPage):
+    def __init__(self):
+        super().__init__()
+        self.setTitle('Select Emulator')
+        layout = QVBoxLayout()
+        self.exe_path = QLineEdit()
+        browse_btn = QPushButton('Browse...')
+        browse_btn.clicked.connect(self.browse)
+        layout.addWidget(QLabel('Emulator .exe:'))
+        layout.addWidget(self.exe_path)
+        layout.addWidget(browse_btn)
+        self.setLayout(layout)
+        self.exe_path.textChanged.connect(self.autofill_platform)
+        # Autofill from config
+        from PyQt5.QtCore import QTimer
+        config = get_config()
+        if config.get('last_emulator'):
+            self.exe_path.setText(config.get('last_emulator'))
+            # Delay autofill to ensure wizard/pages are fully initialized
+            QTimer.singleShot(0, self.autofill_platform)
+
+    def browse(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Select Emulator Executable', '', 'Executables (*.exe)')
+        if path:
+            self.exe_path.setText(path)
+
+    def autofill_platform(self):
+        exe = self.exe_path.text().lower()
+        guess = guess_platform_from_exe(exe)
+        # Set the platform name on the PlatformPage if not already filled
+        wizard = self.wizard()
+        if wizard:
+            platform_page = wizard.page(2)  # Defensive: check type before access
+            if hasattr(platform_page, 'platform_name'):
+                if platform_page.platform_name.text().strip() == '':
+                    platform_page.platform_name.setText(guess)
+
+
+class RomsPage(QWizardPage):
+    def __init__(self):
+        super().__init__()
+        self.setTitle('Select ROMs Folder')
+        layout = QVBoxLayout()
+        self.roms_path = QLineEdit()
+        browse_btn = QPushButton('Browse...')
+        browse_btn.clicked.connect(self.browse)
+        layout.addWidget(QLabel('ROMs Folder:'))
+        layout.addWidget(self.roms_path)
+        layout.addWidget(browse_btn)
+        self.setLayout(layout)
+        # Autofill from config
+        config = get_config()
+        if config.get('last_roms'):
+            self.roms_path.setText(config.get('last_roms'))
+    def browse(self):
+        path = QFileDialog.getExistingDirectory(self, 'Select ROMs Folder')
+        if path:
+            self.roms_path.setText(path)
+
+class PlatformPage(QWizardPage):
+    def __init__(self):
+        super().__init__()
+        self.setTitle('Platform Name')
+        layout = QVBoxLayout()
+        self.platform_name = QLineEdit()
+        layout.addWidget(QLabel('Platform Name (e.g., SNES, PS2):'))
+        layout.addWidget(self.platform_name)
+        self.setLayout(layout)
+
+
+class LaunchOptionsPage(QWizardPage):
+    def __init__(self):
+        super().__init__()
+        self.setTitle('Launch Options')
+        layout = QVBoxLayout()
+        self.launch_options = QLineEdit()
+        layout.addWidget(QLabel('Launch Options (use #rom as placeholder for ROM path):'))
+        layout.addWidget(self.launch_options)
+        layout.addWidget(QLabel('Example: -f -g #rom'))
+        self.setLayout(layout)
+        # Autofill from config
+        config = get_config()
+        if config.get('last_launch_options'):
+            self.launch_options.setText(config.get('last_launch_options'))
+        else:
+            # Default value for first run
+            self.launch_options.setText('#rom')
+
+
+class IconOptionsPage(QWizardPage):
+    def __init__(self):
+        super().__init__()
+        self.setTitle('Icon Options')
+        layout = QVBoxLayout()
+        
+        # Fetch icons checkbox
+        self.fetch_icons_check = QCheckBox('Fetch game icons from SteamGridDB')
+        layout.addWidget(self.fetch_icons_check)
+        
+        # API key field
+        layout.addWidget(QLabel('\nSteamGridDB API Key (optional):'))
+        self.api_key_input = QLineEdit()
+        self.api_key_input.setEchoMode(QLineEdit.Password)
+        self.api_key_input.setPlaceholderText('Enter your API key here')
+        layout.addWidget(self.api_key_input)
+        
+        # Show/Hide password button
+        show_key_layout = QHBoxLayout()
+        self.show_key_check = QCheckBox('Show API key')
+        self.show_key_check.stateChanged.connect(self.toggle_key_visibility)
+        show_key_layout.addWidget(self.show_key_check)
+        show_key_layout.addStretch()
+        layout.addLayout(show_key_layout)
+        
+        # Instructions
+        instructions = QLabel(
+            'To fetch game icons, you need a free SteamGridDB API key.\n'
+            'Get your API key at: https://www.steamgriddb.com/profile/preferences/api\n\n'
+            'Note: Icon fetching is optional. Games will be added without icons if disabled.'
+        )
+        instructions.setWordWrap(True)
+        instructions.setStyleSheet('color: #666; font-size: 9pt;')
+        layout.addWidget(instructions)
+        
+        layout.addStretch()
+        self.setLayout(layout)
+        
+        # Load saved settings
+        config = get_config()
+        self.fetch_icons_check.setChecked(config.get('fetch_icons', True))
+        if config.get('steamgriddb_api_key'):
+            self.api_key_input.setText(config.get('steamgriddb_api_key'))
+    
+    def toggle_key_visibility(self, state):
+        if state:
+            self.api_key_input.setEchoMode(QLineEdit.Normal)
+        else:
+            self.api_key_input.setEchoMode(QLineEdit.Password)
+
+
+class GameListModel(QAbstractListModel):
+    """List model for found games that grows as scan batches arrive."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.games = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.games)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        game = self.games[index.row()]
+        if role == Qt.DisplayRole:
+            return game['display_name']
+        if role == Qt.ToolTipRole:
+            return game['path']
+        return None
+
+    def append_games(self, games):
+        if not games:
+            return
+        first = len(self.games)
+        self.beginInsertRows(QModelIndex(), first, first + len(games) - 1)
+        self.games.extend(games)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.games = []
+        self.endResetModel()
+
+class RomScanWorker(QThread):
+    """Runs the ROM scan off the GUI thread and emits found games in batches."""
+    batch_found = pyqtSignal(list)
+    scan_finished = pyqtSignal(bool)  # True when the whole tree was scanned
+
+    def __init__(self, roms_folder, platform=None, parent=None):
+        super().__init__(parent)
+        self.roms_folder = roms_folder
+        self.platform = platform
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        max_workers, max_depth = get_rom_scan_settings()
+        identify = bool(get_config().get('rom_identify', False))
+        seen_titles = set()  # Switch title IDs already shown, so each game appears once
+        hash_cache = get_rom_hash_cache() if identify else None  # Loaded once, saved after the scan
+        try:
+            for batch in iter_rom_batches(self.roms_folder, self.platform, max_depth=max_depth, max_workers=max_workers,
+                                          cancel_event=self.cancel_event, flush_interval=0.05):
+                batch = group_switch_titles(batch, seen_titles)
+                if identify:
+                    identify_roms(batch, hash_cache=hash_cache)
+                self.batch_found.emit(batch)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+        if hash_cache is not None:
+            save_rom_hash_cache(hash_cache)
+        self.scan_finished.emit(not self.cancel_event.is_set())
+
+    def cancel(self):
+        self.cancel_event.set()
+
+class SummaryPage(QWizardPage):
+    def __init__(self, wizard):
+        super().__init__()
+        self.setTitle('ROMs Found')
+        self.wizard = wizard
+        self.layout = QVBoxLayout()
+        self.rom_model = GameListModel(self)
+        self.rom_list = QListView()
+        self.rom_list.setUniformItemSizes(True)  # Lets the view skip measuring every row
+        self.rom_list.setModel(self.rom_model)
+        self.layout.addWidget(QLabel('Games detected:'))
+        self.layout.addWidget(self.rom_list)
+        scan_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        scan_layout.addWidget(self.status_label, 1)
+        self.cancel_scan_btn = QPushButton('Cancel Scan')
+        self.cancel_scan_btn.clicked.connect(self.stop_scan)
+        self.cancel_scan_btn.setVisible(False)
+        scan_layout.addWidget(self.cancel_scan_btn)
+        self.layout.addLayout(scan_layout)
+        self.setLayout(self.layout)
+        self.scan_worker = None
+        # Connect once here; initializePage runs again every time the user comes back to this page
+        self.wizard.button(QWizard.CustomButton1).clicked.connect(self.save_shortcuts)
+        # Mark this as the final page
+        self.setFinalPage(True)
+    
+    def initializePage(self):
+        # Hide Cancel button on this page
+        self.wizard.button(QWizard.CancelButton).setVisible(False)
+        # Change Finish button text to "Close"
+        self.wizard.button(QWizard.FinishButton).setText('Close')
+        # Create custom "Add to Steam Library" button in place of Next/Finish
+        self.wizard.button(QWizard.CustomButton1).setText('Add to Steam Library')
+        self.wizard.button(QWizard.CustomButton1).setVisible(True)
+        # Set button layout: [Back] [Finish->Close] ... [CustomButton1->Add to Steam]
+        self.wizard.setOption(QWizard.HaveCustomButton1, True)
+
+        # Scan for ROMs in the background; rows appear as batches come in
+        roms_folder = self.wizard.page(3).roms_path.text()  # RomsPage is at index 3
+        platform = self.wizard.page(2).platform_name.text()  # Picks the ROM recognizer
+        self.stop_scan()
+        self.rom_model.clear()
+        self.wizard.found_games = []
+        self.wizard.button(QWizard.CustomButton1).setEnabled(False)
+        self.status_label.setText("Scanning for games...")
+        self.cancel_scan_btn.setVisible(True)
+        self.scan_worker = RomScanWorker(roms_folder, platform, self)
+        self.scan_worker.batch_found.connect(self.add_scan_batch)
+        self.scan_worker.scan_finished.connect(self.scan_finished)
+        self.scan_worker.start()
+
+    def cleanupPage(self):
+        # Going Back: stop scanning a folder the user is about to change
+        self.stop_scan()
+        super().cleanupPage()
+
+    def stop_scan(self):
+        """Cancel a running scan and wait for the worker thread to exit."""
+        worker = self.scan_worker
+        if worker is None:
+            return
+        self.scan_worker = None
+        worker.batch_found.disconnect(self.add_scan_batch)
+        worker.scan_finished.disconnect(self.scan_finished)
+        worker.cancel()
+        worker.wait()
+        worker.deleteLater()
+        self.scan_done(False)
+
+    def add_scan_batch(self, games):
+        self.rom_model.append_games(games)
+        self.status_label.setText(f"Scanning for games... {len(self.rom_model.games)} found")
+
+    def scan_finished(self, complete):
+        worker = self.scan_worker
+        self.scan_worker = None
+        if worker is not None:
+            worker.wait()
+            worker.deleteLater()
+        self.scan_done(complete)
+
+    def scan_done(self, complete):
+        self.cancel_scan_btn.setVisible(False)
+        # Same order as scrape_roms, so shortcuts are written in a stable order
+        self.wizard.found_games = sorted(self.rom_model.games, key=lambda g: g['path'])
+        self.wizard.button(QWizard.CustomButton1).setEnabled(True)
+        count = len(self.rom_model.games)
+        self.status_label.setText(f"{count} games found" if complete else f"Scan cancelled, {count} games found")
+
+    def save_shortcuts(self):
+        emulator = self.wizard.page(1).exe_path.text()
+        platform = self.wizard.page(2).platform_name.text()
+        launch_options = self.wizard.page(4).launch_options.text()  # LaunchOptionsPage is at index 4
+        fetch_icons = self.wizard.page(5).fetch_icons_check.isChecked()  # IconOptionsPage is at index 5
+        api_key = self.wizard.page(5).api_key_input.text().strip()  # Get API key from IconOptionsPage
+        games = self.wizard.found_games
+        steamids = self.wizard.page(0).selected_steamids()
+        
+        # Validation
+        if not emulator or not os.path.exists(emulator):
+            self.status_label.setText("Error: Invalid emulator path")
+            return
+        if not platform.strip():
+            self.status_label.setText("Error: Platform name required")
+            return
+        if not games:
+            self.status_label.setText("Error: No games found")
+            return
+        if not steamids:
+            self.status_label.setText("Error: No Steam user selected")
+            return
+        
+        # Save last used paths
+        values = {
+            'last_emulator': emulator,
+            'last_roms': self.wizard.page(3).roms_path.text(),
+            'last_launch_options': launch_options,
+            'fetch_icons': fetch_icons,
+        }
+        if api_key:
+            values['steamgriddb_api_key'] = api_key
+        if steamids:
+            values['last_steamid'] = steamids[0]
+        get_config().update(values)
+        
+        # Disable button during processing
+        self.wizard.button(QWizard.CustomButton1).setEnabled(False)
+        self.status_label.setText("Starting...")
+        QApplication.processEvents()  # Update UI
+        
+        try:
+            plan = [{
+                'emulator': emulator,
+                'platform': platform.strip(),
+                'games': games,
+                'launch_options': launch_options,
+            }]
+            # All selected users in one pass: each user's files are read and written once
+            count = apply_shortcut_plan(plan, steamids, fetch_icons, progress_callback=self.update_progress)
+            self.status_label.setText(f"✓ Successfully added/updated {count} shortcuts to Steam!")
+        except Exception as e:
+            import traceback
+            error_details = traceback.format_exc()
+            print(error_details)  # Print full traceback to console
+            self.status_label.setText(f"Error: {str(e)[:100]}...")  # Show truncated error
+        finally:
+            # Re-enable button
+            self.wizard.button(QWizard.CustomButton1).setEnabled(True)
+    
+    def update_progress(self, message):
+        """Update the status label with progress messages."""
+        self.status_label.setText(message)
+        QApplication.processEvents()  # Force UI update
+
+
+class SteamUserPage(QWizardPage):
+    def __init__(self):
+        super().__init__()
+        self.setTitle('Select Steam User(s)')
+        layout = QVBoxLayout()
+        self.user_checks = []
+        self.user_group = QGroupBox('Steam Users')
+        self.user_layout = QVBoxLayout()
+        self.user_group.setLayout(self.user_layout)
+        layout.addWidget(self.user_group)
+        self.setLayout(layout)
+
+    def initializePage(self):
+        # Clear previous
+        for i in reversed(range(self.user_layout.count())):
+            widget = self.user_layout.itemAt(i).widget()
+            if widget:
+                widget.setParent(None)
+        self.user_checks = []
+        users = get_steam_users()
+        last_user = get_config().get('last_steamid')
+        for user in users:
+            cb = QCheckBox(f"{user['personaname']} ({user['steamid']})")
+            cb.steamid = user['steamid']
+            if last_user and user['steamid'] == last_user:
+                cb.setChecked(True)
+            self.user_layout.addWidget(cb)
+            self.user_checks.append(cb)
+        # If no last user, check the first by default
+        if users and not any(cb.isChecked() for cb in self.user_checks):
+            self.user_checks[0].setChecked(True)
+
+    def selected_steamids(self):
+        return [cb.steamid for cb in self.user_checks if cb.isChecked()]
+
+
+class SteamEmuWizard(QWizard):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Steamulation Wizard')
+        # Enable custom button but hide it by default
+        self.setOption(QWizard.HaveCustomButton1, True)
+        self.button(QWizard.CustomButton1).setVisible(False)
+        self.addPage(SteamUserPage())           # Index 0
+        self.addPage(EmulatorPage())            # Index 1
+        self.addPage(PlatformPage())            # Index 2
+        self.addPage(RomsPage())                # Index 3
+        self.addPage(LaunchOptionsPage())       # Index 4
+        self.addPage(IconOptionsPage())         # Index 5
+        self.addPage(SummaryPage(self))         # Index 6
+        self.found_games = []
+
+    def done(self, result):
+        # Don't let the window close while a scan thread is still running
+        self.page(6).stop_scan()
+        super().done(result)
@@ -2,333 +2,140 @@ import sys
 import json
 import time
 import os
-import getpass
-from PyQt5.QtWidgets import QApplication, QWizard, QWizardPage, QFileDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QCheckBox, QRadioButton, QButtonGroup, QGroupBox, QHBoxLayout
+import copy
+import re
+import threading
 
 
-class EmulatorPage(QWizardPage):
-    def __init__(self):
-        super().__init__()
-        self.setTitle('Select Emulator')
-        layout = QVBoxLayout()
-        self.exe_path = QLineEdit()
-        browse_btn = QPushButton('Browse...')
-        browse_btn.clicked.connect(self.browse)
-        layout.addWidget(QLabel('Emulator .exe:'))
-        layout.addWidget(self.exe_path)
-        layout.addWidget(browse_btn)
-        self.setLayout(layout)
-        self.exe_path.textChanged.connect(self.autofill_platform)
-        # Autofill from config
-        from PyQt5.QtCore import QTimer
-        config = load_config()
-        if config.get('last_emulator'):
-            self.exe_path.setText(config['last_emulator'])
-            # Delay autofill to ensure wizard/pages are fully initialized
-            QTimer.singleShot(0, self.autofill_platform)
-
-    def browse(self):
-        path, _ = QFileDialog.getOpenFileName(self, 'Select Emulator Executable', '', 'Executables (*.exe)')
-        if path:
-            self.exe_path.setText(path)
-
-    def autofill_platform(self):
-        exe = self.exe_path.text().lower()
-        guess = guess_platform_from_exe(exe)
-        # Set the platform name on the PlatformPage if not already filled
-        wizard = self.wizard()
-        if wizard:
-            platform_page = wizard.page(2)  # Defensive: check type before access
-            if hasattr(platform_page, 'platform_name'):
-                if platform_page.platform_name.text().strip() == '':
-                    platform_page.platform_name.setText(guess)
+# --- Emulator -> platform mapping ---
 def get_mapping_path():
     return os.path.join(os.path.dirname(__file__), 'emulator_platform_map.json')
 
-def load_mapping():
+# Default mapping if the file doesn't exist
+DEFAULT_MAPPING = {
+    "default": {
+        'eden': 'Switch',
+        'yuzu': 'Switch',
+        'ryujinx': 'Switch',
+        'citra': '3DS',
+        'pcsx2': 'PS2',
+        'dolphin': 'GameCube/Wii',
+        'snes9x': 'SNES',
+        'zsnes': 'SNES',
+        'bsnes': 'SNES',
+        'retroarch': 'RetroArch',
+        'mame': 'Arcade',
+        'epsxe': 'PS1',
+        'duckstation': 'PS1',
+        'melonDS': 'DS',
+        'desmume': 'DS',
+        'project64': 'N64',
+        'cemu': 'Wii U',
+        'rpcs3': 'PS3',
+        'xemu': 'Xbox',
+        'cxbx': 'Xbox',
+        'openemu': 'Multi',
+        'mednafen': 'Multi',
+        'fceux': 'NES',
+        'nestopia': 'NES',
+        'visualboyadvance': 'GBA',
+        'mgba': 'GBA',
+        'no$gba': 'GBA',
+        'mupen64': 'N64',
+        'genplus': 'Genesis',
+        'fusion': 'Genesis',
+        'kega': 'Genesis',
+        'ppsspp': 'PSP',
+        'vita3k': 'Vita',
+        'citra-qt': '3DS',
+        'redream': 'Dreamcast',
+        'flycast': 'Dreamcast',
+        'openmsx': 'MSX',
+        'fs-uae': 'Amiga',
+        'vice': 'C64',
+        'higan': 'Multi',
+        'mess': 'Multi',
+    },
+    "custom": {}
+}
+
+_mapping_lock = threading.Lock()
+_mapping_cache = {'mtime': None, 'mapping': None, 'matcher': None, 'guesses': {}}
+MAPPING_GUESS_CACHE_SIZE = 4096
+
+def _read_mapping_file():
     try:
         with open(get_mapping_path(), 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception:
-        # Default mapping if file doesn't exist
-        return {
-            "default": {
-                'eden': 'Switch',
-                'yuzu': 'Switch',
-                'ryujinx': 'Switch',
-                'eden': 'Switch',
-                'citra': '3DS',
-                'pcsx2': 'PS2',
-                'dolphin': 'GameCube/Wii',
-                'snes9x': 'SNES',
-                'zsnes': 'SNES',
-                'bsnes': 'SNES',
-                'retroarch': 'RetroArch',
-                'mame': 'Arcade',
-                'epsxe': 'PS1',
-                'duckstation': 'PS1',
-                'melonDS': 'DS',
-                'desmume': 'DS',
-                'project64': 'N64',
-                'cemu': 'Wii U',
-                'rpcs3': 'PS3',
-                'xemu': 'Xbox',
-                'cxbx': 'Xbox',
-                'openemu': 'Multi',
-                'mednafen': 'Multi',
-                'fceux': 'NES',
-                'nestopia': 'NES',
-                'visualboyadvance': 'GBA',
-                'mgba': 'GBA',
-                'no$gba': 'GBA',
-                'mupen64': 'N64',
-                'genplus': 'Genesis',
-                'fusion': 'Genesis',
-                'kega': 'Genesis',
-                'ppsspp': 'PSP',
-                'vita3k': 'Vita',
-                'citra-qt': '3DS',
-                'redream': 'Dreamcast',
-                'flycast': 'Dreamcast',
-                'openmsx': 'MSX',
-                'fs-uae': 'Amiga',
-                'vice': 'C64',
-                'higan': 'Multi',
-                'mess': 'Multi',
-            },
-            "custom": {}
-        }
+        return copy.deepcopy(DEFAULT_MAPPING)
+
+def _mapping_mtime():
+    try:
+        return os.stat(get_mapping_path()).st_mtime_ns
+    except OSError:
+        return None
+
+def compile_mapping_matcher(mapping):
+    """One regex for the whole mapping: custom keys win over default ones, and
+    within each group the longest key matching at the leftmost position wins."""
+    platforms = {}
+    groups = []
+    for section in ('custom', 'default'):
+        keys = []
+        for key, value in mapping.get(section, {}).items():
+            key = key.lower()
+            if key and key not in platforms:
+                platforms[key] = value
+                keys.append(key)
+        if keys:
+            keys.sort(key=len, reverse=True)
+            groups.append('.*?(' + '|'.join(re.escape(k) for k in keys) + ')')
+    if not groups:
+        return None, platforms
+    return re.compile('(?:' + '|'.join(groups) + ')', re.DOTALL), platforms
+
+def _get_mapping_state():
+    # Reload only when the file on disk changed; callers hold _mapping_lock
+    mtime = _mapping_mtime()
+    if _mapping_cache['mapping'] is None or mtime != _mapping_cache['mtime']:
+        mapping = _read_mapping_file()
+        _mapping_cache['mtime'] = mtime
+        _mapping_cache['mapping'] = mapping
+        _mapping_cache['matcher'] = compile_mapping_matcher(mapping)
+        _mapping_cache['guesses'] = {}
+    return _mapping_cache
+
+def load_mapping():
+    with _mapping_lock:
+        return copy.deepcopy(_get_mapping_state()['mapping'])
 
 def save_mapping(mapping):
     with open(get_mapping_path(), 'w', encoding='utf-8') as f:
         json.dump(mapping, f, indent=2)
+    with _mapping_lock:
+        _mapping_cache['mapping'] = None
 
 def guess_platform_from_exe(exe):
-    mapping = load_mapping()
     exe_base = os.path.basename(exe).lower()
     exe_key = os.path.splitext(exe_base)[0]
-    # Check custom first
-    for key, value in mapping.get('custom', {}).items():
-        if key in exe_key:
-            return value
-    # Then default
-    for key, value in mapping.get('default', {}).items():
-        if key in exe_key:
-            return value
-    # Fallback: use filename without extension, capitalized
-    name = exe_key.capitalize()
-    return name
-
-
-class RomsPage(QWizardPage):
-    def __init__(self):
-        super().__init__()
-        self.setTitle('Select ROMs Folder')
-        layout = QVBoxLayout()
-        self.roms_path = QLineEdit()
-        browse_btn = QPushButton('Browse...')
-        browse_btn.clicked.connect(self.browse)
-        layout.addWidget(QLabel('ROMs Folder:'))
-        layout.addWidget(self.roms_path)
-        layout.addWidget(browse_btn)
-        self.setLayout(layout)
-        # Autofill from config
-        config = load_config()
-        if config.get('last_roms'):
-            self.roms_path.setText(config['last_roms'])
-    def browse(self):
-        path = QFileDialog.getExistingDirectory(self, 'Select ROMs Folder')
-        if path:
-            self.roms_path.setText(path)
-
-class PlatformPage(QWizardPage):
-    def __init__(self):
-        super().__init__()
-        self.setTitle('Platform Name')
-        layout = QVBoxLayout()
-        self.platform_name = QLineEdit()
-        layout.addWidget(QLabel('Platform Name (e.g., SNES, PS2):'))
-        layout.addWidget(self.platform_name)
-        self.setLayout(layout)
-
-
-class LaunchOptionsPage(QWizardPage):
-    def __init__(self):
-        super().__init__()
-        self.setTitle('Launch Options')
-        layout = QVBoxLayout()
-        self.launch_options = QLineEdit()
-        layout.addWidget(QLabel('Launch Options (use #rom as placeholder for ROM path):'))
-        layout.addWidget(self.launch_options)
-        layout.addWidget(QLabel('Example: -f -g #rom'))
-        self.setLayout(layout)
-        # Autofill from config
-        config = load_config()
-        if config.get('last_launch_options'):
-            self.launch_options.setText(config['last_launch_options'])
-        else:
-            # Default value for first run
-            self.launch_options.setText('#rom')
-
-
-class IconOptionsPage(QWizardPage):
-    def __init__(self):
-        super().__init__()
-        self.setTitle('Icon Options')
-        layout = QVBoxLayout()
-        
-        # Fetch icons checkbox
-        self.fetch_icons_check = QCheckBox('Fetch game icons from SteamGridDB')
-        layout.addWidget(self.fetch_icons_check)
-        
-        # API key field
-        layout.addWidget(QLabel('\nSteamGridDB API Key (optional):'))
-        self.api_key_input = QLineEdit()
-        self.api_key_input.setEchoMode(QLineEdit.Password)
-        self.api_key_input.setPlaceholderText('Enter your API key here')
-        layout.addWidget(self.api_key_input)
-        
-        # Show/Hide password button
-        show_key_layout = QHBoxLayout()
-        self.show_key_check = QCheckBox('Show API key')
-        self.show_key_check.stateChanged.connect(self.toggle_key_visibility)
-        show_key_layout.addWidget(self.show_key_check)
-        show_key_layout.addStretch()
-        layout.addLayout(show_key_layout)
-        
-        # Instructions
-        instructions = QLabel(
-            'To fetch game icons, you need a free SteamGridDB API key.\n'
-            'Get your API key at: https://www.steamgriddb.com/profile/preferences/api\n\n'
-            'Note: Icon fetching is optional. Games will be added without icons if disabled.'
-        )
-        instructions.setWordWrap(True)
-        instructions.setStyleSheet('color: #666; font-size: 9pt;')
-        layout.addWidget(instructions)
-        
-        layout.addStretch()
-        self.setLayout(layout)
-        
-        # Load saved settings
-        config = load_config()
-        self.fetch_icons_check.setChecked(config.get('fetch_icons', True))
-        if config.get('steamgriddb_api_key'):
-            self.api_key_input.setText(config['steamgriddb_api_key'])
-    
-    def toggle_key_visibility(self, state):
-        if state:
-            self.api_key_input.setEchoMode(QLineEdit.Normal)
+    with _mapping_lock:
+        state = _get_mapping_state()
+        guesses = state['guesses']
+        guess = guesses.get(exe_key)
+        if guess is not None:
+            return guess
+        regex, platforms = state['matcher']
+        m = regex.match(exe_key) if regex else None
+        if m:
+            guess = platforms[m.group(m.lastindex)]
         else:
-            self.api_key_input.setEchoMode(QLineEdit.Password)
-
-
-import re
-from PyQt5.QtWidgets import QListWidget, QListWidgetItem
-
-class SummaryPage(QWizardPage):
-    def __init__(self, wizard):
-        super().__init__()
-        self.setTitle('ROMs Found')
-        self.wizard = wizard
-        self.layout = QVBoxLayout()
-        self.rom_list = QListWidget()
-        self.layout.addWidget(QLabel('Games detected:'))
-        self.layout.addWidget(self.rom_list)
-        self.status_label = QLabel()
-        self.layout.addWidget(self.status_label)
-        self.setLayout(self.layout)
-        # Mark this as the final page
-        self.setFinalPage(True)
-    
-    def initializePage(self):
-        # Hide Cancel button on this page
-        self.wizard.button(QWizard.CancelButton).setVisible(False)
-        # Change Finish button text to "Close"
-        self.wizard.button(QWizard.FinishButton).setText('Close')
-        # Create custom "Add to Steam Library" button in place of Next/Finish
-        self.wizard.button(QWizard.CustomButton1).setText('Add to Steam Library')
-        self.wizard.button(QWizard.CustomButton1).setVisible(True)
-        self.wizard.button(QWizard.CustomButton1).clicked.connect(self.save_shortcuts)
-        # Set button layout: [Back] [Finish->Close] ... [CustomButton1->Add to Steam]
-        self.wizard.setOption(QWizard.HaveCustomButton1, True)
-
-        # Scan for ROMs
-        roms_folder = self.wizard.page(3).roms_path.text()  # RomsPage is at index 3
-        games = scrape_roms(roms_folder)
-        self.rom_list.clear()
-        for game in games:
-            item = QListWidgetItem(game['display_name'])
-            item.setToolTip(game['path'])
-            self.rom_list.addItem(item)
-        self.wizard.found_games = games
-        self.status_label.setText("")
-
-    def save_shortcuts(self):
-        emulator = self.wizard.page(1).exe_path.text()
-        platform = self.wizard.page(2).platform_name.text()
-        launch_options = self.wizard.page(4).launch_options.text()  # LaunchOptionsPage is at index 4
-        fetch_icons = self.wizard.page(5).fetch_icons_check.isChecked()  # IconOptionsPage is at index 5
-        api_key = self.wizard.page(5).api_key_input.text().strip()  # Get API key from IconOptionsPage
-        games = self.wizard.found_games
-        steamids = self.wizard.page(0).selected_steamids()
-        
-        # Validation
-        if not emulator or not os.path.exists(emulator):
-            self.status_label.setText("Error: Invalid emulator path")
-            return
-        if not platform.strip():
-            self.status_label.setText("Error: Platform name required")
-            return
-        if not games:
-            self.status_label.setText("Error: No games found")
-            return
-        if not steamids:
-            self.status_label.setText("Error: No Steam user selected")
-            return
-        
-        # Save last used paths
-        config = load_config()
-        config['last_emulator'] = emulator
-        config['last_roms'] = self.wizard.page(3).roms_path.text()
-        config['last_launch_options'] = launch_options
-        config['fetch_icons'] = fetch_icons
-        if api_key:
-            config['steamgriddb_api_key'] = api_key
-        if steamids:
-            config['last_steamid'] = steamids[0]
-        save_config(config)
-        
-        # Disable button during processing
-        self.wizard.button(QWizard.CustomButton1).setEnabled(False)
-        self.status_label.setText("Starting...")
-        QApplication.processEvents()  # Update UI
-        
-        try:
-            count = 0
-            for steamid in steamids:
-                count += add_steam_shortcuts(
-                    emulator, 
-                    platform.strip(), 
-                    games, 
-                    steamid, 
-                    launch_options, 
-                    fetch_icons,
-                    progress_callback=self.update_progress
-                )
-            self.status_label.setText(f"✓ Successfully added/updated {count} shortcuts to Steam!")
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(error_details)  # Print full traceback to console
-            self.status_label.setText(f"Error: {str(e)[:100]}...")  # Show truncated error
-        finally:
-            # Re-enable button
-            self.wizard.button(QWizard.CustomButton1).setEnabled(True)
-    
-    def update_progress(self, message):
-        """Update the status label with progress messages."""
-        self.status_label.setText(message)
-        QApplication.processEvents()  # Force UI update
+            # Fallback: use filename without extension, capitalized
+            guess = exe_key.capitalize()
+        if len(guesses) >= MAPPING_GUESS_CACHE_SIZE:
+            guesses.clear()
+        guesses[exe_key] = guess
+        return guess
 
 def get_icons_cache_dir():
     """Get or create the icons cache directory."""
@@ -342,17 +149,865 @@ def sanitize_filename(name):
     # Remove invalid filename characters
     return re.sub(r'[<>:"/\\|?*]', '_', name)
 
+# --- Artwork download engine ---
+from urllib.parse import urlsplit
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+DEFAULT_STEAMGRIDDB_API_BASE = 'https://www.steamgriddb.com/api/v2'
+DEFAULT_ARTWORK_WORKERS = 8
+DEFAULT_STEAMGRIDDB_RPS = 5
+
+class HostRateLimiter:
+    """Per-host request pacing that also honours 429 Retry-After back-off."""
+
+    def __init__(self, requests_per_second=None):
+        # host -> minimum seconds between two requests to that host
+        self._intervals = {host: 1.0 / rps for host, rps in (requests_per_second or {}).items() if rps}
+        self._next_slot = {}  # host -> time.monotonic() of the next free slot
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Block until a request to host is allowed, reserving the slot."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._intervals.get(host, 0.0)
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def back_off(self, host, seconds):
+        """Hold every request to host for at least the given number of seconds."""
+        with self._lock:
+            resume = time.monotonic() + seconds
+            if resume > self._next_slot.get(host, 0.0):
+                self._next_slot[host] = resume
+
+_http_session = None
+_rate_limiter = None
+_http_lock = threading.Lock()
+
+def get_artwork_max_workers():
+    """Number of games whose artwork is fetched at the same time."""
+    try:
+        return max(1, int(get_config().get('artwork_max_workers', DEFAULT_ARTWORK_WORKERS)))
+    except (TypeError, ValueError):
+        return DEFAULT_ARTWORK_WORKERS
+
+def get_steamgriddb_api_base():
+    """SteamGridDB API root: STEAMGRIDDB_API_BASE, then the config, then the public API
+    (pointing it elsewhere is how mock_steamgriddb.py is used)."""
+    base = os.environ.get('STEAMGRIDDB_API_BASE') or get_config().get('steamgriddb_api_base') or DEFAULT_STEAMGRIDDB_API_BASE
+    return base.rstrip('/')
+
+def get_http_session():
+    """Get the shared, connection-pooled HTTP session (created on first use)."""
+    global _http_session, _rate_limiter
+    with _http_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            config = get_config()
+            # One pool slot per worker for the API host and one for the CDN
+            pool_size = get_artwork_max_workers() * 2
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = DEFAULT_USER_AGENT
+            rps = config.get('steamgriddb_requests_per_second', DEFAULT_STEAMGRIDDB_RPS)
+            _rate_limiter = HostRateLimiter({urlsplit(get_steamgriddb_api_base()).netloc: rps})
+            _http_session = session
+    return _http_session
+
+def _parse_retry_after(value, default):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except Exception:
+        return default
+
+def http_get(url, headers=None, timeout=10, max_retries=3, **kwargs):
+    """GET through the shared session, pacing per host and retrying on HTTP 429."""
+    session = get_http_session()
+    host = urlsplit(url).netloc
+    for attempt in range(max_retries + 1):
+        _rate_limiter.wait(host)
+        response = session.get(url, headers=headers, timeout=timeout, **kwargs)
+        if response.status_code != 429 or attempt == max_retries:
+            return response
+        delay = _parse_retry_after(response.headers.get('Retry-After'), default=2 ** attempt)
+        print(f"  Rate limited by {host}, retrying in {delay:.1f}s")
+        response.close()
+        _rate_limiter.back_off(host, delay)
+    return response
+
+# --- SteamGridDB response cache ---
+CACHE_TTL_SEARCH = 30 * 24 * 3600    # search/autocomplete results
+CACHE_TTL_LISTING = 7 * 24 * 3600    # grids/heroes/icons/logos listings
+CACHE_TTL_IMAGE = 180 * 24 * 3600    # downloaded image files
+DEFAULT_ARTWORK_CACHE_MB = 512
+
+def normalize_game_name(name):
+    """Normalize a game name for use as a cache key."""
+    return ' '.join(name.casefold().split())
+
+class CachedResponse:
+    """Minimal response object returned by cached_get (cache hits have no socket)."""
+
+    def __init__(self, status_code, content=b'', from_cache=False):
+        self.status_code = status_code
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+class ArtworkCache:
+    """
+    On-disk cache for SteamGridDB search results, artwork listings and images.
+    Bodies are content-addressed: each is stored once as objects/<sha256[:2]>/<sha256>,
+    however many keys (or Steam users' grid folders, via hardlinks) refer to it.
+    index.json maps keys to objects with their expiry, validators (ETag/Last-Modified)
+    and last access time; the least recently used entries are evicted above max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+            return entries if isinstance(entries, dict) else {}
+        except Exception:
+            return {}
+
+    def _data_path(self, relpath):
+        return os.path.join(self.cache_dir, relpath)
+
+    def lookup(self, key):
+        """Return a copy of the entry for key (or None) and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['accessed'] = time.time()
+            self._dirty = True
+            return dict(entry)
+
+    def read(self, key):
+        """Return the cached bytes for key, dropping the entry if its object is gone or corrupt."""
+        import hashlib
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(self._data_path(entry['file']), 'rb') as f:
+                content = f.read()
+        except OSError:
+            self.remove(key)
+            return None
+        # Objects are hardlinked into grid folders, so make sure nobody rewrote one in place
+        if entry.get('sha256') and hashlib.sha256(content).hexdigest() != entry['sha256']:
+            print(f"  Cached object for {key} is corrupt, discarding it")
+            self.remove(key)
+            return None
+        return content
+
+    def object_path(self, key):
+        """Absolute path of the stored object for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return self._data_path(entry['file']) if entry else None
+
+    def store(self, key, content, ttl, etag=None, last_modified=None):
+        import hashlib
+        digest = hashlib.sha256(content).hexdigest()
+        relpath = os.path.join('objects', digest[:2], digest)
+        path = self._data_path(relpath)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        self._add_entry(key, relpath, digest, len(content), ttl, etag, last_modified)
+
+    def store_file(self, key, tmp_path, digest, size, ttl, etag=None, last_modified=None):
+        """Move an already hashed, fully written file into the store under key."""
+        relpath = os.path.join('objects', digest[:2], digest)
+        path = self._data_path(relpath)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        self._add_entry(key, relpath, digest, size, ttl, etag, last_modified)
+        return path
+
+    def partial_path(self, key):
+        """Where an interrupted download for key is kept so it can be resumed."""
+        import hashlib
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'partial', name)
+
+    def _add_entry(self, key, relpath, digest, size, ttl, etag, last_modified):
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                'file': relpath,
+                'sha256': digest,
+                'size': size,
+                'expires': now + ttl,
+                'accessed': now,
+                'etag': etag,
+                'last_modified': last_modified,
+            }
+            self._dirty = True
+        if previous and previous['file'] != relpath:
+            self._release(previous['file'])
+
+    def annotate(self, key, **fields):
+        """Attach extra fields (e.g. the source of a derived image) to an entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry.update(fields)
+                self._dirty = True
+
+    def refresh(self, key, ttl):
+        """Extend an entry's lifetime after a 304 Not Modified revalidation."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry['expires'] = time.time() + ttl
+                self._dirty = True
+
+    def _release(self, relpath):
+        """Delete an object file once no entry refers to it any more."""
+        with self._lock:
+            if any(e['file'] == relpath for e in self._entries.values()):
+                return
+        try:
+            os.remove(self._data_path(relpath))
+        except OSError:
+            pass
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._dirty = True
+        if entry:
+            self._release(entry['file'])
+
+    def evict(self):
+        """Drop least recently used entries until the stored objects fit in max_bytes."""
+        with self._lock:
+            refs = {}
+            for entry in self._entries.values():
+                refs[entry['file']] = refs.get(entry['file'], 0) + 1
+            total = sum(e.get('size', 0) for e in {e['file']: e for e in self._entries.values()}.values())
+            if total <= self.max_bytes:
+                return 0
+            victims = []
+            for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1].get('accessed', 0)):
+                if total <= self.max_bytes:
+                    break
+                refs[entry['file']] -= 1
+                if refs[entry['file']] == 0:
+                    total -= entry.get('size', 0)
+                victims.append(key)
+        for key in victims:
+            self.remove(key)
+        return len(victims)
+
+    def flush(self):
+        """Evict over-size entries and persist the index if anything changed."""
+        self.evict()
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({'version': 2, 'entries': self._entries}, separators=(',', ':'))
+            self._dirty = False
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.index_path)
+
+def link_or_copy(src, dst):
+    """Hardlink src to dst, falling back to a copy where links are not possible (FAT/exFAT, other drive)."""
+    import shutil
+    tmp_path = f"{dst}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+_artwork_cache = None
+
+def get_artwork_cache():
+    """Get the process-wide artwork cache stored in the icon_cache folder."""
+    global _artwork_cache
+    with _http_lock:
+        if _artwork_cache is None:
+            try:
+                max_mb = float(get_config().get('artwork_cache_max_mb', DEFAULT_ARTWORK_CACHE_MB))
+            except (TypeError, ValueError):
+                max_mb = DEFAULT_ARTWORK_CACHE_MB
+            _artwork_cache = ArtworkCache(get_icons_cache_dir(), int(max_mb * 1024 * 1024))
+            import atexit
+            atexit.register(_artwork_cache.flush)
+    return _artwork_cache
+
+def cached_get(url, headers, cache_key, ttl, timeout=10):
+    """
+    GET url through the artwork cache.
+    Fresh entries are served from disk; stale ones are revalidated with
+    If-None-Match/If-Modified-Since and only re-downloaded when they changed.
+    """
+    cache = get_artwork_cache()
+    entry = cache.lookup(cache_key)
+    if entry and entry['expires'] > time.time():
+        content = cache.read(cache_key)
+        if content is not None:
+            return CachedResponse(200, content, from_cache=True)
+        entry = None
+    request_headers = dict(headers or {})
+    if entry:
+        if entry.get('etag'):
+            request_headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['last_modified']
+    response = http_get(url, headers=request_headers, timeout=timeout)
+    if response.status_code == 304 and entry:
+        content = cache.read(cache_key)
+        if content is not None:
+            cache.refresh(cache_key, ttl)
+            return CachedResponse(200, content, from_cache=True)
+        # Cached body vanished between lookup and read; fetch it again
+        response = http_get(url, headers=headers, timeout=timeout)
+    if response.ok:
+        cache.store(cache_key, response.content, ttl,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'))
+        return CachedResponse(response.status_code, response.content)
+    return CachedResponse(response.status_code)
+
+# --- Image downloads ---
+DEFAULT_MAX_IMAGE_MB = 20
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_RESUME_ATTEMPTS = 3
+
+class DownloadError(Exception):
+    pass
+
+class DownloadInterrupted(DownloadError):
+    """The transfer stopped early; the partial file is kept for a Range resume."""
+
+def sniff_image_type(head):
+    """Image format from the first bytes of a file, or None if it isn't a known image."""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'\x00\x00\x01\x00':
+        return 'ico'
+    return None
+
+def image_is_complete(path):
+    """True if path is an image whose end marker is present, i.e. not a truncated download."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(16)
+            kind = sniff_image_type(head)
+            if kind is None:
+                return False
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - 32))
+            tail = f.read()
+    except OSError:
+        return False
+    if kind == 'png':
+        return b'IEND\xaeB`\x82' in tail
+    if kind == 'jpeg':
+        return b'\xff\xd9' in tail
+    if kind == 'webp':
+        return int.from_bytes(head[4:8], 'little') + 8 <= size
+    if kind == 'gif':
+        return tail.rstrip(b'\x00').endswith(b'\x3b')
+    return size > 6
+
+def get_max_image_bytes():
+    try:
+        max_mb = float(get_config().get('artwork_max_image_mb', DEFAULT_MAX_IMAGE_MB))
+    except (TypeError, ValueError):
+        max_mb = DEFAULT_MAX_IMAGE_MB
+    return int(max_mb * 1024 * 1024)
+
+def _read_partial_meta(part_path):
+    try:
+        with open(part_path + '.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _discard_partial(part_path):
+    for path in (part_path, part_path + '.json'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _stream_image(url, headers, part_path, max_bytes, timeout, resume=True):
+    """
+    Download url into part_path, resuming a previous partial file with a Range
+    request when the server still has the same version. Returns the response
+    validators once the body is complete.
+    """
+    meta = _read_partial_meta(part_path) if resume else None
+    offset = os.path.getsize(part_path) if meta and os.path.exists(part_path) else 0
+    request_headers = dict(headers or {})
+    # Ranges and Content-Length count the bytes on the wire, so ask for them uncompressed
+    request_headers.setdefault('Accept-Encoding', 'identity')
+    if offset:
+        request_headers['Range'] = f"bytes={offset}-"
+        validator = meta.get('etag') or meta.get('last_modified')
+        if validator:
+            request_headers['If-Range'] = validator
+    response = http_get(url, headers=request_headers, timeout=timeout, stream=True)
+    try:
+        if response.status_code == 416 and offset:
+            # Our partial copy doesn't fit the file any more; start over
+            response.close()
+            _discard_partial(part_path)
+            return _stream_image(url, headers, part_path, max_bytes, timeout, resume=False)
+        encoding = response.headers.get('Content-Encoding', '').strip().lower()
+        encoded = encoding not in ('', 'identity')
+        if encoded and response.status_code == 206:
+            # A range of the compressed body can't be appended to our decoded partial file
+            response.close()
+            _discard_partial(part_path)
+            return _stream_image(url, headers, part_path, max_bytes, timeout, resume=False)
+        if response.status_code not in (200, 206):
+            raise DownloadError(f"HTTP {response.status_code}")
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and not (content_type.startswith('image/') or content_type == 'application/octet-stream'):
+            raise DownloadError(f"unexpected content type {content_type}")
+        if response.status_code == 200:
+            offset = 0  # full body: the server ignored or rejected the range
+        try:
+            length = int(response.headers.get('Content-Length', ''))
+        except ValueError:
+            length = None
+        if length is not None and not encoded and offset + length > max_bytes:
+            raise DownloadError(f"image is larger than {max_bytes / (1024 * 1024):g} MB")
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        if encoded:
+            _discard_partial(part_path)  # Compressed bodies are downloaded whole, never resumed
+        else:
+            with open(part_path + '.json', 'w', encoding='utf-8') as f:
+                json.dump(dict(validators, url=url), f)
+        written = offset
+        head = None if offset else b''  # first bytes, until the magic number has been checked
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            f.seek(offset)
+            f.truncate()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise DownloadError(f"image is larger than {max_bytes / (1024 * 1024):g} MB")
+                if head is not None:
+                    head += chunk[:16]
+                    if len(head) >= 16:
+                        if sniff_image_type(head) is None:
+                            raise DownloadError('response is not an image')
+                        head = None
+                f.write(chunk)
+        if head is not None and sniff_image_type(head) is None:
+            raise DownloadError('response is not an image')
+        received = written - offset
+        if encoded:
+            # Content-Length is the compressed size; compare it with the raw bytes read
+            tell = getattr(response.raw, 'tell', None)
+            received = tell() if tell else length
+        if length is not None and received != length:
+            raise DownloadInterrupted('connection closed before the download finished')
+        return validators
+    finally:
+        response.close()
+
+DOWNLOAD_LOCK_STRIPES = 64
+_download_locks = [threading.Lock() for _ in range(DOWNLOAD_LOCK_STRIPES)]
+
+def download_image(url, headers, cache_key, ttl=CACHE_TTL_IMAGE, timeout=15, max_bytes=None):
+    """
+    Download an image into the artwork store and return the path of the stored
+    object. The body is streamed to a partial file in chunks (never held in
+    memory), limited to max_bytes, checked for an image content type and magic
+    bytes, resumed with HTTP Range after interruptions, and only renamed into
+    the store once it is complete. Raises DownloadError on failure.
+    Downloads of the same cache_key are serialized, since they share the partial
+    file; the second one finds the finished object in the store.
+    """
+    with _download_locks[hash(cache_key) % DOWNLOAD_LOCK_STRIPES]:
+        return _download_image(url, headers, cache_key, ttl, timeout, max_bytes)
+
+def _download_image(url, headers, cache_key, ttl, timeout, max_bytes):
+    import hashlib
+    import requests
+    cache = get_artwork_cache()
+    if max_bytes is None:
+        max_bytes = get_max_image_bytes()
+    entry = cache.lookup(cache_key)
+    object_path = cache.object_path(cache_key)
+    if entry and object_path and image_is_complete(object_path):
+        if entry['expires'] > time.time():
+            return object_path
+        if entry.get('etag') or entry.get('last_modified'):
+            conditional = dict(headers or {})
+            if entry.get('etag'):
+                conditional['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                conditional['If-Modified-Since'] = entry['last_modified']
+            response = http_get(url, headers=conditional, timeout=timeout, stream=True)
+            response.close()
+            if response.status_code == 304:
+                cache.refresh(cache_key, ttl)
+                return object_path
+    elif entry:
+        cache.remove(cache_key)
+    part_path = cache.partial_path(cache_key)
+    meta = _read_partial_meta(part_path)
+    if meta and meta.get('url') != url:
+        _discard_partial(part_path)
+    for attempt in range(DOWNLOAD_RESUME_ATTEMPTS):
+        try:
+            validators = _stream_image(url, headers, part_path, max_bytes, timeout)
+            break
+        except (DownloadInterrupted, requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == DOWNLOAD_RESUME_ATTEMPTS - 1:
+                raise DownloadError(f"download interrupted: {e}")
+            print(f"  Download interrupted, resuming ({e.__class__.__name__})")
+        except DownloadError:
+            _discard_partial(part_path)
+            raise
+    if not image_is_complete(part_path):
+        _discard_partial(part_path)
+        raise DownloadError('downloaded image is truncated or corrupt')
+    digest = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    size = os.path.getsize(part_path)
+    # Rename (not copy) the finished file into the store
+    object_path = cache.store_file(cache_key, part_path, digest.hexdigest(), size, ttl,
+                                   etag=validators['etag'], last_modified=validators['last_modified'])
+    _discard_partial(part_path)
+    return object_path
+
+# --- Artwork optimization (optional, needs Pillow) ---
+# Size Steam displays each artwork type at; icons are square
+ARTWORK_TARGETS = {
+    'portrait': (600, 900),
+    'landscape': (920, 430),
+    'hero': (1920, 620),
+    'icon': (256, 256),
+}
+ARTWORK_FIT_TOLERANCE = 0.1  # crop to the target aspect ratio only if it is this close already
+
+_optimize_lock = threading.Lock()
+_optimize_pool = None
+_optimize_stats = {'images': 0, 'bytes_saved': 0}
+_pillow_warned = False
+
+ARTWORK_JPEG_QUALITY = 90
+
+def transcode_artwork(src_path, dst_path, target):
+    """
+    Downscale an image to fit target (width, height) and re-encode it: JPEGs
+    stay JPEG, everything else becomes an optimized PNG. Runs in a worker
+    process. Returns the new size in bytes, or None when the original is
+    already a static PNG/JPEG no larger than the target, or the result
+    would not be smaller than the original.
+    """
+    from PIL import Image, ImageOps
+    with Image.open(src_path) as img:
+        animated = getattr(img, 'is_animated', False)
+        img.seek(0)  # animated WebP/GIF: Steam only shows the first frame
+        width, height = img.size
+        too_big = width > target[0] or height > target[1]
+        if img.format in ('PNG', 'JPEG') and not animated and not too_big:
+            return None
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        as_jpeg = img.format == 'JPEG' and not has_alpha
+        frame = img.convert('RGBA' if has_alpha else 'RGB')
+    if too_big:
+        ratio = (width / height) / (target[0] / target[1])
+        if abs(ratio - 1) <= ARTWORK_FIT_TOLERANCE:
+            frame = ImageOps.fit(frame, target, Image.LANCZOS)
+        else:
+            frame.thumbnail(target, Image.LANCZOS)
+    if as_jpeg:
+        frame.save(dst_path, 'JPEG', quality=ARTWORK_JPEG_QUALITY, optimize=True)
+    else:
+        frame.save(dst_path, 'PNG', optimize=True, compress_level=9)
+    new_size = os.path.getsize(dst_path)
+    if new_size >= os.path.getsize(src_path):
+        os.remove(dst_path)
+        return None
+    return new_size
+
+def start_process_pool(workers):
+    """
+    ProcessPoolExecutor whose workers are spawned rather than forked, so pools
+    created from artwork or GUI threads don't fork a multithreaded process.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def get_artwork_optimize_pool():
+    """Process pool for transcode_artwork; None if processes can't be started here."""
+    global _optimize_pool
+    with _optimize_lock:
+        if _optimize_pool is None:
+            try:
+                workers = max(1, int(get_config().get('artwork_optimize_workers', os.cpu_count() or 2)))
+            except (TypeError, ValueError):
+                workers = os.cpu_count() or 2
+            try:
+                _optimize_pool = start_process_pool(workers)
+            except (OSError, NotImplementedError) as e:
+                print(f"  Artwork optimization runs in-process ({e})")
+                _optimize_pool = False
+    return _optimize_pool or None
+
+def optimize_artwork(object_path, kind, cache_key):
+    """
+    Return the path of a stored copy of object_path resized for `kind` (see
+    ARTWORK_TARGETS) and re-encoded (see transcode_artwork), or object_path itself when
+    optimization is off, Pillow isn't installed or nothing would be gained.
+    Results are kept in the artwork store under derived:<kind>:<key>.
+    """
+    global _pillow_warned
+    target = ARTWORK_TARGETS.get(kind)
+    if target is None or not get_config().get('artwork_optimize', False):
+        return object_path
+    import importlib.util
+    if importlib.util.find_spec('PIL') is None:
+        if not _pillow_warned:
+            _pillow_warned = True
+            print("  Artwork optimization needs Pillow (pip install Pillow); saving images unchanged")
+        return object_path
+    import hashlib
+    cache = get_artwork_cache()
+    derived_key = f"derived:{kind}:{cache_key}"
+    derived_path = cache.object_path(derived_key)
+    source_entry = cache.lookup(cache_key)
+    derived_entry = cache.lookup(derived_key)
+    if (derived_path and derived_entry and source_entry
+            and derived_entry.get('source') == source_entry.get('sha256')
+            and image_is_complete(derived_path)):
+        return derived_path
+    tmp_path = cache.partial_path(derived_key) + '.png'
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+    try:
+        pool = get_artwork_optimize_pool()
+        if pool:
+            new_size = pool.submit(transcode_artwork, object_path, tmp_path, target).result()
+        else:
+            new_size = transcode_artwork(object_path, tmp_path, target)
+    except Exception as e:
+        print(f"  Could not optimize {os.path.basename(object_path)}: {e}")
+        new_size = None
+    if new_size is None:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return object_path
+    digest = hashlib.sha256()
+    with open(tmp_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    path = cache.store_file(derived_key, tmp_path, digest.hexdigest(), new_size, CACHE_TTL_IMAGE)
+    cache.annotate(derived_key, source=source_entry.get('sha256') if source_entry else None)
+    with _optimize_lock:
+        _optimize_stats['images'] += 1
+        _optimize_stats['bytes_saved'] += os.path.getsize(object_path) - new_size
+    return path
+
+def pop_artwork_optimize_stats():
+    """Return and reset (images optimized, bytes saved) since the last call."""
+    with _optimize_lock:
+        stats = (_optimize_stats['images'], _optimize_stats['bytes_saved'])
+        _optimize_stats['images'] = _optimize_stats['bytes_saved'] = 0
+    return stats
+
+# --- Artwork selection ---
+# Weights of the features that rank SteamGridDB search results and images
+GAME_MATCH_WEIGHTS = {'name': 4.0, 'rank': 0.5, 'verified': 0.3, 'platform': 0.8}
+ARTWORK_SCORE_WEIGHTS = {'aspect': 3.0, 'resolution': 1.5, 'votes': 1.0, 'style': 1.0, 'static': 0.5}
+MIN_NAME_SIMILARITY = 0.3
+ARTWORK_RATIOS = {kind: w / h for kind, (w, h) in ARTWORK_TARGETS.items()}
+NAME_TAG_RE = re.compile(r'\s*[\[(][^\])]*[\])]')
+
+def comparable_name(name):
+    """Lowercase name without bracketed tags, trademarks and punctuation."""
+    name = NAME_TAG_RE.sub(' ', name.casefold())
+    return ' '.join(re.sub(r'[^\w]+', ' ', name).split())
+
+def score_game_candidates(display_name, candidates, platform=None):
+    """
+    Score every SteamGridDB search result in one pass and return them as
+    (score, candidate) pairs, best first. Combines name similarity to the ROM's
+    display name, the position the search ranked it at, the verified flag and
+    whether a (Platform) tag in the name matches the selected platform.
+    Results less similar than artwork_min_name_similarity are dropped; when that
+    leaves nothing (abbreviations like "FF7"), the best verified result is kept,
+    or else the top search result.
+    """
+    from difflib import SequenceMatcher
+    wanted = comparable_name(display_name)
+    recognizer = find_recognizer(platform)
+    own_aliases = set(recognizer.aliases) if recognizer else {(platform or '').casefold()}
+    matcher = SequenceMatcher(None, b=wanted)  # b is the side SequenceMatcher caches
+    w = GAME_MATCH_WEIGHTS
+    scored = []
+    for rank, candidate in enumerate(candidates):
+        name = candidate.get('name') or ''
+        matcher.set_seq1(comparable_name(name))
+        similarity = matcher.ratio()
+        tags = {t.strip().casefold() for t in re.findall(r'[\[(]([^\])]*)[\])]', name)}
+        platform_hint = 1.0 if tags & own_aliases else (-1.0 if tags and any(find_recognizer(t) for t in tags) else 0.0)
+        score = (w['name'] * similarity
+                 + w['rank'] / (1 + rank)
+                 + w['verified'] * bool(candidate.get('verified'))
+                 + w['platform'] * platform_hint)
+        scored.append((score, similarity, candidate))
+    min_similarity = get_config().get('artwork_min_name_similarity', MIN_NAME_SIMILARITY)
+    ranked = [(score, candidate) for score, similarity, candidate in scored]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    matches = [(score, candidate) for score, similarity, candidate in scored if similarity >= min_similarity]
+    if not matches and ranked:
+        verified = [pair for pair in ranked if pair[1].get('verified')]
+        matches = [verified[0] if verified else ranked[0]]
+    return matches
+
+def score_artwork_candidates(images, kind, styles=()):
+    """
+    Score all images of one artwork type in one pass and return (score, image)
+    pairs, best first. Images oriented the wrong way for kind are dropped; the
+    rest are ranked by closeness to the exact aspect ratio Steam uses, resolution
+    relative to the target size, community votes, preferred styles (in order)
+    and being a static image.
+    """
+    import math
+    target = ARTWORK_TARGETS.get(kind)
+    ratio = ARTWORK_RATIOS.get(kind)
+    w = ARTWORK_SCORE_WEIGHTS
+    scored = []
+    for image in images:
+        if not image.get('url'):
+            continue
+        width, height = image.get('width') or 0, image.get('height') or 0
+        if ratio is not None and width and height:
+            image_ratio = width / height
+            if (ratio > 1) != (image_ratio > 1) and abs(ratio - 1) > ARTWORK_FIT_TOLERANCE:
+                continue  # portrait grid offered as landscape or vice versa
+            aspect = max(0.0, 1 - abs(math.log(image_ratio / ratio)) * 4)
+        else:
+            aspect = 0.5
+        resolution = min(1.0, (width * height) / (target[0] * target[1])) if target and width and height else 0.5
+        votes = math.copysign(math.log1p(abs(image.get('score') or 0)), image.get('score') or 0) / 5
+        style = image.get('style')
+        style_score = (len(styles) - styles.index(style)) / len(styles) if style in styles else 0.0
+        static = 0.0 if (image.get('mime') in ('image/webp', 'image/gif') or image.get('animated')) else 1.0
+        score = (w['aspect'] * aspect + w['resolution'] * resolution + w['votes'] * votes
+                 + w['style'] * style_score + w['static'] * static)
+        scored.append((score, image))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored
+
+def get_artwork_style_preferences():
+    """Preferred SteamGridDB styles from the config (e.g. ["alternate", "material"]), best first."""
+    styles = get_config().get('artwork_styles', [])
+    return tuple(styles) if isinstance(styles, list) else ()
+
+def fetch_game_icons(games, steamid, platform='switch', progress_callback=None, max_workers=None):
+    """
+    Fetch artwork for many games concurrently.
+    games is an iterable of (display_name, appid) pairs. Returns {appid: icon_path or None}.
+    Progress messages from the worker threads are relayed on the calling thread,
+    so a Qt progress_callback is never invoked from a worker.
+    """
+    import queue
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    if max_workers is None:
+        max_workers = get_artwork_max_workers()
+    jobs = dict((appid, name) for name, appid in games)  # same appid -> same artwork
+    messages = queue.Queue()
+    relay = messages.put if progress_callback else None
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='artwork') as pool:
+        pending = {
+            pool.submit(fetch_game_icon, name, appid, steamid, platform, relay): appid
+            for appid, name in jobs.items()
+        }
+        while pending:
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+            if progress_callback:
+                last_msg = None
+                while not messages.empty():
+                    last_msg = messages.get_nowait()
+                if last_msg:
+                    progress_callback(f"Artwork {len(results)}/{len(jobs)}: {last_msg}")
+    get_artwork_cache().flush()
+    optimized, saved = pop_artwork_optimize_stats()
+    if optimized:
+        msg = f"Optimized {optimized} images, saving {saved / (1024 * 1024):.1f} MB"
+        print(msg)
+        if progress_callback:
+            progress_callback(msg)
+    return results
+
 def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callback=None):
     """Fetch game icon from SteamGridDB and save to Steam's grid folder."""
     try:
-        import requests
         from urllib.parse import quote
         
         # Get Steam's grid folder for this user
         userdata_path = get_steam_userdata_path()
         grid_dir = os.path.join(userdata_path, steamid, 'config', 'grid')
-        if not os.path.exists(grid_dir):
-            os.makedirs(grid_dir)
+        os.makedirs(grid_dir, exist_ok=True)  # Several workers may race here
         
         # Steam uses unsigned 32-bit AppID for grid filenames
         # Convert signed to unsigned for display
@@ -365,22 +1020,18 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
         icon_path = os.path.join(grid_dir, f"{unsigned_appid}_icon.png")  # Icon
         grid_landscape_path = os.path.join(grid_dir, f"{unsigned_appid}.png")  # Horizontal grid (920x430)
         
-        # Check if all already exist
+        # Check if all already exist (and aren't left-over truncated files)
         all_paths = [grid_portrait_path, grid_landscape_path, hero_path, icon_path, logo_path]
-        if all(os.path.exists(p) for p in all_paths):
+        if all(image_is_complete(p) for p in all_paths):
             msg = f"All artwork already exists for '{game_name}'"
             print(msg)
             if progress_callback:
                 progress_callback(msg)
-            # Return the icon path if it exists
-            return icon_path if os.path.exists(icon_path) else None
+            return icon_path
         
         # Check for API key in environment or config
-        api_key = os.environ.get('STEAMGRIDDB_API_KEY')
-        if not api_key:
-            config = load_config()
-            api_key = config.get('steamgriddb_api_key')
-        
+        api_key = get_steamgriddb_api_key()
+
         if not api_key:
             msg = f"⚠ Skipping '{game_name}' - No API key"
             print(msg)
@@ -392,10 +1043,11 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
         
         # Use SteamGridDB API with authentication
         search_term = quote(game_name)
-        search_url = f"https://www.steamgriddb.com/api/v2/search/autocomplete/{search_term}"
+        api_base = get_steamgriddb_api_base()
+        search_url = f"{api_base}/search/autocomplete/{search_term}"
         headers = {
             'Authorization': f'Bearer {api_key}',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent': DEFAULT_USER_AGENT
         }
         
         msg = f"Searching for '{game_name}'..."
@@ -403,7 +1055,7 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
         if progress_callback:
             progress_callback(msg)
         
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = cached_get(search_url, headers, f"search:{normalize_game_name(game_name)}", CACHE_TTL_SEARCH)
         if not response.ok:
             msg = f"✗ Search failed for '{game_name}'"
             print(msg)
@@ -412,15 +1064,16 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
             return None
         
         data = response.json()
-        if not (data.get('success') and data.get('data') and len(data['data']) > 0):
+        matches = score_game_candidates(game_name, data.get('data') or [], platform) if data.get('success') else []
+        if not matches:
             msg = f"✗ No results for '{game_name}'"
             print(msg)
             if progress_callback:
                 progress_callback(msg)
             return None
         
-        # Get the first match's game ID
-        game_id = data['data'][0].get('id')
+        # Use the best scoring match's game ID
+        game_id = matches[0][1].get('id')
         if not game_id:
             msg = f"✗ No game ID for '{game_name}'"
             print(msg)
@@ -429,63 +1082,49 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
             return None
         
         success_count = 0
+        styles = get_artwork_style_preferences()
         
         # Fetch different artwork types with proper filtering
         # Note: grids endpoint returns both portrait and landscape, need to filter by dimensions
         artwork_requests = [
-            ('grids', grid_portrait_path, 'portrait grid', 'portrait'),  # 600x900 or similar
-            ('grids', grid_landscape_path, 'landscape grid', 'landscape'),  # 920x430 or similar
-            ('heroes', hero_path, 'hero/background', None),
-            ('icons', icon_path, 'icon', None),
-            ('logos', logo_path, 'logo', None)
+            ('grids', grid_portrait_path, 'portrait grid', 'portrait', 'portrait'),  # 600x900 or similar
+            ('grids', grid_landscape_path, 'landscape grid', 'landscape', 'landscape'),  # 920x430 or similar
+            ('heroes', hero_path, 'hero/background', None, 'hero'),
+            ('icons', icon_path, 'icon', None, 'icon'),
+            ('logos', logo_path, 'logo', None, 'logo')
         ]
         
-        print(f"Will save artwork to:")
+        print("Will save artwork to:")
         print(f"  Portrait: {grid_portrait_path}")
         print(f"  Landscape: {grid_landscape_path}")
         print(f"  Hero: {hero_path}")
         print(f"  Icon: {icon_path}")
         print(f"  Logo: {logo_path}")
         
-        for endpoint, save_path, art_name, dimension_filter in artwork_requests:
-            if os.path.exists(save_path):
+        for endpoint, save_path, art_name, dimension_filter, kind in artwork_requests:
+            if image_is_complete(save_path):
                 print(f"  {art_name} already exists")
                 success_count += 1
                 continue
             
             try:
                 # Different API endpoints for different art types
-                art_url = f"https://www.steamgriddb.com/api/v2/{endpoint}/game/{game_id}"
+                art_url = f"{api_base}/{endpoint}/game/{game_id}"
                 
                 print(f"  Fetching {art_name}...")
-                art_response = requests.get(art_url, headers=headers, timeout=10)
+                art_response = cached_get(art_url, headers, f"{endpoint}:{game_id}", CACHE_TTL_LISTING)
                 
                 if art_response.ok:
                     art_data = art_response.json()
                     
                     if art_data.get('success') and art_data.get('data') and len(art_data['data']) > 0:
-                        # For grids, filter by aspect ratio (portrait vs landscape)
-                        # Portrait: height > width (typically 600x900)
-                        # Landscape: width > height (typically 920x430)
-                        available_images = art_data['data']
-                        
-                        if dimension_filter:
-                            filtered = []
-                            for img in available_images:
-                                w, h = img.get('width', 0), img.get('height', 0)
-                                if dimension_filter == 'portrait' and h > w:
-                                    filtered.append(img)
-                                elif dimension_filter == 'landscape' and w > h:
-                                    filtered.append(img)
-                            
-                            if filtered:
-                                available_images = filtered
-                            else:
-                                print(f"  ✗ No {dimension_filter} {art_name} available")
-                                continue
-                        
-                        # Get the first image URL
-                        img_url = available_images[0].get('url')
+                        # Rank every image (grids come in portrait and landscape, so kind
+                        # also filters by orientation) and download only the winner
+                        ranked = score_artwork_candidates(art_data['data'], kind, styles)
+                        if not ranked:
+                            print(f"  ✗ No {dimension_filter or kind} {art_name} available")
+                            continue
+                        img_url = ranked[0][1].get('url')
                         if img_url:
                             msg = f"Downloading {art_name} for '{game_name}'..."
                             print(msg)
@@ -493,15 +1132,18 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
                                 progress_callback(msg)
                             
                             # Don't send Authorization to CDN - use basic headers only
-                            img_headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                            img_response = requests.get(img_url, headers=img_headers, timeout=15)
-                            if img_response.ok:
-                                with open(save_path, 'wb') as f:
-                                    f.write(img_response.content)
-                                print(f"  ✓ {art_name} downloaded to {os.path.basename(save_path)}")
-                                success_count += 1
-                            else:
-                                print(f"  ✗ Failed to download {art_name}: HTTP {img_response.status_code}")
+                            img_headers = {'User-Agent': DEFAULT_USER_AGENT}
+                            img_key = f"image:{img_url}"
+                            try:
+                                object_path = download_image(img_url, img_headers, img_key)
+                            except DownloadError as e:
+                                print(f"  ✗ Failed to download {art_name}: {e}")
+                                continue
+                            object_path = optimize_artwork(object_path, kind, img_key)
+                            # Link the shared copy from the artwork store instead of writing another one
+                            link_or_copy(object_path, save_path)
+                            print(f"  ✓ {art_name} downloaded to {os.path.basename(save_path)}")
+                            success_count += 1
                         else:
                             print(f"  ✗ No URL for {art_name}")
                     else:
@@ -519,7 +1161,7 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
             if progress_callback:
                 progress_callback(msg)
             # Return the icon path if it exists
-            return icon_path if os.path.exists(icon_path) else None
+            return icon_path if image_is_complete(icon_path) else None
         else:
             msg = f"✗ No artwork downloaded for '{game_name}'"
             print(msg)
@@ -536,137 +1178,964 @@ def fetch_game_icon(game_name, appid, steamid, platform='switch', progress_callb
             progress_callback(msg)
         return None
 
-def scrape_roms(roms_folder):
-    # Recursively find .nsp files, avoid updates, extract display name
-    games = []
-    for root, dirs, files in os.walk(roms_folder):
-        for file in files:
-            if file.lower().endswith('.nsp'):
-                if '[v0]' not in file.lower():
-                    continue  # Only accept base version [v0], skip all updates
-                # Extract display name: everything before the first ' ['
-                base = os.path.splitext(file)[0]
-                split_idx = base.find(' [')
-                if split_idx > 0:
-                    display_name = base[:split_idx].strip()
-                else:
-                    display_name = base
-                games.append({
-                    'display_name': display_name,
-                    'path': os.path.join(root, file)
-                })
-    return games
+# --- Nintendo Switch containers (NSP/XCI) ---
+# NSP/NSZ files are PFS0 archives; XCI/XCZ cartridge images hold HFS0 partitions.
+# Only the partition tables and the plaintext files in them (tickets, .cnmt.xml)
+# are read. The NCAs that make up the rest of the file are encrypted and never touched.
+SWITCH_HEADER_READ = 0x4000
+SWITCH_MAX_ENTRIES = 0x4000
+SWITCH_MAX_CNMT_XML = 0x10000
+SWITCH_XCI_HEADER_OFFSETS = (0x100, 0x1100)  # Plain dumps, and dumps with the 0x1000-byte key area in front
+SWITCH_TICKET_RE = re.compile(r'^([0-9a-fA-F]{16})[0-9a-fA-F]{16}\.tik$')
+SWITCH_TITLE_ID_TAG_RE = re.compile(r'\[(01[0-9a-fA-F]{14})\]')
+SWITCH_VERSION_TAG_RE = re.compile(r'\[v(\d+)\]', re.IGNORECASE)
+SWITCH_CNMT_TYPES = {'application': 'base', 'patch': 'update', 'addoncontent': 'dlc'}
 
-# --- Steam Shortcuts Logic ---
-import vdf
+def switch_title_type(title_id):
+    """'base', 'update' or 'dlc' from the low bits of a title ID (an int)."""
+    low = title_id & 0xFFF
+    if low == 0:
+        return 'base'
+    return 'update' if low == 0x800 else 'dlc'
 
-def get_steam_userdata_path():
-    """Get Steam userdata path for Windows or Linux (Steam Deck)."""
-    import platform
-    
-    if platform.system() == 'Windows':
-        # Windows paths
-        possible_paths = [
-            os.path.expandvars(r'C:\Program Files (x86)\Steam\userdata'),
-            os.path.expandvars(r'C:\Program Files\Steam\userdata'),
-            os.path.expandvars(r'D:\Steam\userdata'),
-            os.path.expandvars(r'E:\Steam\userdata'),
-        ]
+def switch_base_title_id(title_id):
+    """Title ID of the game an update or DLC title ID belongs to."""
+    kind = switch_title_type(title_id)
+    if kind == 'dlc':
+        return (title_id & ~0xFFF) ^ 0x1000
+    return title_id & ~0xFFF
+
+def _read_at(f, offset, size):
+    f.seek(offset)
+    return f.read(size)
+
+def read_switch_partition(f, offset, entry_size, head=None):
+    """
+    Parse the PFS0/HFS0 table at offset in f.
+    Returns [(name, absolute_offset, size), ...], or None if there is no valid table there.
+    head may hold bytes already read from offset, to save a round-trip.
+    """
+    import struct
+    if head is None or len(head) < 16:
+        head = _read_at(f, offset, SWITCH_HEADER_READ)
+    if len(head) < 16 or head[:4] not in (b'PFS0', b'HFS0'):
+        return None
+    count, strings_size = struct.unpack_from('<II', head, 4)
+    if count > SWITCH_MAX_ENTRIES or strings_size > SWITCH_MAX_ENTRIES * 0x100:
+        return None
+    table_size = 16 + count * entry_size + strings_size
+    if len(head) < table_size:
+        head = _read_at(f, offset, table_size)
+        if len(head) < table_size:
+            return None
+    strings = head[16 + count * entry_size:table_size]
+    data_start = offset + table_size
+    entries = []
+    for i in range(count):
+        entry_offset, entry_length, name_offset = struct.unpack_from('<QQI', head, 16 + i * entry_size)
+        end = strings.find(b'\0', name_offset)
+        name = strings[name_offset:end if end >= 0 else None].decode('utf-8', 'replace')
+        entries.append((name, data_start + entry_offset, entry_length))
+    return entries
+
+def _switch_xci_partitions(f, head):
+    """Entries of the secure and normal partitions of an XCI, or None if head is not an XCI header."""
+    import struct
+    for base in SWITCH_XCI_HEADER_OFFSETS:
+        if len(head) >= base + 0x40 and head[base:base + 4] == b'HEAD':
+            root_offset = struct.unpack_from('<Q', head, base + 0x30)[0]
+            break
     else:
-        # Linux/Steam Deck paths
-        home = os.path.expanduser('~')
-        possible_paths = [
-            os.path.join(home, '.local', 'share', 'Steam', 'userdata'),
-            os.path.join(home, '.steam', 'steam', 'userdata'),
-            os.path.join(home, '.var', 'app', 'com.valvesoftware.Steam', '.local', 'share', 'Steam', 'userdata'),  # Flatpak
-        ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            return path
-    
-    raise FileNotFoundError(f'Could not find Steam userdata folder. Searched: {possible_paths}')
+        return None
+    root = read_switch_partition(f, root_offset, 0x40)
+    if root is None:
+        return None
+    entries = []
+    for name, offset, _ in root:
+        if name in ('secure', 'normal'):
+            entries.extend(read_switch_partition(f, offset, 0x40) or [])
+    return entries
 
-def get_steam_users():
+def _parse_cnmt_xml(data):
+    """(title_id, type, version) from a plaintext .cnmt.xml, or None."""
+    text = data.decode('utf-8', 'replace')
+    fields = {}
+    for tag in ('Type', 'Id', 'Version'):
+        match = re.search(rf'<{tag}>\s*([^<]+?)\s*</{tag}>', text)
+        if match is None:
+            return None
+        fields[tag] = match.group(1)
+    try:
+        title_id = int(fields['Id'], 16)
+        version = int(fields['Version'])
+    except ValueError:
+        return None
+    kind = SWITCH_CNMT_TYPES.get(fields['Type'].casefold(), switch_title_type(title_id))
+    return title_id, kind, version
+
+def read_switch_title(path):
     """
-    Returns a list of dicts: [{ 'steamid': ..., 'personaname': ... }]
+    Title metadata of an NSP/NSZ/XCI/XCZ file from its container headers:
+    {'title_id': '0100...', 'base_title_id': ..., 'title_type': 'base'|'update'|'dlc', 'version': int or None}.
+    The title ID comes from a .cnmt.xml (which also gives type and version) or
+    the ticket names; a [0100...] tag in the file name is the fallback. Returns
+    None when the file is not a Switch container or holds no title ID.
     """
-    users = []
-    userdata_path = get_steam_userdata_path()
-    for user_id in os.listdir(userdata_path):
-        if not user_id.isdigit():
-            continue
-        config_path = os.path.join(userdata_path, user_id, 'config', 'localconfig.vdf')
-        persona = user_id
-        if os.path.exists(config_path):
-            try:
-                import vdf
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    data = vdf.load(f)
-                persona = data.get('UserLocalConfigStore', {}).get('friends', {}).get('PersonaName', user_id)
-            except Exception:
-                pass
-        users.append({'steamid': user_id, 'personaname': persona})
-    return users
+    file_name = os.path.basename(path)
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SWITCH_HEADER_READ)
+            is_xci = head[:4] != b'PFS0'
+            entries = _switch_xci_partitions(f, head) if is_xci else read_switch_partition(f, 0, 0x18, head)
+            if entries is None:
+                return None
+            meta = None
+            for name, offset, size in entries:
+                if name.endswith('.cnmt.xml') and size <= SWITCH_MAX_CNMT_XML:
+                    meta = _parse_cnmt_xml(_read_at(f, offset, size))
+                    if meta is not None:
+                        break
+    except OSError:
+        return None
+    if meta is None:
+        title_ids = [int(m.group(1), 16) for m in map(SWITCH_TICKET_RE.match, (e[0] for e in entries)) if m]
+        if not title_ids:
+            tag = SWITCH_TITLE_ID_TAG_RE.search(file_name)
+            title_ids = [int(tag.group(1), 16)] if tag else []
+        if not title_ids:
+            # Cartridge images are base games even when nothing in them names the title
+            return {'title_id': None, 'base_title_id': None, 'title_type': 'base', 'version': 0} if is_xci else None
+        # Multi-title packages: the base game, if it is in there, decides what the file is
+        title_ids.sort(key=lambda t: ('base', 'update', 'dlc').index(switch_title_type(t)))
+        tag = SWITCH_VERSION_TAG_RE.search(file_name)
+        meta = (title_ids[0], switch_title_type(title_ids[0]), int(tag.group(1)) if tag else None)
+    title_id, kind, version = meta
+    return {'title_id': f"{title_id:016x}", 'base_title_id': f"{switch_base_title_id(title_id):016x}",
+            'title_type': kind, 'version': version}
 
-class SteamUserPage(QWizardPage):
-    def __init__(self):
-        super().__init__()
-        self.setTitle('Select Steam User(s)')
-        layout = QVBoxLayout()
-        self.user_checks = []
-        self.user_group = QGroupBox('Steam Users')
-        self.user_layout = QVBoxLayout()
-        self.user_group.setLayout(self.user_layout)
-        layout.addWidget(self.user_group)
-        self.setLayout(layout)
-
-    def initializePage(self):
-        # Clear previous
-        for i in reversed(range(self.user_layout.count())):
-            widget = self.user_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-        self.user_checks = []
-        users = get_steam_users()
-        config = load_config()
-        last_user = config.get('last_steamid')
-        for user in users:
-            cb = QCheckBox(f"{user['personaname']} ({user['steamid']})")
-            cb.steamid = user['steamid']
-            if last_user and user['steamid'] == last_user:
-                cb.setChecked(True)
-            self.user_layout.addWidget(cb)
-            self.user_checks.append(cb)
-        # If no last user, check the first by default
-        if users and not any(cb.isChecked() for cb in self.user_checks):
-            self.user_checks[0].setChecked(True)
-
-    def selected_steamids(self):
-        return [cb.steamid for cb in self.user_checks if cb.isChecked()]
+def group_switch_titles(games, seen=None):
+    """
+    Keep one game per Switch title: later files whose base_title_id was already
+    seen (e.g. an NSP and an XCI of the same game) are dropped. Cartridge dumps
+    often carry no title ID at all (no ticket, hashed NCA names, no [0100...]
+    tag); those are grouped with the other Switch files by display name instead.
+    seen (a set) carries the keys across batches. Returns the kept games.
+    """
+    if seen is None:
+        seen = set()
+    kept = []
+    for game in games:
+        if 'title_type' in game:
+            title_id = game.get('base_title_id')
+            name_key = ('name', game['display_name'].casefold())
+            key = ('id', title_id) if title_id else name_key
+            if key in seen:
+                continue
+            seen.add(key)
+            seen.add(name_key)
+        kept.append(game)
+    return kept
 
-def find_steam_shortcuts_vdf(steamid=None):
-    userdata_path = get_steam_userdata_path()
-    # Find the user folder (should be the SteamID)
-    if steamid:
-        config_path = os.path.join(userdata_path, steamid, 'config')
-        if os.path.isdir(config_path):
-            vdf_path = os.path.join(config_path, 'shortcuts.vdf')
-            return vdf_path
-        raise FileNotFoundError(f'Could not find shortcuts.vdf for SteamID {steamid}')
-    # Fallback: first user
-    for user_id in os.listdir(userdata_path):
-        config_path = os.path.join(userdata_path, user_id, 'config')
-        if os.path.isdir(config_path):
-            vdf_path = os.path.join(config_path, 'shortcuts.vdf')
-            return vdf_path
-    raise FileNotFoundError('Could not find shortcuts.vdf in any Steam user config.')
+# --- ROM recognizers ---
+DISC_TAG_RE = re.compile(r'\s*[\(\[](?:Disc|Disk|CD)\s*(\d+)(?:\s*of\s*\d+)?[\)\]]', re.IGNORECASE)
+TRACK_TAG_RE = re.compile(r'\s*\(Track\s*\d+\)', re.IGNORECASE)
+SHEET_EXTENSIONS = ('.cue', '.gdi', '.ccd', '.m3u')
+TRACK_EXTENSIONS = ('.bin', '.img', '.raw', '.sub')
 
-def add_shortcuts_to_steam_collection(appids, collection_name, steamid=None):
-    import json
-    import time
-    print(f"Adding appids {appids} to collection '{collection_name}' for steamid {steamid}")
-    # Find cloud-storage-namespace-1.json for the user
+class RomRecognizer:
+    """
+    File rules for one platform: accepted extensions, update/DLC filters,
+    multi-disc grouping and display name extraction.
+    require maps an extension to a pattern that file names with that extension must contain.
+    inspect(path) may read metadata from the file itself; a dict with a title_type
+    other than 'base' rejects the file, any dict overrides the name-based skip and
+    require rules and is added to the game. None falls back to the name rules.
+    explicit_only recognizers (e.g. Arcade .zip) are only used when their platform is selected.
+    """
+
+    def __init__(self, platform, extensions, aliases=(), skip=None, require=None,
+                 name_cut=r'\s[\[(]', group_discs=False, explicit_only=False, inspect=None):
+        self.platform = platform
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.aliases = tuple(a.casefold() for a in (platform,) + tuple(aliases))
+        self.skip = re.compile(skip, re.IGNORECASE) if skip else None
+        self.require = {ext.lower(): re.compile(p, re.IGNORECASE) for ext, p in (require or {}).items()}
+        self.name_cut = re.compile(name_cut)
+        self.group_discs = group_discs
+        self.explicit_only = explicit_only
+        self.inspect = inspect
+
+    def accepts(self, file, ext):
+        if self.skip and self.skip.search(file):
+            return False
+        required = self.require.get(ext)
+        return required is None or required.search(file) is not None
+
+    def display_name(self, stem):
+        if self.group_discs:
+            stem = DISC_TAG_RE.sub('', stem)
+        match = self.name_cut.search(stem)
+        if match and match.start() > 0:
+            stem = stem[:match.start()]
+        return stem.strip()
+
+    def describe(self):
+        """Stable description of the rules, used to invalidate ROM indexes built with other rules."""
+        return [self.platform, self.extensions, self.skip.pattern if self.skip else None,
+                sorted((e, p.pattern) for e, p in self.require.items()), self.name_cut.pattern,
+                self.group_discs, self.explicit_only, self.inspect.__name__ if self.inspect else None]
+
+ROM_RECOGNIZERS = {}  # canonical platform name -> RomRecognizer
+
+def register_recognizer(recognizer):
+    """Add or replace the recognizer for a platform."""
+    ROM_RECOGNIZERS[recognizer.platform] = recognizer
+    _rom_matchers.clear()
+
+def find_recognizer(platform):
+    """Recognizer whose platform name or alias matches platform (case-insensitive), or None."""
+    key = (platform or '').strip().casefold()
+    for recognizer in ROM_RECOGNIZERS.values():
+        if key in recognizer.aliases:
+            return recognizer
+    return None
+
+class RomMatcher:
+    """
+    A set of recognizers compiled into one extension regex, longest extension first.
+    scan_names sorts the files of one directory to platforms in a single pass.
+    """
+
+    def __init__(self, recognizers):
+        import hashlib
+        self.recognizers = list(recognizers)
+        self.by_extension = {}
+        for recognizer in self.recognizers:
+            for ext in recognizer.extensions:
+                self.by_extension.setdefault(ext, []).append(recognizer)
+        extensions = sorted(self.by_extension, key=len, reverse=True)
+        self.extension_re = re.compile('(' + '|'.join(re.escape(e) for e in extensions) + ')$', re.IGNORECASE)
+        rules = json.dumps([r.describe() for r in self.recognizers])
+        self.signature = hashlib.sha1(rules.encode('utf-8')).hexdigest()[:12]
+
+    def _pick(self, candidates, path_words):
+        """Choose between recognizers sharing an extension using platform names in the folder path."""
+        if len(candidates) > 1:
+            for recognizer in candidates:
+                if any(alias in path_words for alias in recognizer.aliases):
+                    return recognizer
+        return candidates[0]
+
+    def scan_names(self, dirpath, names):
+        """
+        Return [display_name, file_name, platform] for the games among one directory's file names,
+        with the recognizer's inspect() metadata as a fourth item when it has any.
+        """
+        path_words = set(re.split(r'[\\/]+', dirpath.casefold()))
+        sheet_stems = set()
+        playlist_stems = set()  # .m3u playlists stand for all discs of a game
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in SHEET_EXTENSIONS:
+                sheet_stems.add(stem.casefold())
+                if ext.lower() == '.m3u':
+                    playlist_stems.add(DISC_TAG_RE.sub('', stem).casefold())
+        games = []
+        discs = {}  # (platform, display_name) -> index into games of the chosen disc
+        for name in names:
+            match = self.extension_re.search(name)
+            if not match:
+                continue
+            ext = match.group(1).lower()
+            stem = name[:match.start()]
+            recognizer = self._pick(self.by_extension[ext], path_words)
+            info = recognizer.inspect(os.path.join(dirpath, name)) if recognizer.inspect else None
+            if info is not None:
+                if info.get('title_type', 'base') != 'base':
+                    continue
+            elif not recognizer.accepts(name, ext):
+                continue
+            if sheet_stems:
+                # Tracks and discs described by a .cue/.gdi/.m3u sheet are not games of their own
+                if ext in TRACK_EXTENSIONS and TRACK_TAG_RE.sub('', stem).casefold() in sheet_stems:
+                    continue
+                if ext != '.m3u' and DISC_TAG_RE.search(stem) and DISC_TAG_RE.sub('', stem).casefold() in playlist_stems:
+                    continue
+            display_name = recognizer.display_name(stem)
+            if recognizer.group_discs:
+                key = (recognizer.platform, display_name.casefold())
+                disc = DISC_TAG_RE.search(stem)
+                disc_no = int(disc.group(1)) if disc else 0
+                if key in discs:
+                    idx, best_no = discs[key]
+                    if disc_no < best_no:
+                        games[idx] = [display_name, name, recognizer.platform]
+                        discs[key] = (idx, disc_no)
+                    continue
+                discs[key] = (len(games), disc_no)
+            games.append([display_name, name, recognizer.platform, info] if info else [display_name, name, recognizer.platform])
+        return games
+
+_rom_matchers = {}
+
+def get_rom_matcher(platform=None):
+    """
+    Compiled matcher for platform. Known platforms use their own recognizer;
+    None, 'Multi' or unknown names use every recognizer (mixed library).
+    """
+    recognizer = find_recognizer(platform)
+    key = recognizer.platform if recognizer else None
+    matcher = _rom_matchers.get(key)
+    if matcher is None:
+        if recognizer:
+            recognizers = [recognizer]
+        else:
+            recognizers = [r for r in ROM_RECOGNIZERS.values() if not r.explicit_only]
+        matcher = _rom_matchers[key] = RomMatcher(recognizers)
+    return matcher
+
+# Registration order settles shared extensions (.iso, .chd, .bin...) when the folder path has no platform name
+for _recognizer in (
+    RomRecognizer('Switch', ('.nsp', '.nsz', '.xci', '.xcz'), aliases=('nintendo switch', 'ns'),
+                  skip=r'\[(?:v[1-9]\d*|UPD|UPDATE|DLC)\]',  # Only used for files whose headers can't be read
+                  name_cut=r'\s\[', inspect=read_switch_title),
+    RomRecognizer('3DS', ('.3ds', '.cci', '.cxi', '.cia'), aliases=('nintendo 3ds', 'n3ds'),
+                  skip=r'\((?:Update|DLC)\)|\[(?:UPD|DLC)\]'),
+    RomRecognizer('DS', ('.nds', '.dsi', '.ids'), aliases=('nintendo ds', 'nds')),
+    RomRecognizer('N64', ('.z64', '.n64', '.v64'), aliases=('nintendo 64',)),
+    RomRecognizer('SNES', ('.sfc', '.smc', '.fig', '.swc'), aliases=('super nintendo', 'snes9x')),
+    RomRecognizer('NES', ('.nes', '.fds', '.unf', '.unif'), aliases=('famicom', 'nes classic')),
+    RomRecognizer('GBA', ('.gba', '.gbc', '.gb'), aliases=('game boy advance', 'gb', 'gbc')),
+    RomRecognizer('Genesis', ('.md', '.gen', '.smd', '.32x', '.bin'), aliases=('mega drive', 'megadrive', 'sega genesis')),
+    RomRecognizer('PS1', ('.m3u', '.cue', '.chd', '.pbp', '.ccd', '.ecm', '.bin', '.img'),
+                  aliases=('psx', 'ps', 'playstation', 'psone'), group_discs=True),
+    RomRecognizer('PS2', ('.chd', '.iso', '.cso', '.zso', '.cue', '.bin', '.m3u'),
+                  aliases=('playstation 2',), group_discs=True),
+    RomRecognizer('GameCube/Wii', ('.rvz', '.gcz', '.gcm', '.wbfs', '.wia', '.ciso', '.nkit.iso', '.iso'),
+                  aliases=('gamecube', 'wii', 'gc', 'ngc'), group_discs=True),
+    RomRecognizer('Wii U', ('.wua', '.wud', '.wux', '.rpx'), aliases=('wiiu',)),
+    RomRecognizer('PSP', ('.iso', '.cso', '.pbp', '.chd'), aliases=('playstation portable',)),
+    RomRecognizer('PS3', ('.iso', '.pkg'), aliases=('playstation 3',)),
+    RomRecognizer('Vita', ('.vpk',), aliases=('ps vita', 'psvita')),
+    RomRecognizer('Xbox', ('.xiso', '.iso'), aliases=('xbox classic',)),
+    RomRecognizer('Dreamcast', ('.gdi', '.cdi', '.chd', '.cue', '.m3u'), aliases=('dc',), group_discs=True),
+    RomRecognizer('MSX', ('.mx1', '.mx2', '.rom', '.dsk', '.cas')),
+    RomRecognizer('Amiga', ('.adf', '.ipf', '.hdf', '.lha'), group_discs=True),
+    RomRecognizer('C64', ('.d64', '.t64', '.prg', '.crt', '.tap'), aliases=('commodore 64',)),
+    RomRecognizer('Arcade', ('.zip', '.7z'), aliases=('mame', 'fbneo'), explicit_only=True),
+):
+    register_recognizer(_recognizer)
+
+# --- Incremental ROM scanning ---
+ROM_INDEX_VERSION = 3
+
+def get_rom_index_path(matcher):
+    # One index per rule set, so switching platforms does not throw away the other index
+    return os.path.join(get_icons_cache_dir(), f'rom_index_{matcher.signature}.json')
+
+class RomIndex:
+    """
+    Persisted per-directory scan results.
+    Each directory is stored with its (mtime, size, inode) signature, its
+    subdirectory names and the games found directly in it. A directory whose
+    signature is unchanged is not listed again; its cached games are reused.
+    """
+
+    def __init__(self, matcher, path=None):
+        self.matcher = matcher
+        self.path = path  # None keeps the index in memory only
+        self.dirs = {}
+        self.dirty = False
+        if path is None:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == ROM_INDEX_VERSION and data.get('rules') == matcher.signature:
+                self.dirs = data.get('dirs', {})
+        except Exception:
+            pass
+
+    @staticmethod
+    def signature(st):
+        return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+    def scan_dir(self, dirpath):
+        """Return (games, subdir_paths) for one directory, listing it only if it changed."""
+        try:
+            st = os.stat(dirpath)
+        except OSError:
+            return [], []
+        sig = self.signature(st)
+        cached = self.dirs.get(dirpath)
+        if cached is None or cached.get('sig') != sig:
+            cached = self._list_dir(dirpath, sig)
+            self.dirs[dirpath] = cached
+            self.dirty = True
+        games = []
+        for name, file, platform, *info in cached['games']:
+            game = {'display_name': name, 'path': os.path.join(dirpath, file), 'platform': platform}
+            if info:
+                game.update(info[0])
+            games.append(game)
+        subdirs = [os.path.join(dirpath, d) for d in cached['subdirs']]
+        return games, subdirs
+
+    def _list_dir(self, dirpath, sig):
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if not entry.is_symlink():  # Same as os.walk: don't follow directory links
+                            subdirs.append(entry.name)
+                        continue
+                    files.append(entry.name)
+        except OSError:
+            pass
+        return {'sig': sig, 'subdirs': subdirs, 'games': self.matcher.scan_names(dirpath, files)}
+
+    def prune(self, root, visited):
+        """Forget directories under root that no longer exist."""
+        prefix = os.path.join(root, '')
+        for dirpath in list(self.dirs):
+            if (dirpath == root or dirpath.startswith(prefix)) and dirpath not in visited:
+                del self.dirs[dirpath]
+                self.dirty = True
+
+    def save(self):
+        if not self.dirty or self.path is None:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': ROM_INDEX_VERSION, 'rules': self.matcher.signature, 'dirs': self.dirs}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+DEFAULT_ROM_SCAN_WORKERS = 16
+ROM_SCAN_BATCH_SIZE = 256
+
+def get_rom_scan_settings():
+    """Return (max_workers, max_depth) for ROM scanning from the config."""
+    config = get_config()
+    try:
+        max_workers = max(1, int(config.get('rom_scan_workers', DEFAULT_ROM_SCAN_WORKERS)))
+    except (TypeError, ValueError):
+        max_workers = DEFAULT_ROM_SCAN_WORKERS
+    max_depth = config.get('rom_scan_max_depth')
+    if not isinstance(max_depth, int) or max_depth < 0:
+        max_depth = None
+    return max_workers, max_depth
+
+def iter_rom_batches(roms_folder, platform=None, max_depth=None, max_workers=None, batch_size=ROM_SCAN_BATCH_SIZE, use_index=True, cancel_event=None, flush_interval=None):
+    """
+    Scan roms_folder with a thread pool and yield the games found in batches.
+    Files are recognized with the rules for platform (see get_rom_matcher).
+    Every directory is its own task, so listings of sibling folders on SMB/NFS
+    shares overlap instead of costing one round-trip after another.
+    max_depth limits recursion (0 = only roms_folder itself, None = unlimited).
+    Setting cancel_event stops the scan; the batch in progress is dropped.
+    flush_interval (seconds) also yields a partial batch once it has waited that
+    long, so a UI can show the first results right away.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    if not roms_folder or not os.path.isdir(roms_folder):
+        return
+    if max_workers is None:
+        max_workers = get_rom_scan_settings()[0]
+    root = os.path.normpath(os.path.abspath(roms_folder))
+    matcher = get_rom_matcher(platform)
+    index = RomIndex(matcher, get_rom_index_path(matcher) if use_index else None)
+    visited = {root}
+    batch = []
+    complete = False
+    last_flush = time.monotonic() - (flush_interval or 0)  # The first results go out right away
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='romscan')
+    pending = {pool.submit(index.scan_dir, root): 0}
+    try:
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth = pending.pop(future)
+                dir_games, subdirs = future.result()
+                batch.extend(dir_games)
+                if max_depth is None or depth < max_depth:
+                    for subdir in subdirs:
+                        visited.add(subdir)
+                        pending[pool.submit(index.scan_dir, subdir)] = depth + 1
+            if len(batch) >= batch_size or (batch and flush_interval is not None and time.monotonic() - last_flush >= flush_interval):
+                yield batch
+                batch = []
+                last_flush = time.monotonic()
+        complete = True
+        if batch:
+            yield batch
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        # A depth-limited or cancelled scan did not see every directory, so only prune after a full one
+        if complete and max_depth is None:
+            index.prune(root, visited)
+        try:
+            index.save()
+        except OSError as e:
+            print(f"Could not save ROM index: {e}")
+
+def scrape_roms(roms_folder, platform=None, use_index=True, max_depth=None, max_workers=None, identify=None):
+    """
+    Recursively find base-game ROMs for platform under roms_folder, re-listing only directories that changed.
+    With identify (default: the rom_identify config key), names are taken from DAT files where the hashes match.
+    """
+    if max_depth is None:
+        max_depth = get_rom_scan_settings()[1]
+    games = []
+    for batch in iter_rom_batches(roms_folder, platform, max_depth=max_depth, max_workers=max_workers, use_index=use_index):
+        games.extend(batch)
+    # Directories finish in any order; keep the list stable between runs
+    games.sort(key=lambda g: g['path'])
+    scanned = set(g['path'] for g in games)
+    games = group_switch_titles(games)
+    if identify is None:
+        identify = bool(get_config().get('rom_identify', False))
+    if identify:
+        hash_cache = get_rom_hash_cache()
+        identify_roms(games, hash_cache=hash_cache)
+        if max_depth is None and os.path.isdir(roms_folder):
+            hash_cache.prune(os.path.normpath(os.path.abspath(roms_folder)), scanned)
+        save_rom_hash_cache(hash_cache)
+    return games
+
+# --- ROM identification (No-Intro/Redump DAT files) ---
+ROM_HASH_CHUNK_SIZE = 8 * 1024 * 1024
+ROM_HASH_CACHE_VERSION = 1
+# Copier headers that No-Intro DATs leave out of their hashes
+ROM_HEADERS = {b'NES\x1a': 16, b'FDS\x1a': 16}
+DAT_EXTENSIONS = ('.dat', '.xml')
+DAT_NAME_CUT = re.compile(r'\s[\[(]')
+DAT_TRAILING_ARTICLE = re.compile(r'^(.*), (The|A|An)$')
+
+def hash_rom_file(path):
+    """
+    CRC32 and SHA1 of a ROM file, read through mmap. Runs in a worker process.
+    Returns [[size, crc32, sha1], ...]: the whole file, plus the data after a
+    copier header (iNES/fwNES) when there is one.
+    """
+    import hashlib
+    import mmap
+    import zlib
+    results = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [[0, '00000000', hashlib.sha1().hexdigest()]]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                starts = [0]
+                skip = ROM_HEADERS.get(bytes(view[:4]))
+                if skip and size > skip:
+                    starts.append(skip)
+                for start in starts:
+                    crc = 0
+                    sha1 = hashlib.sha1()
+                    for offset in range(start, size, ROM_HASH_CHUNK_SIZE):
+                        chunk = view[offset:offset + ROM_HASH_CHUNK_SIZE]
+                        crc = zlib.crc32(chunk, crc)
+                        sha1.update(chunk)
+                        chunk.release()
+                    results.append([size - start, f"{crc:08x}", sha1.hexdigest()])
+            finally:
+                view.release()
+    return results
+
+class RomHashCache:
+    """ROM hashes keyed by path, reused while the file's size and mtime are unchanged."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        if path is None:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == ROM_HASH_CACHE_VERSION:
+                self.entries = data.get('files', {})
+        except Exception:
+            pass
+
+    def get(self, path, st):
+        with self._lock:
+            entry = self.entries.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, st, hashes):
+        with self._lock:
+            self.entries[path] = [st.st_size, st.st_mtime_ns, hashes]
+            self.dirty = True
+
+    def discard(self, path):
+        with self._lock:
+            if self.entries.pop(path, None) is not None:
+                self.dirty = True
+
+    def prune(self, root, seen):
+        """Forget files under root that are not in seen (paths found by a complete scan)."""
+        prefix = os.path.join(root, '')
+        with self._lock:
+            for path in list(self.entries):
+                if path.startswith(prefix) and path not in seen:
+                    del self.entries[path]
+                    self.dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self.dirty or self.path is None:
+                return
+            payload = json.dumps({'version': ROM_HASH_CACHE_VERSION, 'files': self.entries}, separators=(',', ':'))
+            self.dirty = False
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+class DatIndex:
+    """
+    Lookup table over Logiqx XML DAT files (the format No-Intro and Redump publish):
+    SHA1 -> game name, and (CRC32, size) -> game name for DATs without SHA1.
+    """
+
+    def __init__(self, paths=()):
+        self.by_sha1 = {}
+        self.by_crc = {}
+        self.files = 0
+        for path in paths:
+            self.load(path)
+
+    def load(self, path):
+        import xml.etree.ElementTree as ET
+        try:
+            for _, elem in ET.iterparse(path, events=('end',)):
+                if elem.tag not in ('game', 'machine'):
+                    continue
+                name = elem.get('name') or (elem.findtext('description') or '')
+                for rom in elem.iter('rom'):
+                    sha1 = (rom.get('sha1') or '').lower()
+                    if sha1:
+                        self.by_sha1.setdefault(sha1, name)
+                    crc = (rom.get('crc') or '').lower()
+                    if crc:
+                        try:
+                            self.by_crc.setdefault((crc.zfill(8), int(rom.get('size') or -1)), name)
+                        except ValueError:
+                            pass
+                elem.clear()  # keep memory flat on large DATs
+            self.files += 1
+        except (OSError, ET.ParseError) as e:
+            print(f"Skipping DAT file {path}: {e}")
+
+    def __len__(self):
+        return len(self.by_sha1) + len(self.by_crc)
+
+    def lookup(self, hashes):
+        """Game name for a hash_rom_file result, or None."""
+        for size, crc, sha1 in hashes:
+            name = self.by_sha1.get(sha1) or self.by_crc.get((crc, size))
+            if name:
+                return name
+        return None
+
+def get_rom_hash_cache():
+    """The ROM hash cache stored in the icon cache folder."""
+    return RomHashCache(os.path.join(get_icons_cache_dir(), 'rom_hashes.json'))
+
+def save_rom_hash_cache(hash_cache):
+    try:
+        hash_cache.save()
+    except OSError as e:
+        print(f"Could not save ROM hash cache: {e}")
+
+_dat_index = None
+_dat_index_key = None
+_rom_hash_pool = None
+_rom_identify_lock = threading.Lock()
+
+def find_dat_files():
+    """DAT files from the rom_dat_paths config key (files, or folders searched recursively)."""
+    paths = get_config().get('rom_dat_paths', [])
+    if isinstance(paths, str):
+        paths = [paths]
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.lower().endswith(DAT_EXTENSIONS))
+        elif os.path.isfile(path):
+            found.append(path)
+    return sorted(found)
+
+def get_dat_index():
+    """DatIndex over the configured DAT files, rebuilt when one of them changes."""
+    global _dat_index, _dat_index_key
+    files = find_dat_files()
+    key = []
+    for path in files:
+        try:
+            key.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+    with _rom_identify_lock:
+        if _dat_index is None or key != _dat_index_key:
+            _dat_index = DatIndex(path for path, _ in key)
+            _dat_index_key = key
+        return _dat_index
+
+def get_rom_hash_pool():
+    """Process pool for hash_rom_file; None if processes can't be started here."""
+    global _rom_hash_pool
+    with _rom_identify_lock:
+        if _rom_hash_pool is None:
+            try:
+                workers = max(1, int(get_config().get('rom_hash_workers', os.cpu_count() or 2)))
+            except (TypeError, ValueError):
+                workers = os.cpu_count() or 2
+            try:
+                _rom_hash_pool = start_process_pool(workers)
+            except (OSError, NotImplementedError) as e:
+                print(f"ROM hashing runs in-process ({e})")
+                _rom_hash_pool = False
+    return _rom_hash_pool or None
+
+def identify_roms(games, dat_index=None, hash_cache=None, progress_callback=None):
+    """
+    Rename games (in place) after the DAT entry their file's CRC32/SHA1 matches.
+    Matched games get 'dat_name' (the full DAT name) and a display_name without
+    its region/revision tags. Files are hashed in a process pool and the hashes
+    are cached by (path, size, mtime), so each file is read only once.
+    Callers identifying several batches should pass one hash_cache (see
+    get_rom_hash_cache) and save it once at the end; without one, the cache
+    file is loaded and saved by this call.
+    Returns the number of games identified.
+    """
+    if dat_index is None:
+        dat_index = get_dat_index()
+    if not len(dat_index):
+        return 0
+    own_cache = hash_cache is None
+    if own_cache:
+        hash_cache = get_rom_hash_cache()
+    hashes = {}
+    to_hash = []
+    for game in games:
+        try:
+            st = os.stat(game['path'])
+        except OSError:
+            hash_cache.discard(game['path'])
+            continue
+        cached = hash_cache.get(game['path'], st)
+        if cached is not None:
+            hashes[game['path']] = cached
+        else:
+            to_hash.append((st.st_size, game['path'], st))
+    if to_hash:
+        from concurrent.futures import BrokenExecutor, as_completed
+        to_hash.sort(key=lambda item: item[0], reverse=True)  # big images first keeps the workers busy
+        pool = get_rom_hash_pool()
+        if pool:
+            futures = {pool.submit(hash_rom_file, path): (path, st) for _, path, st in to_hash}
+            done = as_completed(futures)
+            results = ((futures[f], f) for f in done)
+        else:
+            results = (((path, st), None) for _, path, st in to_hash)
+        for idx, ((path, st), future) in enumerate(results, 1):
+            try:
+                try:
+                    result = future.result() if future else hash_rom_file(path)
+                except BrokenExecutor:
+                    result = hash_rom_file(path)  # The pool's workers died; hash here instead
+            except (OSError, ValueError) as e:
+                print(f"Could not hash {path}: {e}")
+                continue
+            hash_cache.put(path, st, result)
+            hashes[path] = result
+            if progress_callback and (idx % 20 == 0 or idx == len(to_hash)):
+                progress_callback(f"Hashing ROMs {idx}/{len(to_hash)}...")
+    if own_cache:
+        save_rom_hash_cache(hash_cache)
+    identified = 0
+    for game in games:
+        name = dat_index.lookup(hashes.get(game['path'], ()))
+        if name:
+            game['dat_name'] = name
+            match = DAT_NAME_CUT.search(name)
+            title = name[:match.start()].strip() if match and match.start() > 0 else name
+            # "Legend of Zelda, The" -> "The Legend of Zelda"
+            game['display_name'] = DAT_TRAILING_ARTICLE.sub(r'\2 \1', title)
+            identified += 1
+    return identified
+
+# --- Steam Shortcuts Logic ---
+import vdf
+from collections.abc import Mapping, MutableMapping
+
+_steam_userdata_path = None
+
+def get_steam_userdata_path():
+    """Get Steam userdata path for Windows or Linux (Steam Deck), probed once per process."""
+    global _steam_userdata_path
+    if _steam_userdata_path is not None:
+        return _steam_userdata_path
+    import platform
+    
+    if platform.system() == 'Windows':
+        # Windows paths
+        possible_paths = [
+            os.path.expandvars(r'C:\Program Files (x86)\Steam\userdata'),
+            os.path.expandvars(r'C:\Program Files\Steam\userdata'),
+            os.path.expandvars(r'D:\Steam\userdata'),
+            os.path.expandvars(r'E:\Steam\userdata'),
+        ]
+    else:
+        # Linux/Steam Deck paths
+        home = os.path.expanduser('~')
+        possible_paths = [
+            os.path.join(home, '.local', 'share', 'Steam', 'userdata'),
+            os.path.join(home, '.steam', 'steam', 'userdata'),
+            os.path.join(home, '.var', 'app', 'com.valvesoftware.Steam', '.local', 'share', 'Steam', 'userdata'),  # Flatpak
+        ]
+    
+    for path in possible_paths:
+        if os.path.exists(path):
+            _steam_userdata_path = path
+            return path
+    
+    raise FileNotFoundError(f'Could not find Steam userdata folder. Searched: {possible_paths}')
+
+VDF_TOKEN_RE = re.compile(r'"((?:\\.|[^"\\])*)"|([{}])|(//.*)|([^\s"{}]+)')
+VDF_ESCAPES = {'n': '\n', 't': '\t', '\\': '\\', '"': '"'}
+PERSONA_NAME_PATH = ('userlocalconfigstore', 'friends', 'personaname')
+STEAM_USER_WORKERS = 8
+
+_persona_cache = {}
+_persona_lock = threading.Lock()
+
+def _vdf_unescape(value):
+    return re.sub(r'\\(.)', lambda m: VDF_ESCAPES.get(m.group(1), m.group(0)), value)
+
+def read_vdf_value(path, key_path):
+    """Stream a text VDF file and return the value at key_path (lowercase keys),
+    stopping as soon as it is found. Sections off that path are skipped by
+    counting braces, so most of a large file is never tokenized."""
+    depth = 0         # open sections, all of them matching key_path
+    skip = 0          # open sections below one that is off the path
+    pending_key = None
+    with open(path, 'rb') as f:
+        for raw in f:
+            if skip:
+                opened = raw.count(b'{')
+                closed = raw.count(b'}')
+                if not opened and not closed:
+                    continue
+                if b'"' not in raw:
+                    skip += opened - closed
+                    continue
+            line = raw.decode('utf-8', errors='replace')
+            for m in VDF_TOKEN_RE.finditer(line):
+                quoted, brace, comment, bare = m.groups()
+                if comment is not None:
+                    break
+                if brace == '{':
+                    if skip or depth >= len(key_path) - 1 or (pending_key or '').lower() != key_path[depth]:
+                        skip += 1
+                    else:
+                        depth += 1
+                    pending_key = None
+                elif brace == '}':
+                    if skip:
+                        skip -= 1
+                    elif depth:
+                        depth -= 1
+                    pending_key = None
+                elif bare is not None and bare.startswith('['):
+                    continue  # platform conditional such as [$WIN32]
+                elif skip:
+                    continue
+                else:
+                    token = _vdf_unescape(quoted) if quoted is not None else bare
+                    if pending_key is None:
+                        pending_key = token
+                    else:
+                        if depth == len(key_path) - 1 and pending_key.lower() == key_path[-1]:
+                            return token
+                        pending_key = None
+    return None
+
+def get_steam_persona_name(config_path):
+    """PersonaName from a localconfig.vdf, cached by the file's mtime and size."""
+    try:
+        st = os.stat(config_path)
+    except OSError:
+        return None
+    sig = (st.st_mtime_ns, st.st_size)
+    with _persona_lock:
+        cached = _persona_cache.get(config_path)
+    if cached and cached[0] == sig:
+        return cached[1]
+    try:
+        persona = read_vdf_value(config_path, PERSONA_NAME_PATH)
+    except (OSError, ValueError):
+        persona = None
+    with _persona_lock:
+        _persona_cache[config_path] = (sig, persona)
+    return persona
+
+def get_steam_users():
+    """
+    Returns a list of dicts: [{ 'steamid': ..., 'personaname': ... }]
+    """
+    userdata_path = get_steam_userdata_path()
+    user_ids = [u for u in os.listdir(userdata_path) if u.isdigit()]
+    config_paths = [os.path.join(userdata_path, u, 'config', 'localconfig.vdf') for u in user_ids]
+    if len(config_paths) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(STEAM_USER_WORKERS, len(config_paths))) as pool:
+            personas = list(pool.map(get_steam_persona_name, config_paths))
+    else:
+        personas = [get_steam_persona_name(p) for p in config_paths]
+    return [{'steamid': user_id, 'personaname': persona or user_id}
+            for user_id, persona in zip(user_ids, personas)]
+
+def find_steam_shortcuts_vdf(steamid=None):
+    userdata_path = get_steam_userdata_path()
+    # Find the user folder (should be the SteamID)
+    if steamid:
+        config_path = os.path.join(userdata_path, steamid, 'config')
+        if os.path.isdir(config_path):
+            vdf_path = os.path.join(config_path, 'shortcuts.vdf')
+            return vdf_path
+        raise FileNotFoundError(f'Could not find shortcuts.vdf for SteamID {steamid}')
+    # Fallback: first user
+    for user_id in os.listdir(userdata_path):
+        config_path = os.path.join(userdata_path, user_id, 'config')
+        if os.path.isdir(config_path):
+            vdf_path = os.path.join(config_path, 'shortcuts.vdf')
+            return vdf_path
+    raise FileNotFoundError('Could not find shortcuts.vdf in any Steam user config.')
+
+def find_steam_collections_json(steamid=None):
+    """Path of the user's cloud-storage-namespace-1.json (collections), or None if missing."""
     userdata_path = get_steam_userdata_path()
     if not steamid:
         # fallback: first user
@@ -676,155 +2145,326 @@ def add_shortcuts_to_steam_collection(appids, collection_name, steamid=None):
             if os.path.exists(json_path):
                 steamid = user_id
                 break
+    if not steamid:
+        return None
     config_path = os.path.join(userdata_path, steamid, 'config', 'cloudstorage')
     json_path = os.path.join(config_path, 'cloud-storage-namespace-1.json')
     if not os.path.exists(json_path):
         print(f"JSON file not found at {json_path}")
-        return  # Can't add to collection if file doesn't exist
+        return None
+    return json_path
+
+def load_steam_collections(json_path):
     with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    # Find or create the collection by name
-    found = False
-    for entry in data:
-        key, value = entry
-        if key.startswith('user-collections.'):
-            v = value.get('value')
-            if not v:
+        return json.load(f)
+
+def save_steam_collections(json_path, data):
+    # Sort collections so new ones are not at the end (Steam expects sorted by key)
+    data.sort(key=lambda x: x[0] if isinstance(x, list) and len(x) > 0 else str(x))
+    return write_file_atomic(json_path, json.dumps(data, separators=(',', ':')).encode('utf-8'), backups=STEAM_FILE_BACKUPS)
+
+class SteamCollections:
+    """
+    Steam user collections loaded from cloud-storage-namespace-1.json.
+    Collections are indexed by name once (each value is parsed a single time) and
+    membership is kept in sets, so adding thousands of appids is linear. Only the
+    collections that actually changed are re-serialized by commit().
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._by_name = {}  # name -> [storage value dict, parsed collection, member set or None]
+        self._changed = []
+        self._max_version = 0
+        for entry in data:
+            if not (isinstance(entry, list) and len(entry) > 1):
+                continue
+            key, value = entry[0], entry[1]
+            ver = value.get('version')
+            if isinstance(ver, str) and ver.isdigit():
+                self._max_version = max(self._max_version, int(ver))
+            if not key.startswith('user-collections.') or not value.get('value'):
                 continue
             try:
-                vobj = json.loads(v)
+                vobj = json.loads(value['value'])
             except Exception:
                 continue
-            print(f"Checking collection '{vobj.get('name')}'")
-            if vobj.get('name') == collection_name:
-                print(f"Found existing collection '{collection_name}'")
-                # Add appids to 'added' array as integers if not present
-                added = vobj.setdefault('added', [])
-                initial_count = len(added)
-                changed = False
-                for appid in appids:
-                    appid_int = int(appid)
-                    if appid_int not in [int(a) for a in added]:
-                        added.append(appid_int)
-                        changed = True
-                        print(f"  Adding appid {appid_int}")
-                
-                if changed:
-                    # Remove duplicates and sort
-                    vobj['added'] = sorted(set(int(a) for a in added))
-                    # Update the value with new JSON
-                    value['value'] = json.dumps(vobj, separators=(',', ':'))
-                    # Update timestamp to trigger Steam to reload
-                    value['timestamp'] = int(time.time())
-                    # Increment version number
-                    current_version = int(value.get('version', '0'))
-                    value['version'] = str(current_version + 1)
-                    print(f"  Updated collection: {len(vobj['added']) - initial_count} new games added (total: {len(vobj['added'])})")
-                else:
-                    print(f"  No new games to add (all already in collection)")
-                found = True
-                break
-    if not found:
-        print(f"Creating new collection '{collection_name}'")
-        # Create a new static collection entry
-        new_id = f"uc-{int(time.time() * 1000):x}"
-        vobj = {
-            "id": new_id,
-            "name": collection_name,
-            "added": sorted(set(int(a) for a in appids)),
-            "removed": [],
+            # First collection with a name wins, like the old linear search
+            self._by_name.setdefault(vobj.get('name'), [value, vobj, None])
+
+    def _members(self, name):
+        record = self._by_name[name]
+        if record[2] is None:
+            record[2] = set(int(a) for a in record[1].get('added', []))
+        return record[2]
+
+    def add(self, collection_name, appids):
+        """Add appids to a static collection (created if missing). Returns how many were new."""
+        if collection_name not in self._by_name:
+            print(f"Creating new collection '{collection_name}'")
+            new_id = f"uc-{int(time.time() * 1000):x}"
+            while f"user-collections.{new_id}" in (e[0] for e in self.data if isinstance(e, list) and e):
+                new_id += 'a'  # Two collections created within the same millisecond
             # For static collections, do NOT include filterSpec
-        }
-        # Find the next version number
-        max_version = 0
-        for entry in data:
-            if isinstance(entry, list) and len(entry) > 1:
-                ver = entry[1].get('version')
-                if ver and ver.isdigit():
-                    max_version = max(max_version, int(ver))
-        next_version = str(max_version + 1)
-        entry = [f"user-collections.{new_id}", {
-            "key": f"user-collections.{new_id}",
-            "timestamp": int(time.time()),
-            "value": json.dumps(vobj, separators=(',', ':')),
-            "version": next_version,
-            "strMethodId": "static"
-        }]
-        data.append(entry)
-    # Sort collections so new ones are not at the end (Steam expects sorted by key)
-    data.sort(key=lambda x: x[0] if isinstance(x, list) and len(x) > 0 else str(x))
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, separators=(',', ':'))
-    print(f"Updated cloud-storage-namespace-1.json with collection '{collection_name}'")
+            vobj = {"id": new_id, "name": collection_name, "added": [], "removed": []}
+            value = {"key": f"user-collections.{new_id}", "timestamp": 0, "value": "", "version": None, "strMethodId": "static"}
+            self.data.append([value['key'], value])
+            self._by_name[collection_name] = [value, vobj, set()]
+            self._changed.append(collection_name)
+        members = self._members(collection_name)
+        new = set(int(a) for a in appids) - members
+        if new:
+            members |= new
+            if collection_name not in self._changed:
+                self._changed.append(collection_name)
+            print(f"  '{collection_name}': {len(new)} new games added (total: {len(members)})")
+        return len(new)
 
-def add_steam_shortcuts(emulator, platform, games, steamid=None, launch_options_template='#rom', fetch_icons=True, progress_callback=None):
-    vdf_path = find_steam_shortcuts_vdf(steamid)
-    # Read existing shortcuts robustly
-    shortcut_dict = {}
-    if os.path.exists(vdf_path):
+    def remove(self, collection_name, appids):
+        """Take appids out of a collection. Returns how many were members."""
+        if collection_name not in self._by_name:
+            return 0
+        members = self._members(collection_name)
+        gone = members & set(int(a) for a in appids)
+        if gone:
+            members -= gone
+            if collection_name not in self._changed:
+                self._changed.append(collection_name)
+            print(f"  '{collection_name}': {len(gone)} games removed (total: {len(members)})")
+        return len(gone)
+
+    def remove_missing(self, live_appids):
+        """
+        Take non-Steam appids (high bit set) that are not in live_appids out of
+        every collection. Steam games are never touched. Returns how many were removed.
+        """
+        removed = 0
+        for name in list(self._by_name):
+            gone = [a for a in self._members(name) if a & 0x80000000 and a not in live_appids]
+            if gone:
+                removed += self.remove(name, gone)
+        return removed
+
+    def apply(self, updates):
+        """Add many {collection_name: appids} at once. Returns the number of new memberships."""
+        return sum(self.add(name, appids) for name, appids in updates.items())
+
+    def commit(self):
+        """Serialize the changed collections back into data. Returns True if anything changed."""
+        if not self._changed:
+            return False
+        now = int(time.time())
+        for name in self._changed:
+            value, vobj, members = self._by_name[name]
+            vobj['added'] = sorted(members)
+            value['value'] = json.dumps(vobj, separators=(',', ':'))
+            # Update timestamp and version so Steam reloads the collection
+            value['timestamp'] = now
+            version = value.get('version')
+            if isinstance(version, str) and version.isdigit():
+                value['version'] = str(int(version) + 1)
+            else:
+                # New collections, and entries stored without a (numeric) version
+                self._max_version += 1
+                value['version'] = str(self._max_version)
+        self._changed = []
+        return True
+
+def add_shortcuts_to_steam_collection(appids, collection_name, steamid=None):
+    print(f"Adding appids {appids} to collection '{collection_name}' for steamid {steamid}")
+    # Find cloud-storage-namespace-1.json for the user
+    json_path = find_steam_collections_json(steamid)
+    if not json_path:
+        return  # Can't add to collection if file doesn't exist
+    collections = SteamCollections(load_steam_collections(json_path))
+    collections.add(collection_name, appids)
+    if collections.commit():
+        save_steam_collections(json_path, collections.data)
+        print(f"Updated cloud-storage-namespace-1.json with collection '{collection_name}'")
+    else:
+        print("  No new games to add (all already in collection)")
+
+STEAM_FILE_BACKUPS = 3  # Rotating copies kept of shortcuts.vdf and the collections JSON
+
+def rotate_backups(path, count):
+    """Shift path.bak1..bak(count-1) up by one and save the current path as path.bak1."""
+    import shutil
+    for n in range(count - 1, 0, -1):
+        older = f"{path}.bak{n}"
+        if os.path.exists(older):
+            os.replace(older, f"{path}.bak{n + 1}")
+    tmp_path = f"{path}.bak1.tmp"
+    try:
+        os.link(path, tmp_path)  # Cheap: shares data with the file that is about to be replaced
+    except OSError:
+        shutil.copy2(path, tmp_path)
+    os.replace(tmp_path, f"{path}.bak1")
+
+def write_file_atomic(path, data, backups=0):
+    """
+    Crash-safe write of bytes to path: temp file in the same folder, fsync, then os.replace,
+    so a crash leaves either the old or the new file and never a truncated one.
+    Nothing is written (returns False) if path already holds exactly these bytes.
+    With backups > 0 the previous content is kept as path.bak1 (newest) .. path.bak<backups>.
+    """
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if backups and os.path.exists(path):
+            rotate_backups(path, backups)
+        os.replace(tmp_path, path)
+    except BaseException:
         try:
-            with open(vdf_path, 'rb') as f:
-                shortcuts = vdf.binary_load(f)
-            shortcut_dict = shortcuts.get('shortcuts', {})
-            if not isinstance(shortcut_dict, dict):
-                shortcut_dict = {}
-        except Exception:
-            shortcut_dict = {}
-    shortcut_list = list(shortcut_dict.values())
-    updated = 0
-    new_appids = []
-    # First pass: collect appids and mark updates
-    for game in games:
-        appid = calc_shortcut_appid(emulator.replace('/', '\\'), game['display_name'])
-        # Convert to unsigned 32-bit integer for collection management
-        new_appids.append(int(appid) & 0xFFFFFFFF)
-        updated += 1
-    # Remove duplicates from new_appids
-    new_appids = sorted(set(new_appids))
-    # Second pass: write/update shortcuts
-    total_games = len(games)
-    for idx, game in enumerate(games, 1):
-        # Update progress
-        if progress_callback:
-            progress_callback(f"Processing {idx}/{total_games}: {game['display_name']}")
-        
-        # Fetch icon if enabled (save directly to Steam's grid folder)
-        icon_path = None
-        if fetch_icons:
-            appid = calc_shortcut_appid(emulator.replace('/', '\\'), game['display_name'])
-            icon_path = fetch_game_icon(game['display_name'], appid, steamid, platform.lower(), progress_callback)
-        
-        found = False
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if os.name != 'nt':
+        # Persist the rename itself (directory entry); not supported on Windows
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return True
+
+class ShortcutIndex:
+    """Existing shortcuts looked up by name and by unsigned appid, built once per merge."""
+
+    def __init__(self, shortcut_list):
+        self.by_name = {}
+        self.by_appid = {}
         for s in shortcut_list:
-            if s.get('AppName') == game['display_name'] or s.get('appname') == game['display_name']:
-                s['AppName'] = game['display_name']
-                s['Exe'] = f'"{emulator}"'.replace('/', '\\')
-                s['StartDir'] = f'"{os.path.dirname(emulator)}"'.replace('/', '\\')
-                s['LaunchOptions'] = launch_options_template.replace('#rom', f'"{game["path"]}"')
-                s['LastPlayTime'] = int(time.time())
-                s['DevkitOverrideAppID'] = 0
-                s['FlatpakAppID'] = ''
-                s['sortas'] = ''
-                s['tags'] = {}
-                s['appid'] = calc_shortcut_appid(emulator.replace('/', '\\'), game['display_name'])
-                # Set icon path if we have one
-                if icon_path:
-                    s['icon'] = icon_path
-                # Remove lowercase keys if present
-                if 'appname' in s:
-                    del s['appname']
-                if 'exe' in s:
-                    del s['exe']
-                found = True
-                break
-        if not found:
+            self.add(s)
+
+    def add(self, s):
+        # setdefault keeps the first shortcut in list order, like the old linear scan
+        for key in ('AppName', 'appname'):
+            name = s.get(key)
+            if isinstance(name, str):
+                self.by_name.setdefault(name, s)
+        try:
+            self.by_appid.setdefault(int(s.get('appid')) & 0xFFFFFFFF, s)
+        except (TypeError, ValueError):
+            pass
+
+    def find(self, name, unsigned_appid):
+        s = self.by_name.get(name)
+        return s if s is not None else self.by_appid.get(unsigned_appid)
+
+SHORTCUT_CHANGE_ACTIONS = ('add', 'modify', 'unchanged', 'remove')
+# Old lowercase spellings of fields that are rewritten with their current names
+LEGACY_SHORTCUT_KEYS = ('appname', 'exe')
+
+class ShortcutChangeSet:
+    """
+    The difference between the shortcuts a plan entry wants and the ones a user has.
+    Each change is a dict with 'action' (add/modify/unchanged/remove), 'name',
+    'appid' (unsigned), 'shortcut' (the existing entry, or the new one for adds),
+    and for modifications the 'fields' to set and legacy keys to 'drop'.
+    """
+
+    def __init__(self):
+        self.changes = []
+
+    def record(self, action, name, appid, shortcut, fields=None, drop=()):
+        self.changes.append({'action': action, 'name': name, 'appid': appid, 'shortcut': shortcut,
+                             'fields': fields or {}, 'drop': tuple(drop)})
+
+    def of(self, action):
+        return [c for c in self.changes if c['action'] == action]
+
+    def counts(self):
+        counts = dict.fromkeys(SHORTCUT_CHANGE_ACTIONS, 0)
+        for change in self.changes:
+            counts[change['action']] += 1
+        return counts
+
+    def has_changes(self):
+        return any(c['action'] != 'unchanged' for c in self.changes)
+
+    def summary(self):
+        return ', '.join(f"{n} {action}" for action, n in self.counts().items())
+
+    def describe(self):
+        """Human readable lines for a dry run (unchanged shortcuts are only counted)."""
+        lines = []
+        for change in self.changes:
+            if change['action'] == 'add':
+                lines.append(f"  + {change['name']} ({change['appid']})")
+            elif change['action'] == 'modify':
+                fields = ', '.join(sorted(change['fields']) + [f"-{k}" for k in change['drop']])
+                lines.append(f"  ~ {change['name']} ({change['appid']}): {fields}")
+            elif change['action'] == 'remove':
+                lines.append(f"  - {change['name']} ({change['appid']})")
+        return lines
+
+def _same_appid(current, appid):
+    # Steam stores appid as a signed int32, we write the unsigned value as a string
+    try:
+        return int(current) & 0xFFFFFFFF == int(appid) & 0xFFFFFFFF
+    except (TypeError, ValueError):
+        return False
+
+LAUNCH_PATH_RE = re.compile(r'"([^"]+)"')
+
+def _launches_from(s, folder):
+    """True if a quoted path in the shortcut's launch options lies inside folder."""
+    prefix = os.path.join(os.path.normcase(os.path.abspath(folder)), '')
+    for path in LAUNCH_PATH_RE.findall(s.get('LaunchOptions') or s.get('launchoptions') or ''):
+        if os.path.normcase(os.path.abspath(path)).startswith(prefix):
+            return True
+    return False
+
+def plan_shortcut_changes(shortcut_list, emulator, games, launch_options_template='#rom', icon_paths=None,
+                          appids=None, prune=False, changes=None, roms_folder=None, keep=()):
+    """
+    Compare the shortcuts games should have with shortcut_list without changing it.
+    Matched shortcuts only get the fields that differ (name, executable, start
+    folder, launch options, appid and icon); play time, tags and sort names are
+    left alone. With prune, shortcuts of this emulator whose ROM lies in
+    roms_folder but is no longer in games (nor in keep, the unsigned appids
+    other plan entries want) are planned for removal; without roms_folder
+    nothing is pruned. Returns a ShortcutChangeSet.
+    """
+    icon_paths = icon_paths or {}
+    changes = changes if changes is not None else ShortcutChangeSet()
+    # Values that only depend on the emulator are computed once
+    exe_key = emulator.replace('/', '\\')
+    exe_field = f'"{emulator}"'.replace('/', '\\')
+    start_dir = f'"{os.path.dirname(emulator)}"'.replace('/', '\\')
+    now = int(time.time())
+    if appids is None:
+        appids = [calc_shortcut_appid(exe_key, game['display_name']) for game in games]
+    index = ShortcutIndex(shortcut_list)
+    wanted = set()
+    for game, appid in zip(games, appids):
+        name = game['display_name']
+        unsigned_appid = int(appid) & 0xFFFFFFFF
+        if unsigned_appid in wanted:
+            continue  # the same game twice (e.g. in two folders): first one wins
+        wanted.add(unsigned_appid)
+        icon_path = icon_paths.get(appid)
+        launch_options = launch_options_template.replace('#rom', f'"{game["path"]}"')
+        s = index.find(name, unsigned_appid)
+        if s is None:
             shortcut = {
-                'AppName': game['display_name'],
-                'Exe': f'"{emulator}"'.replace('/', '\\'),
-                'StartDir': f'"{os.path.dirname(emulator)}"'.replace('/', '\\'),
+                'AppName': name,
+                'Exe': exe_field,
+                'StartDir': start_dir,
                 'icon': icon_path if icon_path else '',
                 'ShortcutPath': '',
-                'LaunchOptions': launch_options_template.replace('#rom', f'"{game["path"]}"'),
+                'LaunchOptions': launch_options,
                 'IsHidden': 0,
                 'AllowDesktopConfig': 1,
                 'AllowOverlay': 1,
@@ -832,29 +2472,628 @@ def add_steam_shortcuts(emulator, platform, games, steamid=None, launch_options_
                 'Devkit': 0,
                 'DevkitGameID': '',
                 'DevkitOverrideAppID': 0,
-                'LastPlayTime': int(time.time()),
+                'LastPlayTime': now,
                 'FlatpakAppID': '',
                 'sortas': '',
                 'tags': {},
-                'appid': calc_shortcut_appid(emulator.replace('/', '\\'), game['display_name'])
+                'appid': appid
             }
-            shortcut_list.append(shortcut)
-    
-    if progress_callback:
-        progress_callback(f"Writing {len(shortcut_list)} shortcuts to Steam...")
-    
-    print(f"Writing shortcuts to {vdf_path}")
-    shortcuts_dict = {'shortcuts': {str(i): s for i, s in enumerate(shortcut_list)}}
-    with open(vdf_path, 'wb') as f:
-        vdf.binary_dump(shortcuts_dict, f)
-    print(f"Shortcuts written successfully")
-    
-    if progress_callback:
-        progress_callback(f"Adding games to '{platform}' collection...")
-    
-    # Add to Steam static collection after shortcuts
-    add_shortcuts_to_steam_collection(new_appids, platform, steamid)
-    return updated
+            changes.record('add', name, unsigned_appid, shortcut)
+            continue
+        desired = {'AppName': name, 'Exe': exe_field, 'StartDir': start_dir, 'LaunchOptions': launch_options}
+        if icon_path:
+            desired['icon'] = icon_path
+        fields = {key: value for key, value in desired.items() if s.get(key) != value}
+        if not _same_appid(s.get('appid'), appid):
+            fields['appid'] = appid
+        drop = [key for key in LEGACY_SHORTCUT_KEYS if key in s]
+        if fields or drop:
+            changes.record('modify', name, unsigned_appid, s, fields, drop)
+        else:
+            changes.record('unchanged', name, unsigned_appid, s)
+    if prune and roms_folder:
+        for s in shortcut_list:
+            try:
+                unsigned_appid = int(s.get('appid')) & 0xFFFFFFFF
+            except (TypeError, ValueError):
+                continue
+            # Only non-Steam shortcuts (high bit set) of this emulator for ROMs in this folder are ours to remove;
+            # the same emulator may run other platforms from other folders
+            if (unsigned_appid & 0x80000000 and unsigned_appid not in wanted and unsigned_appid not in keep
+                    and (s.get('Exe') or s.get('exe')) == exe_field and _launches_from(s, roms_folder)):
+                changes.record('remove', s.get('AppName') or s.get('appname') or '', unsigned_appid, s)
+    return changes
+
+def apply_shortcut_changes(shortcut_list, changes, progress_callback=None):
+    """Carry out a ShortcutChangeSet on shortcut_list (in place). Returns the number of shortcuts changed."""
+    applied = 0
+    total = len(changes.changes)
+    removed = set()
+    for idx, change in enumerate(changes.changes, 1):
+        # Update progress (every game would make the GUI repaint thousands of times)
+        if progress_callback and (idx % 50 == 0 or idx == total):
+            progress_callback(f"Processing {idx}/{total}: {change['name']}")
+        action = change['action']
+        if action == 'add':
+            shortcut_list.append(change['shortcut'])
+        elif action == 'modify':
+            s = change['shortcut']
+            for key, value in change['fields'].items():
+                s[key] = value
+            for key in change['drop']:
+                del s[key]
+        elif action == 'remove':
+            removed.add(id(change['shortcut']))
+        else:
+            continue
+        applied += 1
+    if removed:
+        shortcut_list[:] = [s for s in shortcut_list if id(s) not in removed]
+    return applied
+
+def merge_shortcuts(shortcut_list, emulator, games, launch_options_template='#rom', icon_paths=None, appids=None, progress_callback=None):
+    """
+    Add or update one shortcut per game in shortcut_list (modified in place).
+    appids may hold the precomputed calc_shortcut_appid value of each game.
+    Returns the sorted unsigned appids of the games, for collection management.
+    """
+    changes = plan_shortcut_changes(shortcut_list, emulator, games, launch_options_template, icon_paths, appids)
+    apply_shortcut_changes(shortcut_list, changes, progress_callback)
+    return sorted(c['appid'] for c in changes.changes)
+
+# --- shortcuts.vdf codec ---
+# Binary VDF type bytes (see the vdf package); fixed-size types map to their size
+BIN_MAP, BIN_STRING, BIN_INT32, BIN_FLOAT32, BIN_POINTER = 0x00, 0x01, 0x02, 0x03, 0x04
+BIN_WIDESTRING, BIN_COLOR, BIN_UINT64, BIN_END, BIN_INT64 = 0x05, 0x06, 0x07, 0x08, 0x0A
+BIN_FIXED_SIZES = {BIN_INT32: 4, BIN_FLOAT32: 4, BIN_POINTER: 4, BIN_COLOR: 4, BIN_UINT64: 8, BIN_INT64: 8}
+SHORTCUTS_HEADER = b'\x00shortcuts\x00'
+# String and int32 fields make up nearly all of a shortcuts.vdf (tags are string maps),
+# so they are matched by regex in C instead of byte by byte
+BIN_FIELD_RE = re.compile(rb'\x01([^\x00]*)\x00([^\x00]*)\x00|\x02([^\x00]*)\x00(.{4})', re.DOTALL)
+BIN_FIELD_RUN_RE = re.compile(rb'(?:\x01[^\x00]*\x00[^\x00]*\x00|\x02[^\x00]*\x00.{4})*', re.DOTALL)
+_NESTED = object()  # placeholder for map fields in Shortcut scalar scans
+
+def _cstring_end(data, pos):
+    end = data.find(b'\x00', pos)
+    if end < 0:
+        raise ValueError(f"unterminated string at offset {pos}")
+    return end
+
+def _wide_string_end(data, pos):
+    end = data.find(b'\x00\x00', pos)
+    if end < 0:
+        raise ValueError(f"unterminated wide string at offset {pos}")
+    return end + (end - pos) % 2  # the terminator starts on a character boundary
+
+def _decode_fixed(data, t, pos):
+    """Value of a fixed-size field, as the vdf package represents it."""
+    import struct
+    raw = data[pos:pos + BIN_FIXED_SIZES[t]]
+    if t == BIN_FLOAT32:
+        return struct.unpack('<f', raw)[0]
+    if t == BIN_UINT64:
+        return vdf.UINT_64(int.from_bytes(raw, 'little'))
+    value = int.from_bytes(raw, 'little', signed=True)
+    if t == BIN_INT64:
+        return vdf.INT_64(value)
+    if t == BIN_POINTER:
+        return vdf.POINTER(value)
+    if t == BIN_COLOR:
+        return vdf.COLOR(value)
+    return value
+
+def skip_binary_vdf_map(data, pos):
+    """Offset just past the end byte of the binary VDF map whose fields start at pos,
+    without decoding anything."""
+    depth = 0
+    run = BIN_FIELD_RUN_RE.match
+    while True:
+        pos = run(data, pos).end()
+        t = data[pos]
+        if t == BIN_END:
+            pos += 1
+            if depth == 0:
+                return pos
+            depth -= 1
+            continue
+        pos = _cstring_end(data, pos + 1) + 1  # field name
+        if t == BIN_MAP:
+            depth += 1
+        elif t == BIN_WIDESTRING:
+            pos = _wide_string_end(data, pos) + 2
+        elif t in BIN_FIXED_SIZES:
+            pos += BIN_FIXED_SIZES[t]
+        else:
+            raise ValueError(f"unknown binary VDF type {t} at offset {pos}")
+
+def decode_binary_vdf_map(data, pos, scalars_only=False):
+    """
+    Decode the binary VDF map whose fields start at pos into a dict, with the same
+    values vdf.binary_loads gives. With scalars_only, nested maps are skipped and
+    listed as _NESTED.
+    """
+    root = {}
+    stack = [root]
+    match = BIN_FIELD_RE.match
+    while True:
+        m = match(data, pos)
+        if m:
+            key, value, int_key, int_value = m.groups()
+            if key is not None:
+                stack[-1][key.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+            else:
+                stack[-1][int_key.decode('utf-8', 'replace')] = int.from_bytes(int_value, 'little', signed=True)
+            pos = m.end()
+            continue
+        t = data[pos]
+        if t == BIN_END:
+            pos += 1
+            if len(stack) == 1:
+                return root
+            stack.pop()
+            continue
+        key_end = _cstring_end(data, pos + 1)
+        key = data[pos + 1:key_end].decode('utf-8', 'replace')
+        pos = key_end + 1
+        if t == BIN_MAP:
+            if scalars_only:
+                stack[-1][key] = _NESTED
+                pos = skip_binary_vdf_map(data, pos)
+                continue
+            child = stack[-1].get(key)
+            if not isinstance(child, dict):  # vdf merges repeated map keys
+                child = stack[-1][key] = {}
+            stack.append(child)
+        elif t == BIN_WIDESTRING:
+            end = _wide_string_end(data, pos)
+            stack[-1][key] = data[pos:end].decode('utf-16')
+            pos = end + 2
+        elif t in BIN_FIXED_SIZES:
+            stack[-1][key] = _decode_fixed(data, t, pos)
+            pos += BIN_FIXED_SIZES[t]
+        else:
+            raise ValueError(f"unknown binary VDF type {t} at offset {pos}")
+
+class Shortcut(MutableMapping):
+    """
+    One entry of a shortcuts.vdf, decoded only as far as it is used.
+    Plain string/int lookups (AppName, appid, ...) come from a scan of the
+    entry's top-level fields that skips nested maps; anything else decodes the
+    whole entry. Until the entry is changed, or a nested map such as tags is handed
+    out, save_shortcuts writes its original bytes back unchanged.
+    """
+    __slots__ = ('_buf', '_start', '_end', '_scalars', '_data', '_dirty')
+
+    def __init__(self, buf, start, end):
+        self._buf = buf        # the whole file; entries share it
+        self._start = start    # first field of the entry
+        self._end = end        # just past the entry's end byte
+        self._scalars = None
+        self._data = None
+        self._dirty = False
+
+    def _fields(self):
+        if self._data is None:
+            self._data = decode_binary_vdf_map(self._buf, self._start)
+        return self._data
+
+    def _peek(self):
+        if self._scalars is None:
+            self._scalars = decode_binary_vdf_map(self._buf, self._start, scalars_only=True)
+        return self._scalars
+
+    def get(self, key, default=None):
+        if self._data is None:
+            value = self._peek().get(key, default)
+            if value is not _NESTED:
+                return value
+        return self[key] if key in self else default
+
+    def __contains__(self, key):
+        if self._data is None:
+            return key in self._peek()
+        return key in self._data
+
+    def __getitem__(self, key):
+        value = self._fields()[key]
+        if isinstance(value, Mapping):
+            self._dirty = True  # the caller may change it in place
+        return value
+
+    def __setitem__(self, key, value):
+        self._fields()[key] = value
+        self._dirty = True
+
+    def __delitem__(self, key):
+        del self._fields()[key]
+        self._dirty = True
+
+    def __iter__(self):
+        return iter(self._fields())
+
+    def __len__(self):
+        return len(self._fields())
+
+    def __repr__(self):
+        return f"Shortcut({dict(self._fields())!r})"
+
+    def raw_bytes(self):
+        """The entry's original encoding (fields and end byte), or None once it was changed."""
+        return None if self._dirty else memoryview(self._buf)[self._start:self._end]
+
+def parse_shortcuts(data):
+    """Split shortcuts.vdf bytes into lazily decoded Shortcut entries."""
+    if not data.startswith(SHORTCUTS_HEADER):
+        raise ValueError('not a shortcuts.vdf file')
+    entries = []
+    pos = len(SHORTCUTS_HEADER)
+    while data[pos] == BIN_MAP:
+        start = _cstring_end(data, pos + 1) + 1
+        end = skip_binary_vdf_map(data, start)
+        entries.append(Shortcut(data, start, end))
+        pos = end
+    if data[pos] != BIN_END:
+        raise ValueError(f"unexpected binary VDF type {data[pos]} at offset {pos}")
+    return entries
+
+def encode_shortcuts(shortcut_list):
+    """
+    Encode shortcuts as shortcuts.vdf bytes, byte-for-byte what vdf.binary_dumps
+    produces. Unchanged Shortcut entries are copied from the file they were read
+    from; only new and changed entries are encoded.
+    """
+    parts = [SHORTCUTS_HEADER]
+    for i, s in enumerate(shortcut_list):
+        raw = s.raw_bytes() if isinstance(s, Shortcut) else None
+        if raw is not None:
+            parts += (b'\x00', str(i).encode('ascii'), b'\x00', raw)
+        else:
+            parts.append(vdf.binary_dumps({str(i): dict(s)})[:-1])  # drop the root end byte
+    parts.append(b'\x08\x08')
+    return b''.join(parts)
+
+def load_shortcuts(vdf_path, strict=False):
+    """
+    Read the shortcut entries of a shortcuts.vdf as a list (empty if missing or unreadable).
+    With strict, a file that exists but can't be read or parsed raises ValueError instead.
+    """
+    if not os.path.exists(vdf_path):
+        return []
+    try:
+        with open(vdf_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        if strict:
+            raise ValueError(f"Could not read {vdf_path}: {e}")
+        return []
+    try:
+        return parse_shortcuts(data)
+    except (ValueError, IndexError):
+        pass
+    # Unusual layout: fall back to decoding everything with the vdf package
+    try:
+        shortcut_dict = vdf.binary_loads(data).get('shortcuts', {})
+    except Exception as e:
+        if strict:
+            raise ValueError(f"Could not parse {vdf_path}: {e}")
+        return []
+    if not isinstance(shortcut_dict, dict):
+        if strict:
+            raise ValueError(f"Could not parse {vdf_path}: no shortcuts section")
+        return []
+    return list(shortcut_dict.values())
+
+def save_shortcuts(vdf_path, shortcut_list):
+    return write_file_atomic(vdf_path, encode_shortcuts(shortcut_list), backups=STEAM_FILE_BACKUPS)
+
+# Files fetch_game_icon writes to the grid folder for an unsigned appid
+GRID_ARTWORK_SUFFIXES = ('p.png', '.png', '_hero.png', '_icon.png', '_logo.png')
+
+def list_grid_files(steamid):
+    """Names of the files in a user's grid folder (one directory listing)."""
+    try:
+        return set(os.listdir(os.path.join(get_steam_userdata_path(), steamid, 'config', 'grid')))
+    except OSError:
+        return set()
+
+def apply_shortcut_plan(plan, steamids, fetch_icons=True, progress_callback=None, dry_run=False, prune=False):
+    """
+    Apply several (emulator, platform, games) entries to several Steam users in one go.
+    plan is a list of dicts with 'emulator', 'platform', 'games' and optional
+    'launch_options' (default '#rom') and 'roms' (the folder the games came from). For each user the desired shortcuts are
+    compared with shortcuts.vdf, the grid folder and the collections first, and
+    only the differences are applied: artwork is fetched for games that lack
+    it, and each file is written once, and only if it changes. With dry_run
+    the changes are printed and nothing is fetched or written; with prune,
+    shortcuts of the plan's emulators for ROMs that are gone from an entry's
+    'roms' folder are removed. Games wanted by any entry are never pruned.
+    Returns the number of games processed.
+    """
+    count = 0
+    plan_appids = [[calc_shortcut_appid(item['emulator'].replace('/', '\\'), game['display_name']) for game in item['games']]
+                   for item in plan]
+    all_wanted = set(int(appid) & 0xFFFFFFFF for appids in plan_appids for appid in appids)
+    for steamid in steamids:
+        vdf_path = find_steam_shortcuts_vdf(steamid)
+        if not steamid:
+            # Fallback user picked by find_steam_shortcuts_vdf: userdata/<steamid>/config/shortcuts.vdf
+            steamid = os.path.basename(os.path.dirname(os.path.dirname(vdf_path)))
+        try:
+            # A file we can't read must not be replaced by one holding only the new shortcuts
+            shortcut_list = load_shortcuts(vdf_path, strict=True)
+        except ValueError as e:
+            print(f"✗ Skipping steamid {steamid}, shortcuts.vdf left untouched: {e}")
+            continue
+        grid_dir = os.path.join(get_steam_userdata_path(), steamid, 'config', 'grid')
+        grid_files = list_grid_files(steamid)
+        collection_updates = []
+        changed = 0
+        for item, appids in zip(plan, plan_appids):
+            emulator = item['emulator']
+            platform = item['platform']
+            games = item['games']
+            # Artwork is only fetched for games missing some of it; the rest keep their grid icon
+            icon_paths = {}
+            icon_jobs = []
+            for game, appid in zip(games, appids):
+                unsigned_appid = int(appid) & 0xFFFFFFFF
+                if all(f"{unsigned_appid}{suffix}" in grid_files for suffix in GRID_ARTWORK_SUFFIXES):
+                    icon_paths[appid] = os.path.join(grid_dir, f"{unsigned_appid}_icon.png")
+                elif fetch_icons:
+                    icon_jobs.append((game['display_name'], appid))
+            if icon_jobs and not dry_run:
+                if progress_callback:
+                    progress_callback(f"Fetching artwork for {len(icon_jobs)} {platform} games...")
+                fetched = fetch_game_icons(icon_jobs, steamid, platform.lower(), progress_callback)
+                icon_paths.update((appid, path) for appid, path in fetched.items() if path)
+            changes = plan_shortcut_changes(shortcut_list, emulator, games, item.get('launch_options', '#rom'),
+                                            icon_paths, appids, prune=prune, roms_folder=item.get('roms'),
+                                            keep=all_wanted)
+            if dry_run:
+                print(f"{platform} ({emulator}) for steamid {steamid}: {changes.summary()}")
+                for line in changes.describe():
+                    print(line)
+                if icon_jobs:
+                    print(f"  artwork would be fetched for {len(icon_jobs)} games")
+            else:
+                changed += apply_shortcut_changes(shortcut_list, changes, progress_callback)
+            collection_updates.append((platform, [c['appid'] for c in changes.changes if c['action'] != 'remove'],
+                                       [c['appid'] for c in changes.of('remove')]))
+            count += len(games)
+        
+        if not dry_run and changed:
+            if progress_callback:
+                progress_callback(f"Writing {len(shortcut_list)} shortcuts to Steam...")
+            print(f"Writing shortcuts to {vdf_path}")
+            if save_shortcuts(vdf_path, shortcut_list):
+                print("Shortcuts written successfully")
+            else:
+                print("Shortcuts unchanged, nothing written")
+        elif not dry_run:
+            print(f"Shortcuts for steamid {steamid} already up to date")
+        
+        # Add to Steam static collections after shortcuts
+        json_path = find_steam_collections_json(steamid)
+        if json_path:
+            collections = SteamCollections(load_steam_collections(json_path))
+            added = removed = 0
+            for platform, keep_appids, drop_appids in collection_updates:
+                added += collections.add(platform, keep_appids)
+                if drop_appids:
+                    removed += collections.remove(platform, drop_appids)
+            if dry_run:
+                if added or removed:
+                    print(f"Collections for steamid {steamid}: {added} to add, {removed} to remove")
+            elif collections.commit():
+                if progress_callback:
+                    progress_callback(f"Updating {len(collection_updates)} collection(s)...")
+                if save_steam_collections(json_path, collections.data):
+                    print(f"Updated cloud-storage-namespace-1.json for steamid {steamid}")
+    return count
+
+def remove_steam_shortcuts(plan, steamids, progress_callback=None):
+    """
+    Remove the shortcuts of the games in plan entries ('emulator', 'platform', 'games')
+    and take them out of the platform collections. Returns the number removed.
+    """
+    removed = 0
+    for steamid in steamids:
+        vdf_path = find_steam_shortcuts_vdf(steamid)
+        try:
+            shortcut_list = load_shortcuts(vdf_path, strict=True)
+        except ValueError as e:
+            print(f"✗ Skipping steamid {steamid}, shortcuts.vdf left untouched: {e}")
+            continue
+        drop = set()
+        collection_updates = {}
+        for item in plan:
+            exe_key = item['emulator'].replace('/', '\\')
+            unsigned = set(int(calc_shortcut_appid(exe_key, g['display_name'])) & 0xFFFFFFFF for g in item['games'])
+            drop |= unsigned
+            collection_updates.setdefault(item['platform'], set()).update(unsigned)
+        kept = []
+        for s in shortcut_list:
+            try:
+                appid = int(s.get('appid')) & 0xFFFFFFFF
+            except (TypeError, ValueError):
+                appid = None
+            if appid not in drop:
+                kept.append(s)
+        if len(kept) == len(shortcut_list):
+            continue
+        if progress_callback:
+            progress_callback(f"Removing {len(shortcut_list) - len(kept)} shortcuts...")
+        removed += len(shortcut_list) - len(kept)
+        save_shortcuts(vdf_path, kept)
+        json_path = find_steam_collections_json(steamid)
+        if json_path:
+            collections = SteamCollections(load_steam_collections(json_path))
+            for platform, appids in collection_updates.items():
+                collections.remove(platform, appids)
+            if collections.commit():
+                save_steam_collections(json_path, collections.data)
+    return removed
+
+# --- Garbage collection of shortcuts and artwork ---
+GRID_FILE_RE = re.compile(r'^(\d+)(p|_hero|_logo|_icon)?\.(png|jpe?g|webp|ico|json)$', re.IGNORECASE)
+
+def index_grid_files(steamid):
+    """
+    One scandir of a user's grid folder: {unsigned appid: [(path, size), ...]}
+    for the artwork of non-Steam shortcuts (appids with the high bit set).
+    """
+    grid_dir = os.path.join(get_steam_userdata_path(), steamid, 'config', 'grid')
+    index = {}
+    try:
+        with os.scandir(grid_dir) as it:
+            for entry in it:
+                match = GRID_FILE_RE.match(entry.name)
+                if not match:
+                    continue
+                appid = int(match.group(1))
+                if not 0x80000000 <= appid <= 0xFFFFFFFF:
+                    continue  # Steam games and old 64-bit shortcut IDs are left alone
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    size = 0
+                index.setdefault(appid, []).append((entry.path, size))
+    except OSError:
+        pass
+    return index
+
+def _shortcut_rom_path(s):
+    """The quoted ROM path in a shortcut's launch options, or None if it has none we recognize."""
+    extensions = tuple(ext for r in ROM_RECOGNIZERS.values() for ext in r.extensions)
+    for path in LAUNCH_PATH_RE.findall(s.get('LaunchOptions') or s.get('launchoptions') or ''):
+        if os.path.isabs(path) and path.lower().endswith(extensions):
+            return path
+    return None
+
+def check_rom_paths(paths, max_workers=None):
+    """
+    Sort ROM paths into (missing, unavailable) sets with one listing per folder,
+    run in parallel like the ROM scan. A path is missing only when its folder
+    can be listed, holds other files and lacks it. A folder that is gone or
+    empty may be an unmounted SD card or share (which leaves an empty
+    mountpoint behind), so its paths are unavailable, not missing.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    if max_workers is None:
+        max_workers = get_rom_scan_settings()[0]
+    by_dir = {}
+    for path in paths:
+        by_dir.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+
+    def list_names(folder):
+        try:
+            return set(os.listdir(folder))
+        except OSError:
+            return None
+
+    missing = set()
+    unavailable = set()
+    folders = list(by_dir)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='romcheck') as pool:
+        listings = dict(zip(folders, pool.map(list_names, folders)))
+    for folder, names in by_dir.items():
+        listing = listings[folder]
+        if listing:
+            missing.update(os.path.join(folder, name) for name in names - listing)
+        else:
+            unavailable.update(os.path.join(folder, name) for name in names)
+    return missing, unavailable
+
+def _shortcut_appids(s):
+    """
+    Unsigned appids a shortcut can have: its stored appid, or for entries stored
+    without one, the IDs Steam derives from its executable and name.
+    """
+    try:
+        return {int(s.get('appid')) & 0xFFFFFFFF}
+    except (TypeError, ValueError):
+        pass
+    exe = s.get('Exe') or s.get('exe') or ''
+    name = s.get('AppName') or s.get('appname') or ''
+    return {int(calc_shortcut_appid(e, name)) for e in {exe, exe.strip('"')}}
+
+def collect_steam_garbage(steamids, dry_run=False, progress_callback=None):
+    """
+    Clean up after shortcuts that no longer lead anywhere, for each Steam user:
+    shortcuts whose ROM file was deleted are removed from shortcuts.vdf, grid
+    artwork of non-Steam appids without a shortcut is deleted, and those appids
+    are taken out of the collections. Only appids with the high bit set (non-Steam
+    shortcuts) are considered. Users whose shortcuts.vdf can't be read are
+    skipped, and nothing is treated as orphaned for users without shortcuts.
+    With dry_run nothing is changed. Returns one report dict per user.
+    """
+    reports = []
+    for steamid in steamids:
+        vdf_path = find_steam_shortcuts_vdf(steamid)
+        if not steamid:
+            steamid = os.path.basename(os.path.dirname(os.path.dirname(vdf_path)))
+        if progress_callback:
+            progress_callback(f"Checking shortcuts of steamid {steamid}...")
+        try:
+            shortcut_list = load_shortcuts(vdf_path, strict=True)
+        except ValueError as e:
+            print(f"Skipping steamid {steamid}: {e}")
+            continue
+        rom_paths = {}
+        for s in shortcut_list:
+            path = _shortcut_rom_path(s) if any(a & 0x80000000 for a in _shortcut_appids(s)) else None
+            if path:
+                rom_paths[id(s)] = path
+        missing, unavailable = check_rom_paths(set(rom_paths.values()))
+        dead = [s for s in shortcut_list if rom_paths.get(id(s)) in missing]
+        kept = [s for s in shortcut_list if rom_paths.get(id(s)) not in missing]
+        live = set()
+        for s in kept:
+            live |= _shortcut_appids(s)
+        if shortcut_list:
+            orphans = [(appid, files) for appid, files in sorted(index_grid_files(steamid).items()) if appid not in live]
+        else:
+            orphans = []  # No shortcuts at all is more likely a lost file than a library to wipe
+            print(f"Steamid {steamid} has no shortcuts, leaving artwork and collections alone")
+        report = {
+            'steamid': steamid,
+            'dead_shortcuts': [s.get('AppName') or s.get('appname') or '' for s in dead],
+            'unavailable_roms': len(unavailable),
+            'orphan_files': sum(len(files) for _, files in orphans),
+            'reclaimed_bytes': sum(size for _, files in orphans for _, size in files),
+            'collection_entries': 0,
+        }
+        json_path = find_steam_collections_json(steamid)
+        collections = SteamCollections(load_steam_collections(json_path)) if json_path else None
+        if collections is not None and shortcut_list:
+            report['collection_entries'] = collections.remove_missing(live)
+        if not dry_run:
+            if dead:
+                save_shortcuts(vdf_path, kept)
+            for _, files in orphans:
+                for path, size in files:
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"Could not remove {path}: {e}")
+                        report['orphan_files'] -= 1
+                        report['reclaimed_bytes'] -= size
+            if collections is not None and collections.commit():
+                save_steam_collections(json_path, collections.data)
+        verb = 'would be' if dry_run else 'were'
+        print(f"Steamid {steamid}: {len(dead)} dead shortcuts, {report['orphan_files']} orphaned artwork files "
+              f"({report['reclaimed_bytes'] / (1024 * 1024):.1f} MB) and {report['collection_entries']} collection "
+              f"entries {verb} removed")
+        for name in report['dead_shortcuts']:
+            print(f"  - {name}")
+        if unavailable:
+            print(f"  {len(unavailable)} shortcuts kept because their ROM folder could not be reached")
+        reports.append(report)
+    return reports
+
+def add_steam_shortcuts(emulator, platform, games, steamid=None, launch_options_template='#rom', fetch_icons=True, progress_callback=None):
+    plan = [{'emulator': emulator, 'platform': platform, 'games': games, 'launch_options': launch_options_template}]
+    return apply_shortcut_plan(plan, [steamid], fetch_icons, progress_callback)
 
 def calc_shortcut_appid(exe, appname):
     import zlib
@@ -866,38 +3105,498 @@ def calc_shortcut_appid(exe, appname):
 def get_config_path():
     return os.path.join(os.path.dirname(__file__), 'steam_emu_config.json')
 
+CONFIG_SAVE_DELAY = 1.0
+
+class ConfigStore:
+    """steam_emu_config.json, read once and kept in memory.
+
+    Reads never touch the disk, so download and scan workers can look keys up
+    freely. Changes are written back atomically after CONFIG_SAVE_DELAY seconds
+    without further changes (and at exit). Keys under "profiles" -> <name>
+    override the top-level ones while that profile is active.
+    """
+    def __init__(self, path, save_delay=CONFIG_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.profile = None
+        self._lock = threading.RLock()
+        self._timer = None
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+            if not isinstance(self._data, dict):
+                self._data = {}
+        except Exception:
+            self._data = {}
+
+    def _section(self, profile, create=False):
+        profile = profile or self.profile
+        if not profile:
+            return None
+        profiles = self._data.get('profiles')
+        if not isinstance(profiles, dict):
+            if not create:
+                return None
+            profiles = self._data['profiles'] = {}
+        if create:
+            return profiles.setdefault(profile, {})
+        return profiles.get(profile)
+
+    def get(self, key, default=None, profile=None):
+        """Value of key; lists and dicts are copies, so editing them never changes the store."""
+        with self._lock:
+            section = self._section(profile)
+            value = section[key] if section and key in section else self._data.get(key, default)
+            return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+
+    def set(self, key, value, profile=None):
+        self.update({key: value}, profile)
+
+    def update(self, values, profile=None):
+        """Set several keys at once (in the active profile, if any)."""
+        with self._lock:
+            target = self._section(profile, create=True)
+            if target is None:
+                target = self._data
+            changed = False
+            for key, value in values.items():
+                if target.get(key, object()) != value:
+                    target[key] = copy.deepcopy(value)
+                    changed = True
+            if changed:
+                self._schedule_save()
+
+    def profiles(self):
+        with self._lock:
+            profiles = self._data.get('profiles')
+            return sorted(profiles) if isinstance(profiles, dict) else []
+
+    def snapshot(self):
+        """A copy of the whole file contents."""
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def replace(self, data):
+        with self._lock:
+            if data != self._data:
+                self._data = copy.deepcopy(data)
+                self._schedule_save()
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.save_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Write pending changes now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            data = json.dumps(self._data, indent=2).encode('utf-8')
+            try:
+                write_file_atomic(self.path, data)
+                self._dirty = False
+            except OSError as e:
+                print(f"Error saving config {self.path}: {e}")
+
+_config_store = None
+_config_lock = threading.Lock()
+
+def get_config():
+    """Get the process-wide ConfigStore (loaded on first use)."""
+    global _config_store
+    with _config_lock:
+        if _config_store is None:
+            _config_store = ConfigStore(get_config_path())
+            import atexit
+            atexit.register(_config_store.flush)
+    return _config_store
+
 def load_config():
-    try:
-        with open(get_config_path(), 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    """Copy of the whole config, for callers that edit it and pass it to save_config."""
+    return get_config().snapshot()
 
 def save_config(cfg):
-    with open(get_config_path(), 'w', encoding='utf-8') as f:
-        json.dump(cfg, f, indent=2)
+    get_config().replace(cfg)
+    get_config().flush()
 
-class SteamEmuWizard(QWizard):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle('Steamulation Wizard')
-        # Enable custom button but hide it by default
-        self.setOption(QWizard.HaveCustomButton1, True)
-        self.button(QWizard.CustomButton1).setVisible(False)
-        self.addPage(SteamUserPage())           # Index 0
-        self.addPage(EmulatorPage())            # Index 1
-        self.addPage(PlatformPage())            # Index 2
-        self.addPage(RomsPage())                # Index 3
-        self.addPage(LaunchOptionsPage())       # Index 4
-        self.addPage(IconOptionsPage())         # Index 5
-        self.addPage(SummaryPage(self))         # Index 6
-        self.found_games = []
-
-def main():
+def get_steamgriddb_api_key():
+    # The environment variable (also set by --api-key) wins over the config
+    return os.environ.get('STEAMGRIDDB_API_KEY') or get_config().get('steamgriddb_api_key')
+
+# --- Watch mode ---
+class InotifyWatcher:
+    """Recursive inotify watch on Linux (through libc with ctypes, no extra dependency)."""
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    def __init__(self, folders):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.paths = {}  # watch descriptor -> directory
+        try:
+            for folder in folders:
+                self._add_tree(folder)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, folder):
+        import ctypes
+        for root, dirs, files in os.walk(folder):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), self.MASK)
+            if wd < 0:
+                # Usually fs.inotify.max_user_watches; the caller falls back to polling
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {root}')
+            self.paths[wd] = root
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for changes. Returns True if something changed."""
+        import select
+        import struct
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + 16 <= len(buf):
+            wd, mask, _cookie, length = struct.unpack_from('iIII', buf, offset)
+            name = buf[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+            if mask & self.IN_IGNORED:
+                self.paths.pop(wd, None)
+            elif mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO) and wd in self.paths:
+                # New folder: watch it (and anything copied in with it) as well
+                try:
+                    self._add_tree(os.path.join(self.paths[wd], os.fsdecode(name)))
+                except OSError:
+                    pass
+        return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class PollingWatcher:
+    """Fallback watcher: reports a possible change every poll_interval seconds.
+    The incremental ROM index keeps each rescan down to one stat() per folder."""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.poll_interval))
+        return timeout >= self.poll_interval
+
+    def close(self):
+        pass
+
+def make_rom_watcher(folders, poll_interval=30.0, force_polling=False):
+    """inotify where available, otherwise polling (network shares changed by other machines need polling)."""
+    if not force_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling every {poll_interval:.0f}s instead")
+    return PollingWatcher(poll_interval)
+
+def is_steam_running():
+    """Best-effort check for a running Steam client."""
+    import subprocess
+    if os.name == 'nt':
+        try:
+            out = subprocess.run(['tasklist', '/FI', 'IMAGENAME eq steam.exe', '/NH'],
+                                 capture_output=True, text=True, timeout=10).stdout
+            return 'steam.exe' in out.lower()
+        except (OSError, subprocess.SubprocessError):
+            return False
+    if os.path.isdir('/proc'):
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f'/proc/{pid}/comm', 'r') as f:
+                    if f.read().strip() == 'steam':
+                        return True
+            except OSError:
+                continue
+        return False
+    try:
+        return subprocess.run(['pgrep', '-x', 'steam'], capture_output=True, timeout=10).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+def diff_games(old_games, new_games):
+    """Compare two scans by display name (a shortcut's identity). Returns (added_or_moved, removed)."""
+    old = {g['display_name']: g for g in old_games}
+    new = {g['display_name']: g for g in new_games}
+    changed = [g for name, g in new.items() if name not in old or old[name]['path'] != g['path']]
+    removed = [g for name, g in old.items() if name not in new]
+    return changed, removed
+
+def watch_roms(entries, steamids, fetch_icons=True, debounce=3.0, poll_interval=30.0, force_polling=False,
+               write_while_running=False, initial_sync=True, stop_event=None):
+    """
+    Keep Steam in sync with ROM folders until interrupted.
+    entries are plan entries with a 'roms' folder instead of 'games'. Changes are
+    debounced, then only the added/moved and removed games are applied. While Steam
+    is running the changes are queued (unless write_while_running) and retried.
+    """
+    current = [scrape_roms(e['roms'], e['platform']) for e in entries]
+    queued = [({}, {}) for _ in entries]  # per entry: (display_name -> game to add, display_name -> game to remove)
+    if initial_sync:
+        for (to_add, _), games in zip(queued, current):
+            to_add.update((g['display_name'], g) for g in games)
+    watcher = make_rom_watcher([e['roms'] for e in entries if os.path.isdir(e['roms'])], poll_interval, force_polling)
+    print(f"Watching {len(entries)} ROM folder(s) for changes (Ctrl+C to stop)")
+    try:
+        reported = 0
+        while stop_event is None or not stop_event.is_set():
+            pending = sum(len(a) + len(r) for a, r in queued)
+            if pending and not write_while_running and is_steam_running():
+                if pending != reported:
+                    print(f"Steam is running; {pending} change(s) queued until it closes")
+                    reported = pending
+            elif pending:
+                reported = 0
+                add_plan = []
+                remove_plan = []
+                for entry, (to_add, to_remove) in zip(entries, queued):
+                    base = {'emulator': entry['emulator'], 'platform': entry['platform'], 'launch_options': entry['launch_options']}
+                    if to_add:
+                        add_plan.append(dict(base, games=list(to_add.values())))
+                    if to_remove:
+                        remove_plan.append(dict(base, games=list(to_remove.values())))
+                try:
+                    if remove_plan:
+                        remove_steam_shortcuts(remove_plan, steamids)
+                    if add_plan:
+                        apply_shortcut_plan(add_plan, steamids, fetch_icons)
+                    for to_add, to_remove in queued:
+                        to_add.clear()
+                        to_remove.clear()
+                except Exception as e:
+                    # Keep the queue and try again after the next wait
+                    print(f"✗ Sync failed, will retry: {e}")
+                    import traceback
+                    traceback.print_exc()
+            if not watcher.wait(poll_interval):
+                continue
+            # Debounce: wait until the folders have been quiet for `debounce` seconds
+            # (but not forever while a long copy keeps producing events)
+            deadline = time.monotonic() + max(10 * debounce, 30.0)
+            while watcher.wait(debounce) and time.monotonic() < deadline:
+                pass
+            for i, entry in enumerate(entries):
+                games = scrape_roms(entry['roms'], entry['platform'])
+                changed, removed = diff_games(current[i], games)
+                current[i] = games
+                to_add, to_remove = queued[i]
+                for g in changed:
+                    to_remove.pop(g['display_name'], None)
+                    to_add[g['display_name']] = g
+                for g in removed:
+                    to_add.pop(g['display_name'], None)
+                    to_remove[g['display_name']] = g
+                if changed or removed:
+                    print(f"{entry['platform']}: {len(changed)} new/moved, {len(removed)} removed")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
+
+# --- Command line ---
+def _per_emulator(values, count, default, option):
+    """Expand a repeated CLI option to one value per --emulator (a single value applies to all)."""
+    if not values:
+        return [default] * count
+    if len(values) == 1:
+        return values * count
+    if len(values) != count:
+        raise SystemExit(f"error: {option} was given {len(values)} times for {count} emulators")
+    return values
+
+def load_cli_plan(args):
+    """Build plan entries (without games) from --plan or the repeated --emulator/--roms/... options."""
+    config = get_config()
+    if args.plan:
+        with open(args.plan, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    else:
+        emulators = args.emulator or [config.get('last_emulator', '')]
+        count = len(emulators)
+        roms = _per_emulator(args.roms, count, config.get('last_roms', ''), '--roms')
+        platforms = _per_emulator(args.platform, count, None, '--platform')
+        launch_options = _per_emulator(args.launch_options, count, config.get('last_launch_options', '#rom'), '--launch-options')
+        entries = [{'emulator': e, 'roms': r, 'platform': p, 'launch_options': l}
+                   for e, r, p, l in zip(emulators, roms, platforms, launch_options)]
+    for entry in entries:
+        if not entry.get('platform'):
+            entry['platform'] = guess_platform_from_exe(entry['emulator'])
+        entry.setdefault('launch_options', '#rom')
+    return entries
+
+def cli_user_settings(args):
+    """Return (steamids, fetch_icons) from the command line, falling back to the saved config."""
+    config = get_config()
+    steamids = args.user or ([config.get('last_steamid')] if config.get('last_steamid') else [None])
+    fetch_icons = config.get('fetch_icons', True) if args.icons is None else args.icons
+    if args.api_key:
+        os.environ['STEAMGRIDDB_API_KEY'] = args.api_key  # fetch_game_icon checks the environment first
+    return steamids, fetch_icons
+
+def cli_apply(args):
+    plan = []
+    for entry in load_cli_plan(args):
+        emulator = entry['emulator']
+        if not emulator or not os.path.exists(emulator):
+            print(f"Error: Invalid emulator path '{emulator}'")
+            return 1
+        games = scrape_roms(entry['roms'], entry['platform'], identify=args.identify)
+        print(f"{entry['platform']}: {len(games)} games found in {entry['roms']}")
+        if games:
+            plan.append({'emulator': emulator, 'platform': entry['platform'], 'games': games,
+                         'launch_options': entry['launch_options'], 'roms': entry['roms']})
+    if not plan:
+        print("Error: No games found")
+        return 1
+    steamids, fetch_icons = cli_user_settings(args)
+    count = apply_shortcut_plan(plan, steamids, fetch_icons, dry_run=args.dry_run, prune=args.prune)
+    if args.dry_run:
+        print(f"Dry run: {count} games checked, nothing was changed")
+    else:
+        print(f"✓ Successfully synced {count} games to Steam!")
+    return 0
+
+def cli_watch(args):
+    entries = load_cli_plan(args)
+    for entry in entries:
+        if not entry['emulator'] or not os.path.exists(entry['emulator']):
+            print(f"Error: Invalid emulator path '{entry['emulator']}'")
+            return 1
+    steamids, fetch_icons = cli_user_settings(args)
+    watch_roms(entries, steamids, fetch_icons, debounce=args.debounce, poll_interval=args.poll_interval,
+               force_polling=args.poll, write_while_running=args.write_while_running,
+               initial_sync=not args.skip_initial_sync)
+    return 0
+
+def cli_scan(args):
+    for game in scrape_roms(args.roms, args.platform, identify=args.identify):
+        print(f"{game['display_name']}\t{game['platform']}\t{game['path']}")
+    return 0
+
+def cli_users(args):
+    for user in get_steam_users():
+        print(f"{user['steamid']}\t{user['personaname']}")
+    return 0
+
+def cli_gc(args):
+    if not args.dry_run and not args.write_while_running and is_steam_running():
+        print("Error: Steam is running and would overwrite shortcuts.vdf on exit; close it first (or pass --write-while-running)")
+        return 1
+    steamids = args.user or [user['steamid'] for user in get_steam_users()] or [None]
+    reports = collect_steam_garbage(steamids, dry_run=args.dry_run)
+    reclaimed = sum(r['reclaimed_bytes'] for r in reports)
+    if args.dry_run:
+        print(f"Dry run: {reclaimed / (1024 * 1024):.1f} MB could be reclaimed, nothing was changed")
+    else:
+        print(f"✓ Reclaimed {reclaimed / (1024 * 1024):.1f} MB")
+    return 0
+
+def _add_plan_arguments(cmd):
+    cmd.add_argument('--emulator', action='append', help='emulator executable; repeat for several emulators (default: last used)')
+    cmd.add_argument('--roms', action='append', help='ROMs folder, once per --emulator (default: last used)')
+    cmd.add_argument('--platform', action='append', help='platform/collection name, once per --emulator (default: guessed from the emulator)')
+    cmd.add_argument('--launch-options', action='append', help="launch options with #rom placeholder, once per --emulator (default: last used)")
+    cmd.add_argument('--plan', help='JSON file with a list of {"emulator", "roms", "platform", "launch_options"} entries')
+    cmd.add_argument('--user', action='append', help='SteamID to update; repeat for several users (default: last used)')
+    icons = cmd.add_mutually_exclusive_group()
+    icons.add_argument('--icons', dest='icons', action='store_true', default=None, help='fetch artwork from SteamGridDB')
+    icons.add_argument('--no-icons', dest='icons', action='store_false', help='do not fetch artwork')
+    cmd.add_argument('--api-key', help='SteamGridDB API key (default: STEAMGRIDDB_API_KEY or the saved key)')
+    _add_identify_argument(cmd)
+
+def _add_identify_argument(cmd):
+    cmd.add_argument('--identify', action='store_true', default=None,
+                     help='name games after the DAT files in rom_dat_paths by hashing their contents')
+
+def build_cli_parser():
+    import argparse
+    parser = argparse.ArgumentParser(prog='steamulation', description='Add emulator ROMs to Steam as non-Steam games. Run without arguments for the wizard.')
+    parser.add_argument('--profile', help='use (and save to) this section of the config file instead of the top level')
+    sub = parser.add_subparsers(dest='command')
+    sub.add_parser('gui', help='open the wizard (default)')
+    apply_cmd = sub.add_parser('apply', help='scan ROMs and add them to Steam without the GUI')
+    _add_plan_arguments(apply_cmd)
+    apply_cmd.add_argument('--dry-run', action='store_true', help='show what would be added, changed or removed without writing anything')
+    apply_cmd.add_argument('--prune', action='store_true', help="also remove this emulator's shortcuts for ROMs no longer in its ROMs folder")
+    apply_cmd.set_defaults(func=cli_apply)
+    watch_cmd = sub.add_parser('watch', help='keep Steam in sync with ROM folders as files are added or removed')
+    _add_plan_arguments(watch_cmd)
+    watch_cmd.add_argument('--debounce', type=float, default=3.0, help='seconds without file events before syncing (default: 3)')
+    watch_cmd.add_argument('--poll-interval', type=float, default=30.0, help='seconds between rescans when polling or waiting for Steam to close (default: 30)')
+    watch_cmd.add_argument('--poll', action='store_true', help='always poll instead of using inotify (needed for shares changed by other machines)')
+    watch_cmd.add_argument('--write-while-running', action='store_true', help="don't wait for Steam to close before writing")
+    watch_cmd.add_argument('--skip-initial-sync', action='store_true', help='only sync changes made after the watch starts')
+    watch_cmd.set_defaults(func=cli_watch)
+    scan_cmd = sub.add_parser('scan', help='list the games found in a ROMs folder')
+    scan_cmd.add_argument('--roms', required=True, help='ROMs folder')
+    scan_cmd.add_argument('--platform', help='platform whose ROM rules to use (default: all platforms)')
+    _add_identify_argument(scan_cmd)
+    scan_cmd.set_defaults(func=cli_scan)
+    users_cmd = sub.add_parser('users', help='list Steam users')
+    users_cmd.set_defaults(func=cli_users)
+    gc_cmd = sub.add_parser('gc', help='remove shortcuts whose ROM was deleted and artwork of shortcuts that no longer exist')
+    gc_cmd.add_argument('--user', action='append', help='SteamID to clean up; repeat for several users (default: all users)')
+    gc_cmd.add_argument('--dry-run', action='store_true', help='only report what would be removed')
+    gc_cmd.add_argument('--write-while-running', action='store_true', help="clean up even while Steam is running")
+    gc_cmd.set_defaults(func=cli_gc)
+    return parser
+
+def run_wizard():
+    # Qt is only imported for the wizard, so headless commands start fast and need no display
+    from PyQt5.QtWidgets import QApplication
+    from gui import SteamEmuWizard
     app = QApplication(sys.argv)
     wizard = SteamEmuWizard()
     wizard.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+def main(argv=None):
+    args = build_cli_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    get_config().profile = args.profile
+    if args.command in (None, 'gui'):
+        sys.exit(run_wizard())
+    sys.exit(args.func(args))
 
 if __name__ == '__main__':
+    # gui.py imports this file as "main"; reuse this module instead of loading a second copy
+    sys.modules.setdefault('main', sys.modules[__name__])
+    import multiprocessing
+    multiprocessing.freeze_support()  # artwork optimization workers in the frozen build
     main()
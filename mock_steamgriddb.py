@@ -0,0 +1,196 @@
+"""
+Local stand-in for the SteamGridDB API, for benchmarks and offline testing.
+
+Usage:
+    python mock_steamgriddb.py [--port 8765] [--latency-ms 50] [--error-rate 0.01] [--rate-limit-rate 0.02]
+
+Then point Steamulation at it:
+    STEAMGRIDDB_API_BASE=http://127.0.0.1:8765/api/v2 STEAMGRIDDB_API_KEY=test python main.py apply ...
+
+Search, artwork listing and image responses are generated from the request
+path, so the same game always gets the same results. Images are served by a
+second listener (like SteamGridDB's CDN) with ETag and Range support.
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+ARTWORK_SIZES = {
+    'grids': [(600, 900), (920, 430), (342, 482), (460, 215)],
+    'heroes': [(1920, 620), (3840, 1240)],
+    'icons': [(256, 256), (512, 512)],
+    'logos': [(1280, 720), (800, 310)],
+}
+STYLES = ['alternate', 'blurred', 'material', 'white_logo', 'no_logo']
+
+
+def make_png(width, height, size, seed):
+    """A valid PNG header for width x height, padded with a text chunk to about size bytes."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    header = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    filler = hashlib.sha256(seed.encode('utf-8')).digest()
+    padding = (filler * (max(0, size - 57) // len(filler) + 1))[:max(0, size - 57)]
+    return header + chunk(b'tEXt', padding) + chunk(b'IEND', b'')
+
+
+class MockSteamGridDB:
+    """The API listener plus a CDN listener for images, sharing settings and request counters."""
+
+    def __init__(self, host='127.0.0.1', port=0, cdn_port=0, latency=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, image_kb=200, results=3, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.image_bytes = int(image_kb * 1024)
+        self.results = results
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'search': 0, 'listing': 0, 'image': 0, 'errors': 0, 'rate_limited': 0, 'not_modified': 0}
+        self._lock = threading.Lock()
+        self.api = ThreadingHTTPServer((host, port), self._handler('api'))
+        self.cdn = ThreadingHTTPServer((host, cdn_port), self._handler('cdn'))
+        self.api.daemon_threads = self.cdn.daemon_threads = True
+        self.api_base = f"http://{host}:{self.api.server_port}/api/v2"
+        self.cdn_base = f"http://{host}:{self.cdn.server_port}"
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def roll(self, rate):
+        with self._lock:
+            return self.random.random() < rate
+
+    def start(self):
+        for server in (self.api, self.cdn):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in (self.api, self.cdn):
+            server.shutdown()
+            server.server_close()
+
+    # --- responses ---
+
+    def search(self, term):
+        game_id = int(hashlib.sha256(term.casefold().encode('utf-8')).hexdigest()[:7], 16)
+        names = [term, f"{term} II", f"{term}: Deluxe Edition", f"{term} (Demo)", f"Not {term}"]
+        return [{'id': game_id + i, 'name': names[i % len(names)], 'types': ['steam'], 'verified': i == 0}
+                for i in range(self.results)]
+
+    def listing(self, endpoint, game_id):
+        images = []
+        for i, (width, height) in enumerate(ARTWORK_SIZES[endpoint]):
+            image_id = game_id * 16 + i
+            images.append({
+                'id': image_id, 'score': (image_id % 7) - 2, 'style': STYLES[image_id % len(STYLES)],
+                'width': width, 'height': height, 'nsfw': False, 'humor': False, 'mime': 'image/png',
+                'url': f"{self.cdn_base}/file/{endpoint}/{image_id}_{width}x{height}.png",
+            })
+        return images
+
+    def _handler(self, role):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, status, body, content_type, extra=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (extra or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def send_json(self, status, data):
+                self.send_body(status, json.dumps(data).encode('utf-8'), 'application/json')
+
+            def do_GET(self):
+                mock.count('requests')
+                if mock.latency:
+                    time.sleep(mock.latency)
+                if mock.roll(mock.rate_limit_rate):
+                    mock.count('rate_limited')
+                    return self.send_body(429, b'', 'text/plain', {'Retry-After': '0.2'})
+                if mock.roll(mock.error_rate):
+                    mock.count('errors')
+                    return self.send_body(503, b'', 'text/plain')
+                path = unquote(urlsplit(self.path).path)
+                if role == 'cdn':
+                    return self.image(path)
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    return self.send_json(401, {'success': False, 'errors': ['Authorization required']})
+                parts = path.strip('/').split('/')
+                if parts[:4] == ['api', 'v2', 'search', 'autocomplete'] and len(parts) == 5:
+                    mock.count('search')
+                    return self.send_json(200, {'success': True, 'data': mock.search(parts[4])})
+                if len(parts) == 5 and parts[:2] == ['api', 'v2'] and parts[2] in ARTWORK_SIZES and parts[3] == 'game':
+                    mock.count('listing')
+                    return self.send_json(200, {'success': True, 'data': mock.listing(parts[2], int(parts[4]))})
+                self.send_json(404, {'success': False, 'errors': ['Not found']})
+
+            def image(self, path):
+                name = path.rsplit('/', 1)[-1]
+                try:
+                    width, height = (int(v) for v in name.rsplit('_', 1)[1].split('.')[0].split('x'))
+                except (IndexError, ValueError):
+                    return self.send_body(404, b'', 'text/plain')
+                etag = '"' + hashlib.sha256(path.encode('utf-8')).hexdigest()[:16] + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    mock.count('not_modified')
+                    return self.send_body(304, b'', 'image/png', {'ETag': etag})
+                mock.count('image')
+                body = make_png(width, height, mock.image_bytes, path)
+                byte_range = self.headers.get('Range', '')
+                if byte_range.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+                    start = int(byte_range[6:].split('-')[0] or 0)
+                    if start >= len(body):
+                        return self.send_body(416, b'', 'text/plain', {'Content-Range': f"bytes */{len(body)}"})
+                    return self.send_body(206, body[start:], 'image/png', {
+                        'ETag': etag, 'Content-Range': f"bytes {start}-{len(body) - 1}/{len(body)}"})
+                self.send_body(200, body, 'image/png', {'ETag': etag, 'Accept-Ranges': 'bytes'})
+
+            do_HEAD = do_GET
+
+        return Handler
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Local mock of the SteamGridDB API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='API port')
+    parser.add_argument('--cdn-port', type=int, default=8766, help='image port')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='delay added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 503')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 429')
+    parser.add_argument('--image-kb', type=float, default=200, help='size of the generated images')
+    args = parser.parse_args(argv)
+    mock = MockSteamGridDB(args.host, args.port, args.cdn_port, args.latency_ms / 1000.0,
+                           args.error_rate, args.rate_limit_rate, args.image_kb).start()
+    print(f"Mock SteamGridDB API at {mock.api_base} (images at {mock.cdn_base}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+        print(json.dumps(mock.stats))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def userdata(tmp_path, monkeypatch):
+    """An empty Steam userdata folder with one user, 12345, used by main."""
+    root = tmp_path / 'userdata'
+    (root / '12345' / 'config' / 'grid').mkdir(parents=True)
+    monkeypatch.setattr(main, 'get_steam_userdata_path', lambda: str(root))
+    monkeypatch.setattr(main, 'get_icons_cache_dir', lambda: str(tmp_path / 'icon_cache'))
+    (tmp_path / 'icon_cache').mkdir()
+    return root
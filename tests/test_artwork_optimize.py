@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import main
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def save(tmp_path, name, size, fmt, mode='RGB'):
+    path = str(tmp_path / name)
+    img = Image.effect_noise(size, 64).convert(mode)
+    img.save(path, fmt)
+    return path
+
+
+def test_correctly_sized_jpeg_is_kept(tmp_path):
+    src = save(tmp_path, 'grid.jpg', (600, 900), 'JPEG')
+    assert main.transcode_artwork(src, str(tmp_path / 'out'), (600, 900)) is None
+
+
+def test_oversized_jpeg_stays_jpeg_and_shrinks(tmp_path):
+    src = save(tmp_path, 'grid.jpg', (1200, 1800), 'JPEG')
+    dst = str(tmp_path / 'out')
+    new_size = main.transcode_artwork(src, dst, (600, 900))
+    assert new_size is not None and new_size < os.path.getsize(src)
+    with Image.open(dst) as img:
+        assert img.format == 'JPEG' and img.size == (600, 900)
+
+
+def test_result_that_is_not_smaller_is_discarded(tmp_path):
+    # A noisy WebP becomes a much larger PNG
+    src = save(tmp_path, 'icon.webp', (256, 256), 'WEBP')
+    dst = str(tmp_path / 'out')
+    assert main.transcode_artwork(src, dst, (256, 256)) is None
+    assert not os.path.exists(dst)
@@ -0,0 +1,45 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    store = main.ConfigStore(str(tmp_path / 'steam_emu_config.json'))
+    monkeypatch.setattr(main, '_config_store', store)
+    yield store
+    store.flush()
+
+
+def names(matches):
+    return [candidate['name'] for score, candidate in matches]
+
+
+def test_full_title_wins_over_lookalikes(config):
+    candidates = [{'id': 1, 'name': 'Super Mario Odyssey Remix'},
+                  {'id': 2, 'name': 'Super Mario Odyssey', 'verified': True}]
+    assert names(main.score_game_candidates('Super Mario Odyssey', candidates))[0] == 'Super Mario Odyssey'
+
+
+@pytest.mark.parametrize('abbreviation, title', [
+    ('Zelda BOTW', 'The Legend of Zelda: Breath of the Wild'),
+    ('FF7', 'Final Fantasy VII'),
+])
+def test_abbreviated_title_keeps_top_result(config, abbreviation, title):
+    candidates = [{'id': 1, 'name': title, 'verified': True},
+                  {'id': 2, 'name': f'{title} Soundtrack'}]
+    assert names(main.score_game_candidates(abbreviation, candidates))[0] == title
+
+
+def test_fallback_prefers_verified_result(config):
+    candidates = [{'id': 1, 'name': 'Final Fantasy VII Remake'},
+                  {'id': 2, 'name': 'Final Fantasy VII', 'verified': True}]
+    assert names(main.score_game_candidates('FF7', candidates)) == ['Final Fantasy VII']
+
+
+def test_threshold_from_config(config):
+    candidates = [{'id': 1, 'name': 'Metroid Dread'}, {'id': 2, 'name': 'Metroid Prime', 'verified': True}]
+    config.set('artwork_min_name_similarity', 0.99)
+    assert names(main.score_game_candidates('Metroid Dread', candidates)) == ['Metroid Dread']
+    config.set('artwork_min_name_similarity', 0)
+    assert len(main.score_game_candidates('Metroid Dread', candidates)) == 2
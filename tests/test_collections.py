@@ -0,0 +1,40 @@
+import json
+
+import main
+
+
+def stored(name, added, **value):
+    key = f'user-collections.uc-{name}'
+    value.setdefault('key', key)
+    value.setdefault('timestamp', 0)
+    value['value'] = json.dumps({'id': f'uc-{name}', 'name': name, 'added': added, 'removed': []})
+    return [key, value]
+
+
+def members(data, name):
+    for key, value in data:
+        vobj = json.loads(value['value'])
+        if vobj['name'] == name:
+            return vobj['added'], value['version']
+    raise KeyError(name)
+
+
+def test_entry_without_version_is_committed():
+    data = [stored('Switch', [1]), stored('SNES', [2], version='7')]
+    collections = main.SteamCollections(data)
+    collections.add('Switch', [3])
+    collections.add('SNES', [4])
+    assert collections.commit()
+    assert members(data, 'Switch') == ([1, 3], '8')
+    assert members(data, 'SNES') == ([2, 4], '8')
+
+
+def test_add_and_remove():
+    data = [stored('Switch', [1, 2], version='1')]
+    collections = main.SteamCollections(data)
+    assert collections.add('Switch', [2, 3]) == 1
+    assert collections.remove('Switch', [1]) == 1
+    assert collections.add('New', [5]) == 1
+    collections.commit()
+    assert members(data, 'Switch') == ([2, 3], '2')
+    assert members(data, 'New')[0] == [5]
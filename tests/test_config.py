@@ -0,0 +1,16 @@
+import json
+
+import main
+
+
+def test_get_returns_copies_of_containers(tmp_path):
+    path = tmp_path / 'steam_emu_config.json'
+    path.write_text(json.dumps({'artwork_styles': ['alternate'], 'profiles': {'deck': {'rom_dat_paths': ['a.dat']}}}))
+    store = main.ConfigStore(str(path))
+    store.get('artwork_styles').append('material')
+    store.profile = 'deck'
+    store.get('rom_dat_paths').clear()
+    assert store.get('artwork_styles') == ['alternate']
+    assert store.get('rom_dat_paths') == ['a.dat']
+    store.flush()
+    assert not store._dirty and json.loads(path.read_text())['artwork_styles'] == ['alternate']
@@ -0,0 +1,78 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+from mock_steamgriddb import make_png
+
+IMAGE = make_png(64, 64, 50000, 'test')
+
+
+class ImageServer:
+    def __init__(self):
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                body = IMAGE
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                if self.path.startswith('/gzip'):
+                    body = gzip.compress(IMAGE)
+                    self.send_header('Content-Encoding', 'gzip')
+                if self.path.startswith('/slow'):
+                    time.sleep(0.2)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f'http://127.0.0.1:{self.httpd.server_port}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(userdata, monkeypatch):
+    monkeypatch.setattr(main, '_artwork_cache', None)
+    image_server = ImageServer()
+    yield image_server
+    image_server.stop()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_gzip_encoded_image_is_not_reported_as_interrupted(server):
+    path = main.download_image(f'{server.base}/gzip.png', {}, 'image:gzip')
+    assert read(path) == IMAGE
+    assert server.requests == 1
+
+
+def test_concurrent_downloads_of_one_url_share_the_result(server):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(main.download_image(f'{server.base}/slow.png', {}, 'image:slow')))
+               for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 2 and results[0] == results[1]
+    assert read(results[0]) == IMAGE
+    assert server.requests == 1
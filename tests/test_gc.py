@@ -0,0 +1,112 @@
+import json
+
+import main
+
+STEAMID = '12345'
+EMULATOR = '/usr/bin/eden'
+
+
+def write_collection(userdata, appids):
+    folder = userdata / STEAMID / 'config' / 'cloudstorage'
+    folder.mkdir(parents=True, exist_ok=True)
+    value = json.dumps({'id': 'uc-1', 'name': 'Switch', 'added': appids, 'removed': []})
+    data = [['user-collections.uc-1', {'key': 'user-collections.uc-1', 'timestamp': 0, 'value': value, 'version': '1'}]]
+    path = folder / 'cloud-storage-namespace-1.json'
+    path.write_text(json.dumps(data))
+    return path
+
+
+def collection_members(path):
+    return json.loads(json.loads(path.read_text())[0][1]['value'])['added']
+
+
+def grid_file(userdata, name):
+    path = userdata / STEAMID / 'config' / 'grid' / name
+    path.write_bytes(b'x' * 100)
+    return path
+
+
+def test_removes_dead_shortcuts_and_orphaned_artwork(userdata, tmp_path):
+    roms = tmp_path / 'roms'
+    roms.mkdir()
+    (roms / 'kept.nsp').write_bytes(b'')
+    games = [{'display_name': 'Kept', 'path': str(roms / 'kept.nsp')},
+             {'display_name': 'Gone', 'path': str(roms / 'gone.nsp')}]
+    shortcuts = []
+    kept_id, gone_id = main.merge_shortcuts(shortcuts, EMULATOR, games)
+    if main.calc_shortcut_appid(EMULATOR, 'Kept') != str(kept_id):
+        kept_id, gone_id = gone_id, kept_id
+    main.save_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'), shortcuts)
+    kept_art = grid_file(userdata, f'{kept_id}p.png')
+    gone_art = grid_file(userdata, f'{gone_id}_hero.png')
+    steam_art = grid_file(userdata, '570p.png')
+    collection = write_collection(userdata, [570, kept_id, gone_id])
+
+    report, = main.collect_steam_garbage([STEAMID])
+
+    assert report['dead_shortcuts'] == ['Gone']
+    assert report['orphan_files'] == 1 and report['reclaimed_bytes'] == 100
+    assert kept_art.exists() and steam_art.exists() and not gone_art.exists()
+    assert [s['AppName'] for s in main.load_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'))] == ['Kept']
+    assert collection_members(collection) == [570, kept_id]
+
+
+def test_dry_run_changes_nothing(userdata):
+    main.save_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'),
+                        [{'AppName': 'A', 'Exe': '"x"', 'appid': '2147483649'}])
+    orphan = grid_file(userdata, '3000000001p.png')
+    report, = main.collect_steam_garbage([STEAMID], dry_run=True)
+    assert report['orphan_files'] == 1
+    assert orphan.exists()
+
+
+def test_unreadable_shortcuts_file_skips_user(userdata):
+    (userdata / STEAMID / 'config' / 'shortcuts.vdf').write_bytes(b'garbage')
+    art = [grid_file(userdata, '3000000001p.png'), grid_file(userdata, '3000000001_hero.png')]
+    collection = write_collection(userdata, [3000000001])
+    assert main.collect_steam_garbage([STEAMID]) == []
+    assert all(path.exists() for path in art)
+    assert collection_members(collection) == [3000000001]
+
+
+def test_no_shortcuts_leaves_artwork_alone(userdata):
+    art = grid_file(userdata, '3000000001p.png')
+    collection = write_collection(userdata, [3000000001])
+    report, = main.collect_steam_garbage([STEAMID])
+    assert report['orphan_files'] == 0
+    assert art.exists()
+    assert collection_members(collection) == [3000000001]
+
+
+def test_shortcut_without_appid_keeps_its_artwork(userdata):
+    main.save_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'),
+                        [{'AppName': 'X', 'Exe': f'"{EMULATOR}"', 'LaunchOptions': ''}])
+    art = grid_file(userdata, f"{main.calc_shortcut_appid(EMULATOR, 'X')}p.png")
+    main.collect_steam_garbage([STEAMID])
+    assert art.exists()
+
+
+def test_roms_behind_an_empty_mountpoint_are_kept(userdata, tmp_path):
+    nas = tmp_path / 'mnt' / 'nas'
+    nas.mkdir(parents=True)  # Share not mounted: only the empty mountpoint is left
+    games = [{'display_name': 'Zelda', 'path': str(nas / 'switch' / 'Zelda.nsp')},
+             {'display_name': 'Mario', 'path': str(nas / 'Mario.nsp')}]
+    shortcuts = []
+    appids = main.merge_shortcuts(shortcuts, EMULATOR, games)
+    main.save_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'), shortcuts)
+    art = [grid_file(userdata, f'{appid}p.png') for appid in appids]
+    collection = write_collection(userdata, appids)
+
+    report, = main.collect_steam_garbage([STEAMID])
+
+    assert report['dead_shortcuts'] == [] and report['unavailable_roms'] == 2
+    assert len(main.load_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'))) == 2
+    assert all(path.exists() for path in art)
+    assert collection_members(collection) == appids
+
+
+def test_rom_deleted_from_a_folder_with_other_files_is_missing(tmp_path):
+    (tmp_path / 'other.nsp').write_bytes(b'')
+    missing, unavailable = main.check_rom_paths([str(tmp_path / 'gone.nsp'), str(tmp_path / 'nas' / 'x.nsp')])
+    assert missing == {str(tmp_path / 'gone.nsp')}
+    assert unavailable == {str(tmp_path / 'nas' / 'x.nsp')}
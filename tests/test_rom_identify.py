@@ -0,0 +1,50 @@
+import hashlib
+import os
+import zlib
+
+import main
+
+ROM = b'\x00\x01' * 5000
+
+
+def write_dat(tmp_path, name, data):
+    sha1 = hashlib.sha1(data).hexdigest()
+    path = tmp_path / 'test.dat'
+    path.write_text(f'<?xml version="1.0"?><datafile><game name="{name}">'
+                    f'<rom name="x" size="{len(data)}" crc="{zlib.crc32(data):08x}" sha1="{sha1}"/></game></datafile>')
+    return main.DatIndex([str(path)])
+
+
+def test_headered_nes_rom_matches_headerless_dat(tmp_path):
+    rom = tmp_path / 'mario.nes'
+    rom.write_bytes(b'NES\x1a' + b'\0' * 12 + ROM)
+    games = [{'display_name': 'mario', 'path': str(rom)}]
+    cache = main.RomHashCache()
+    assert main.identify_roms(games, write_dat(tmp_path, 'Legend of Zelda, The (USA) (Rev 1)', ROM), cache) == 1
+    assert games[0]['display_name'] == 'The Legend of Zelda'
+
+
+def test_shared_cache_is_reused_and_forgets_deleted_files(userdata, tmp_path):
+    roms = tmp_path / 'roms'
+    roms.mkdir()
+    (roms / 'a.sfc').write_bytes(ROM)
+    (roms / 'b.sfc').write_bytes(ROM[:100])
+    dat = write_dat(tmp_path, 'A (USA)', ROM)
+    cache = main.get_rom_hash_cache()
+    for batch in ([{'display_name': 'a', 'path': str(roms / 'a.sfc')}], [{'display_name': 'b', 'path': str(roms / 'b.sfc')}]):
+        main.identify_roms(batch, dat, cache)
+    main.save_rom_hash_cache(cache)
+    assert sorted(main.get_rom_hash_cache().entries) == [str(roms / 'a.sfc'), str(roms / 'b.sfc')]
+
+    os.remove(roms / 'b.sfc')
+    cache = main.get_rom_hash_cache()
+    cache.prune(str(roms), {str(roms / 'a.sfc')})
+    main.save_rom_hash_cache(cache)
+    assert list(main.get_rom_hash_cache().entries) == [str(roms / 'a.sfc')]
+
+
+def test_unwritable_cache_does_not_raise(tmp_path, capsys):
+    cache = main.RomHashCache(str(tmp_path / 'missing' / 'rom_hashes.json'))
+    cache.dirty = True
+    main.save_rom_hash_cache(cache)
+    assert 'Could not save ROM hash cache' in capsys.readouterr().out
@@ -0,0 +1,27 @@
+import main
+
+
+def scan(platform, names, dirpath='/roms'):
+    return main.get_rom_matcher(platform).scan_names(dirpath, names)
+
+
+def test_cue_only_multi_disc_set_is_one_game():
+    names = ['FF7 (USA) (Disc 1).cue', 'FF7 (USA) (Disc 1).bin',
+             'FF7 (USA) (Disc 2).cue', 'FF7 (USA) (Disc 2).bin']
+    assert scan('PS1', names) == [['FF7', 'FF7 (USA) (Disc 1).cue', 'PS1']]
+
+
+def test_m3u_playlist_replaces_its_discs():
+    names = ['FF7 (USA).m3u', 'FF7 (USA) (Disc 1).cue', 'FF7 (USA) (Disc 1).bin',
+             'FF7 (USA) (Disc 2).cue', 'FF7 (USA) (Disc 2).bin']
+    assert scan('PS1', names) == [['FF7', 'FF7 (USA).m3u', 'PS1']]
+
+
+def test_cue_tracks_are_not_games():
+    names = ['Game (USA).cue', 'Game (USA) (Track 1).bin', 'Game (USA) (Track 2).bin']
+    assert scan('PS1', names) == [['Game', 'Game (USA).cue', 'PS1']]
+
+
+def test_single_disc_cue_hides_its_bin():
+    names = ['Crash (USA).cue', 'Crash (USA).bin']
+    assert scan('PS1', names) == [['Crash', 'Crash (USA).cue', 'PS1']]
@@ -0,0 +1,87 @@
+import main
+
+STEAMID = '12345'
+EMULATOR = '/usr/bin/retroarch'
+
+
+def make_library(tmp_path, platform, names):
+    folder = tmp_path / platform
+    folder.mkdir(exist_ok=True)
+    games = []
+    for name in names:
+        path = folder / f'{name}.rom'
+        path.write_bytes(b'')
+        games.append({'display_name': name, 'path': str(path)})
+    return str(folder), games
+
+
+def entry(platform, roms, games):
+    return {'emulator': EMULATOR, 'platform': platform, 'games': games, 'roms': roms, 'launch_options': '#rom'}
+
+
+def shortcuts(userdata):
+    return main.load_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'))
+
+
+def test_prune_keeps_other_platforms_of_the_same_emulator(userdata, tmp_path):
+    snes_roms, snes = make_library(tmp_path, 'snes', ['Mario', 'Zelda'])
+    genesis_roms, genesis = make_library(tmp_path, 'genesis', ['Sonic'])
+    shortcut_list = []
+    main.merge_shortcuts(shortcut_list, EMULATOR, snes + genesis)
+
+    changes = main.plan_shortcut_changes(shortcut_list, EMULATOR, snes[:1], prune=True, roms_folder=snes_roms)
+
+    assert [c['name'] for c in changes.of('remove')] == ['Zelda']
+
+
+def test_prune_without_roms_folder_removes_nothing(tmp_path):
+    _, snes = make_library(tmp_path, 'snes', ['Mario', 'Zelda'])
+    shortcut_list = []
+    main.merge_shortcuts(shortcut_list, EMULATOR, snes)
+    changes = main.plan_shortcut_changes(shortcut_list, EMULATOR, snes[:1], prune=True)
+    assert changes.of('remove') == []
+
+
+def test_apply_plan_with_prune_keeps_play_time_of_every_entry(userdata, tmp_path):
+    snes_roms, snes = make_library(tmp_path, 'snes', ['Mario', 'Zelda'])
+    genesis_roms, genesis = make_library(tmp_path, 'genesis', ['Sonic'])
+    plan = [entry('SNES', snes_roms, snes), entry('Genesis', genesis_roms, genesis)]
+    main.apply_shortcut_plan(plan, [STEAMID], fetch_icons=False)
+    existing = shortcuts(userdata)
+    for s in existing:
+        s['LastPlayTime'] = 42
+        s['tags'] = {'0': 'Favorite'}
+    main.save_shortcuts(str(userdata / STEAMID / 'config' / 'shortcuts.vdf'), existing)
+
+    # Zelda was deleted; the same emulator also runs the Genesis entry
+    plan = [entry('SNES', snes_roms, snes[:1]), entry('Genesis', genesis_roms, genesis)]
+    main.apply_shortcut_plan(plan, [STEAMID], fetch_icons=False, prune=True)
+
+    result = {s['AppName']: s for s in shortcuts(userdata)}
+    assert sorted(result) == ['Mario', 'Sonic']
+    assert all(s['LastPlayTime'] == 42 and dict(s['tags']) == {'0': 'Favorite'} for s in result.values())
+
+
+def test_modify_only_touches_changed_fields(tmp_path):
+    _, snes = make_library(tmp_path, 'snes', ['Mario'])
+    shortcut_list = []
+    main.merge_shortcuts(shortcut_list, EMULATOR, snes)
+    shortcut_list[0]['LastPlayTime'] = 42
+    moved = [dict(snes[0], path=str(tmp_path / 'elsewhere' / 'Mario.rom'))]
+
+    changes = main.plan_shortcut_changes(shortcut_list, EMULATOR, moved)
+
+    change, = changes.changes
+    assert change['action'] == 'modify'
+    assert list(change['fields']) == ['LaunchOptions']
+    main.apply_shortcut_changes(shortcut_list, changes)
+    assert shortcut_list[0]['LastPlayTime'] == 42
+
+
+def test_corrupt_shortcuts_file_is_never_overwritten(userdata, tmp_path):
+    roms, games = make_library(tmp_path, 'snes', ['Mario'])
+    vdf_path = userdata / STEAMID / 'config' / 'shortcuts.vdf'
+    vdf_path.write_bytes(b'\x00shortcuts\x00\x000\x00\x01AppName\x00Trunc')
+    main.apply_shortcut_plan([entry('SNES', roms, games)], [STEAMID], fetch_icons=False)
+    main.remove_steam_shortcuts([entry('SNES', roms, games)], [STEAMID])
+    assert vdf_path.read_bytes() == b'\x00shortcuts\x00\x000\x00\x01AppName\x00Trunc'
@@ -0,0 +1,100 @@
+import pytest
+import vdf
+
+import main
+
+EMULATOR = 'C:\\Emulators\\eden\\eden.exe'
+
+
+def dump(entries):
+    return vdf.binary_dumps({'shortcuts': {str(i): e for i, e in enumerate(entries)}})
+
+
+def sample_entries(count=3):
+    return [{
+        'appid': -5 - i,
+        'AppName': f'Game {i}',
+        'Exe': f'"{EMULATOR}"',
+        'LaunchOptions': f'"E:\\roms\\Game {i}.nsp"',
+        'LastPlayTime': 1700000000 + i,
+        'tags': {'0': 'Favorite', '1': 'Switch'},
+    } for i in range(count)]
+
+
+EDGE_CASES = vdf.binary_dumps({'shortcuts': {
+    '0': {'appid': -5, 'AppName': 'Types', 'u': vdf.UINT_64(2 ** 40), 'i': vdf.INT_64(-3), 'f': 1.5,
+          'p': vdf.POINTER(7), 'c': vdf.COLOR(9), 'tags': {'0': 'é\x08', 'nested': {'deeper': {}}}},
+    '1': {'AppName': 'Empty tags', 'tags': {}},
+    '2': {},
+}})
+
+
+@pytest.mark.parametrize('data', [EDGE_CASES, dump(sample_entries(50)), dump([])], ids=['edge', 'synthetic', 'empty'])
+def test_unchanged_entries_are_copied_byte_for_byte(data):
+    entries = main.parse_shortcuts(data)
+    assert [dict(e) for e in entries] == list(vdf.binary_loads(data)['shortcuts'].values())
+    assert main.encode_shortcuts(entries) == data
+
+
+@pytest.mark.parametrize('data', [EDGE_CASES, dump(sample_entries(5))], ids=['edge', 'synthetic'])
+def test_reencoded_entries_match_vdf(data):
+    entries = main.parse_shortcuts(data)
+    for e in entries:
+        for key in list(e):
+            e[key] = e[key]
+    assert main.encode_shortcuts(entries) == data
+
+
+def test_wide_strings_are_copied_through():
+    # vdf can read but not write UTF-16 strings
+    wide = b'\x003\x00\x05AppName\x00' + 'Wide é'.encode('utf-16-le') + b'\x00\x00\x08'
+    data = EDGE_CASES[:-2] + wide + b'\x08\x08'
+    entries = main.parse_shortcuts(data)
+    assert entries[-1]['AppName'] == 'Wide é'
+    assert main.encode_shortcuts(entries) == data
+
+
+def test_modified_entry():
+    expected = sample_entries()
+    entries = main.parse_shortcuts(dump(expected))
+    entries[1]['LaunchOptions'] = '"E:\\roms\\moved.nsp"'
+    expected[1]['LaunchOptions'] = '"E:\\roms\\moved.nsp"'
+    assert main.encode_shortcuts(entries) == dump(expected)
+
+
+def test_nested_tags_modified_in_place():
+    expected = sample_entries()
+    entries = main.parse_shortcuts(dump(expected))
+    entries[0]['tags']['2'] = 'Played'
+    del entries[2]['tags']['0']
+    expected[0]['tags']['2'] = 'Played'
+    del expected[2]['tags']['0']
+    assert main.encode_shortcuts(entries) == dump(expected)
+
+
+def test_added_and_deleted_entries():
+    expected = sample_entries()
+    entries = main.parse_shortcuts(dump(expected))
+    new = {'appid': '2147483649', 'AppName': 'New', 'Exe': f'"{EMULATOR}"', 'tags': {}}
+    del entries[0]
+    del expected[0]
+    entries.append(dict(new))
+    expected.append(dict(new))
+    data = main.encode_shortcuts(entries)
+    assert data == dump(expected)
+    assert [e['AppName'] for e in main.parse_shortcuts(data)] == ['Game 1', 'Game 2', 'New']
+
+
+def test_load_shortcuts_falls_back_to_vdf_for_unusual_layout(tmp_path):
+    path = tmp_path / 'shortcuts.vdf'
+    path.write_bytes(vdf.binary_dumps({'other': {}, 'shortcuts': {'0': {'AppName': 'A'}}}))
+    assert main.load_shortcuts(str(path)) == [{'AppName': 'A'}]
+
+
+def test_load_shortcuts_on_corrupt_input(tmp_path):
+    path = tmp_path / 'shortcuts.vdf'
+    path.write_bytes(dump(sample_entries())[:-7])
+    assert main.load_shortcuts(str(path)) == []
+    with pytest.raises(ValueError):
+        main.load_shortcuts(str(path), strict=True)
+    assert main.load_shortcuts(str(tmp_path / 'missing.vdf'), strict=True) == []
@@ -0,0 +1,56 @@
+import os
+import struct
+
+import main
+
+
+def pack_partition(files, magic=b'PFS0', entry_size=0x18):
+    strings = b''.join(name.encode() + b'\0' for name, _ in files)
+    table = b''
+    offset = name_offset = 0
+    for name, data in files:
+        table += struct.pack('<QQI', offset, len(data), name_offset).ljust(entry_size, b'\0')
+        offset += len(data)
+        name_offset += len(name) + 1
+    return magic + struct.pack('<III', len(files), len(strings), 0) + table + strings + b''.join(d for _, d in files)
+
+
+def make_nsp(path, title_id):
+    path.write_bytes(pack_partition([(f'{title_id:016x}{"0" * 16}.tik', b'\0' * 64),
+                                     ('0123456789abcdef0123456789abcdef.nca', b'\0' * 256)]))
+
+
+def make_untitled_xci(path):
+    """A cartridge image like most real dumps: no ticket, only hash-named NCAs."""
+    secure = pack_partition([('0123456789abcdef0123456789abcdef.nca', b'\0' * 256)], b'HFS0', 0x40)
+    root = pack_partition([('secure', secure)], b'HFS0', 0x40)
+    header = bytearray(0x200)
+    header[0x100:0x104] = b'HEAD'
+    struct.pack_into('<Q', header, 0x130, len(header))
+    path.write_bytes(bytes(header) + root)
+
+
+def test_title_types(tmp_path):
+    base = 0x0100ABCD00000000
+    for name, title_id, kind in [('base.nsp', base, 'base'), ('update.nsp', base | 0x800, 'update'),
+                                 ('dlc.nsp', (base | 0x1000) + 1, 'dlc')]:
+        make_nsp(tmp_path / name, title_id)
+        info = main.read_switch_title(str(tmp_path / name))
+        assert info['title_type'] == kind
+        assert info['base_title_id'] == f'{base:016x}'
+
+
+def test_one_shortcut_per_title(tmp_path):
+    make_nsp(tmp_path / 'Game.nsp', 0x0100ABCD00000000)
+    make_nsp(tmp_path / 'Game [UPD].nsp', 0x0100ABCD00000800)
+    make_nsp(tmp_path / 'Other name.nsp', 0x0100ABCD00000000)
+    games = main.scrape_roms(str(tmp_path), 'Switch', use_index=False, identify=False)
+    assert [os.path.basename(g['path']) for g in games] == ['Game.nsp']
+
+
+def test_untitled_xci_is_grouped_by_name(tmp_path):
+    make_nsp(tmp_path / 'Zelda [0100ABCD00000000][v0].nsp', 0x0100ABCD00000000)
+    make_untitled_xci(tmp_path / 'Zelda.xci')
+    make_untitled_xci(tmp_path / 'Mario.xci')
+    games = main.scrape_roms(str(tmp_path), 'Switch', use_index=False, identify=False)
+    assert sorted(g['display_name'] for g in games) == ['Mario', 'Zelda']